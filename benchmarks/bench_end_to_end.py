@@ -0,0 +1,214 @@
+"""
+Drives `lambda_handler` end to end against local stand-ins of Bedrock, Secrets Manager,
+SNS and the Graph API, and reports p50/p95/p99 latency per stage for cold and warm starts
+at each concurrency level.
+
+Every concurrent execution environment is a separate worker process: its first invocation
+is a cold start (including the module import and init phase), the following ones are warm.
+
+Usage:
+    python benchmarks/bench_end_to_end.py [--concurrency 1 4] [--invocations 5] [--error-rate 0.05] [--image-variants] [--candidates 1]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+# Functions timed as stages, by the attribute of the handler or publishing module they are called through
+STAGES = {
+    'post_text': 'get_post_data',
+    'facebook_pages': 'get_facebook_pages',
+    'graph_warmup': 'warm_up_graph_connection',
+    'image': 'get_generated_images',
+    'image_processing': 'process_image',
+    'facebook_publish': 'publish_to_pages',
+    'notification': 'flush_notifications',
+}
+REPORTED_STAGES = ['init'] + list(STAGES) + ['handler']
+
+
+class LocalContext:
+    """The parts of the Lambda context used by the handler."""
+
+    def __init__(self, timeout_seconds: float):
+        self.aws_request_id = f"local-{time.time_ns()}"
+        self._deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def run_worker(args):
+    """Runs the invocations of one execution environment and prints one JSON line per invocation."""
+    logging.disable(logging.CRITICAL)
+    import config
+    # every execution environment has its own /tmp
+    config.LOCAL_STORE_DIR = tempfile.mkdtemp(prefix='moments-in-history-bench-')
+
+    start = time.perf_counter()
+    import generate_post_lambda
+    init_duration = time.perf_counter() - start
+
+    import facebook_utils
+    import publish_utils
+    facebook_utils.GRAPH_API_BASE_URL = args.graph_url
+    generate_post_lambda.IMAGE_VARIANTS_ENABLED = args.image_variants
+    generate_post_lambda.POST_CANDIDATE_COUNT = args.candidates
+
+    durations = {}
+    lock = threading.Lock()
+
+    def timed(stage, func):
+        def wrapper(*func_args, **func_kwargs):
+            stage_start = time.perf_counter()
+            try:
+                return func(*func_args, **func_kwargs)
+            finally:
+                with lock:
+                    durations[stage] = durations.get(stage, 0.0) + time.perf_counter() - stage_start
+        return wrapper
+
+    for stage, attribute in STAGES.items():
+        for module in (generate_post_lambda, publish_utils):
+            if hasattr(module, attribute):
+                setattr(module, attribute, timed(stage, getattr(module, attribute)))
+
+    from ai_utils import get_token_usage
+
+    for invocation in range(args.invocations):
+        usage_before = get_token_usage()
+        durations.clear()
+        if invocation == 0:
+            durations['init'] = init_duration
+        start = time.perf_counter()
+        try:
+            response = generate_post_lambda.lambda_handler({'source': 'bench'}, LocalContext(args.timeout))
+            published = all(page['published'] for page in json.loads(response['body']).get('pages', []))
+        except Exception:
+            # the handler raises when the run failed, so Lambda retries the event
+            published = False
+        durations['handler'] = time.perf_counter() - start
+        usage = {field: count - usage_before[field] for field, count in get_token_usage().items()}
+        print(json.dumps({'cold': invocation == 0, 'published': published, 'stages': durations, 'usage': usage}), flush=True)
+
+
+def start_workers(args, concurrency, env):
+    """Starts the worker processes of one concurrency level and returns their invocation records."""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', '--invocations', str(args.invocations),
+               '--graph-url', env['GRAPH_URL'], '--timeout', str(args.timeout), '--candidates', str(args.candidates)]
+    if args.image_variants:
+        command.append('--image-variants')
+
+    def run(_):
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Worker failed:\n{completed.stderr}")
+        # the embedded metric documents printed by the handler are skipped
+        records = [json.loads(line) for line in completed.stdout.splitlines() if line.startswith('{')]
+        return [record for record in records if 'stages' in record]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [record for records in executor.map(run, range(concurrency)) for record in records]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def report(concurrency, records, wall_seconds):
+    published = sum(record['published'] for record in records)
+    print(f"\nconcurrency {concurrency}: {len(records)} invocations in {wall_seconds:.1f}s, "
+          f"{published} published, {len(records) - published} failed")
+    print(f"  {'stage':<18}" + ''.join(f"{label:>26}" for label in ('cold p50/p95/p99 ms', 'warm p50/p95/p99 ms')))
+    for stage in REPORTED_STAGES:
+        cells = []
+        for cold in (True, False):
+            values = [record['stages'][stage] * 1000 for record in records
+                      if record['cold'] == cold and stage in record['stages']]
+            cells.append('/'.join(f"{percentile(values, fraction):.0f}" for fraction in (0.5, 0.95, 0.99)) if values else '-')
+        print(f"  {stage:<18}" + ''.join(f"{cell:>26}" for cell in cells))
+    usage = {field: sum(record['usage'].get(field, 0) for record in records)
+             for field in ('inputTokens', 'cacheReadInputTokenCount', 'cacheWriteInputTokenCount', 'outputTokens')}
+    print(f"  text model tokens: {usage['inputTokens']} input ({usage['cacheReadInputTokenCount']} read from cache, "
+          f"{usage['cacheWriteInputTokenCount']} written to cache), {usage['outputTokens']} output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4], help='concurrent execution environments')
+    parser.add_argument('--invocations', type=int, default=5, help='invocations per execution environment, the first is cold')
+    parser.add_argument('--timeout', type=float, default=30, help='Lambda timeout in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of Bedrock and Graph API requests failing')
+    parser.add_argument('--aws-latency', type=float, default=0.02, help='round trip of AWS requests in seconds')
+    parser.add_argument('--graph-latency', type=float, default=0.05, help='round trip of Graph API requests in seconds')
+    parser.add_argument('--text-latency', type=float, default=0.3, help='seconds to the first token of the text model')
+    parser.add_argument('--tokens-per-second', type=float, default=200, help='generation speed of the text model')
+    parser.add_argument('--image-latency', type=float, default=1.0, help='seconds the image model takes')
+    parser.add_argument('--post-words', type=int, default=150, help='words of the generated posts')
+    parser.add_argument('--image-size', type=int, nargs=2, default=(1344, 768), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--photo-ready-delay', type=float, nargs=2, default=(0.2, 1.0), metavar=('MIN', 'MAX'))
+    parser.add_argument('--image-variants', action='store_true',
+                        help='generate and upload every aspect ratio of IMAGE_VARIANT_TARGETS (IMAGE_VARIANTS_ENABLED)')
+    parser.add_argument('--candidates', type=int, default=None,
+                        help='post candidates per run (POST_CANDIDATE_COUNT), 1 starts the image while the text streams')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--graph-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.candidates is None:
+        from config import POST_CANDIDATE_COUNT
+        args.candidates = POST_CANDIDATE_COUNT
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    sys.path.insert(0, BENCHMARKS_DIR)
+    from local_services import LocalAwsServer, LocalGraphServer
+
+    aws = LocalAwsServer(
+        latency=args.aws_latency,
+        error_rate=args.error_rate,
+        text_latency=args.text_latency,
+        tokens_per_second=args.tokens_per_second,
+        image_latency=args.image_latency,
+        post_words=args.post_words,
+        image_size=tuple(args.image_size),
+        seed=1
+    )
+    graph = LocalGraphServer(args.graph_latency, tuple(args.photo_ready_delay), seed=1, error_rate=args.error_rate)
+    with aws, graph:
+        env = dict(
+            os.environ,
+            AWS_ENDPOINT_URL=aws.base_url,
+            AWS_ACCESS_KEY_ID='local',
+            AWS_SECRET_ACCESS_KEY='local',
+            AWS_DEFAULT_REGION='us-west-2',
+            AWS_EC2_METADATA_DISABLED='true',
+            FACEBOOK_PAGE_ID_SECRET_NAME='facebook-page-id',
+            FACEBOOK_PAGE_TOKEN_SECRET_NAME='facebook-page-access-token',
+            SNS_TOPIC_ARN='arn:aws:sns:us-west-2:000000000000:local',
+            GRAPH_URL=graph.base_url
+        )
+        env.pop('CONTENT_BUCKET_NAME', None)
+        env.pop('FACEBOOK_PAGES_SECRET_NAME', None)
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            records = start_workers(args, concurrency, env)
+            report(concurrency, records, time.perf_counter() - start)
+        print(f"\n{aws.requests} AWS requests ({aws.errors} failed), "
+              f"{graph.requests} Graph API requests ({graph.errors} failed), {len(graph.stories)} stories")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Measures publishing latency and failure rate of the Facebook publish strategies against
+a local Graph API stand-in: the fixed one second sleep, readiness polling of the uploaded
+photo and a single batch request.
+
+Usage:
+    python benchmarks/bench_graph_publish.py [--runs 20] [--latency 0.05] [--ready-delay 0.2 1.5]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import facebook_utils  # noqa: E402
+from local_services import LocalGraphServer  # noqa: E402
+
+STRATEGIES = ['sleep', 'poll', 'batch']
+IMAGE = b'\xff\xd8\xff' + b'\x00' * 200_000
+
+
+def run(strategy, graph, runs):
+    facebook_utils.FACEBOOK_PUBLISH_STRATEGY = strategy
+    durations, failures = [], 0
+    requests_before = graph.requests
+    for run_no in range(runs):
+        start = time.perf_counter()
+        published = facebook_utils.post_to_facebook(f"Benchmark post {run_no}", IMAGE, 'page', 'token')
+        durations.append(time.perf_counter() - start)
+        failures += published is not True
+    durations.sort()
+    p95 = durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+    print(f"{strategy:<6} mean {statistics.mean(durations):6.3f}s  p50 {statistics.median(durations):6.3f}s  "
+          f"p95 {p95:6.3f}s  failed {failures}/{runs}  "
+          f"{(graph.requests - requests_before) / runs:4.1f} requests/post")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated round trip per request in seconds')
+    parser.add_argument('--ready-delay', type=float, nargs=2, default=(0.2, 1.5), metavar=('MIN', 'MAX'),
+                        help='range of the photo processing time in seconds')
+    parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=STRATEGIES)
+    args = parser.parse_args()
+
+    # failed posts are counted, keep the output readable
+    logging.disable(logging.CRITICAL)
+    with LocalGraphServer(args.latency, tuple(args.ready_delay), seed=1) as graph:
+        facebook_utils.GRAPH_API_BASE_URL = graph.base_url
+        print(f"{args.runs} posts per strategy, {args.latency}s latency, "
+              f"photo ready after {args.ready_delay[0]}-{args.ready_delay[1]}s")
+        for strategy in args.strategies:
+            run(strategy, graph, args.runs)
+
+
+if __name__ == '__main__':
+    main()
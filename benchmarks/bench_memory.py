@@ -0,0 +1,211 @@
+"""
+Measures the peak memory (RSS) of the image path from the Bedrock response to the Graph API
+upload, streamed into memoryviews versus read whole and copied as before, and the peak memory
+of a full `lambda_handler` invocation against `lambda_memory_size` in `terraform/variables.tf`.
+
+Every measurement runs in a fresh process against local stand-ins of Bedrock, Secrets Manager,
+SNS and the Graph API. The peak of the image path is reported on top of the process's memory
+after its imports and client creation, which both paths share.
+
+Usage:
+    python benchmarks/bench_memory.py [--runs 3] [--image-size 1344 768]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src')
+VARIABLES_FILE = os.path.join(BENCHMARKS_DIR, '..', 'terraform', 'variables.tf')
+sys.path.insert(0, SRC_DIR)
+
+PATHS = ['copied', 'streamed']
+IMAGE_PROMPT = 'A painting of a ship in a storm'
+
+
+class LocalContext:
+    """The parts of the Lambda context used by the handler."""
+
+    def __init__(self, timeout_seconds: float):
+        self.aws_request_id = f"local-{time.time_ns()}"
+        self._deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def peak_rss_mb():
+    """Returns the peak resident memory of this process so far in MB."""
+    # on Linux, ru_maxrss is kept across exec and would include the parent's peak, VmHWM is not
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    import resource
+    # bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+def copied_image_path(graph_url, process):
+    """The image path before streaming: the whole response parsed, decoded, and copied into the upload."""
+    import base64
+    import io
+    import requests
+    from client_utils import get_client, get_http_session
+    from config import (
+        GRAPH_API_VERSION, IMAGE_GENERATION_MODEL, IMAGE_FILE_NAME, IMAGE_FILE_TYPE,
+        IMAGE_UPLOAD_MAX_SIZE, IMAGE_UPLOAD_FORMAT, IMAGE_UPLOAD_QUALITY
+    )
+    from image_model_utils import get_image_adapter
+
+    body = json.dumps(get_image_adapter(IMAGE_GENERATION_MODEL).build_request(IMAGE_PROMPT, '16:9'))
+    response = get_client('bedrock-runtime', 'us-west-2').invoke_model(
+        modelId=IMAGE_GENERATION_MODEL, contentType='application/json', accept='application/json', body=body
+    )
+    response_body = json.loads(response['body'].read().decode('utf-8'))
+    image_data = base64.b64decode(response_body['images'][0])
+    if process:
+        from PIL import Image
+        with Image.open(io.BytesIO(image_data)) as image:
+            image.thumbnail(IMAGE_UPLOAD_MAX_SIZE, Image.LANCZOS)
+            output = io.BytesIO()
+            image.convert('RGB').save(output, format=IMAGE_UPLOAD_FORMAT.upper(), quality=IMAGE_UPLOAD_QUALITY, optimize=True)
+            image_data = output.getvalue()
+    batch = [{'method': 'POST', 'name': 'photo', 'relative_url': f"{GRAPH_API_VERSION}/page/photos",
+              'attached_files': 'source', 'body': 'message=Benchmark'}]
+    upload = get_http_session().post(
+        f"{graph_url}/{GRAPH_API_VERSION}/",
+        data={'access_token': 'token', 'batch': json.dumps(batch)},
+        files={'source': (IMAGE_FILE_NAME, io.BytesIO(image_data), IMAGE_FILE_TYPE)}
+    )
+    if not upload.ok:
+        raise requests.exceptions.HTTPError(upload.text)
+
+
+def streamed_image_path(graph_url, process):
+    """The image path of the pipeline: decoded while streamed in, passed on as memoryviews and streamed out."""
+    import facebook_utils
+    from ai_utils import generate_image
+    from image_utils import process_image
+
+    facebook_utils.GRAPH_API_BASE_URL = graph_url
+    facebook_utils.FACEBOOK_PUBLISH_STRATEGY = 'batch'
+    image_data = generate_image(IMAGE_PROMPT)
+    if image_data is None:
+        raise RuntimeError('Image generation failed.')
+    image = process_image(image_data)
+    if not facebook_utils.post_to_facebook('Benchmark', image.data, 'page', 'token', image.file_name, image.file_type):
+        raise RuntimeError('Upload failed.')
+
+
+def run_worker(args):
+    """Runs one measurement and prints its result as a JSON line."""
+    logging.disable(logging.CRITICAL)
+    import config
+    config.LOCAL_STORE_DIR = tempfile.mkdtemp(prefix='moments-in-history-bench-')
+    if not args.process:
+        import image_utils
+        image_utils.IMAGE_POSTPROCESSING_ENABLED = False
+
+    if args.worker == 'handler':
+        import generate_post_lambda
+        import facebook_utils
+        facebook_utils.GRAPH_API_BASE_URL = args.graph_url
+        # the handler raises when the run failed
+        generate_post_lambda.lambda_handler({'source': 'bench'}, LocalContext(30))
+        print(json.dumps({'peak_mb': peak_rss_mb()}), flush=True)
+        return
+
+    # both paths import and create the same modules and clients before the measurement
+    import ai_utils  # noqa: F401
+    import facebook_utils  # noqa: F401
+    import requests  # noqa: F401
+    from image_utils import load_image_library
+    from client_utils import get_client, get_http_session
+    load_image_library()
+    get_client('bedrock-runtime', 'us-west-2')
+    get_http_session()
+    before = peak_rss_mb()
+    (copied_image_path if args.worker == 'copied' else streamed_image_path)(args.graph_url, args.process)
+    print(json.dumps({'peak_mb': peak_rss_mb(), 'added_mb': peak_rss_mb() - before}), flush=True)
+
+
+def measure(worker, args, env):
+    """Runs a worker process and returns its result."""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', worker, '--graph-url', env['GRAPH_URL']]
+    if not args.process:
+        command.append('--no-process')
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Worker failed:\n{completed.stderr}")
+    # the embedded metric documents printed by the handler are skipped
+    records = [json.loads(line) for line in completed.stdout.splitlines() if line.startswith('{')]
+    return next(record for record in records if 'peak_mb' in record)
+
+
+def lambda_memory_size():
+    """Returns the default of the `lambda_memory_size` Terraform variable in MB."""
+    with open(VARIABLES_FILE) as file:
+        match = re.search(r'variable "lambda_memory_size" \{.*?default\s*=\s*(\d+)', file.read(), re.DOTALL)
+    return int(match.group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='processes per measurement, the median is reported')
+    parser.add_argument('--image-size', type=int, nargs=2, default=(1344, 768), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--no-process', dest='process', action='store_false',
+                        help='upload the generated image unchanged, as when post-processing is disabled')
+    parser.add_argument('--worker', choices=PATHS + ['handler'], help=argparse.SUPPRESS)
+    parser.add_argument('--graph-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    sys.path.insert(0, BENCHMARKS_DIR)
+    from local_services import LocalAwsServer, LocalGraphServer
+
+    aws = LocalAwsServer(latency=0, text_latency=0, tokens_per_second=100_000, image_latency=0,
+                         image_size=tuple(args.image_size), seed=1)
+    graph = LocalGraphServer(latency=0, photo_ready_delay=(0, 0), seed=1)
+    with aws, graph:
+        env = dict(
+            os.environ,
+            AWS_ENDPOINT_URL=aws.base_url,
+            AWS_ACCESS_KEY_ID='local',
+            AWS_SECRET_ACCESS_KEY='local',
+            AWS_DEFAULT_REGION='us-west-2',
+            AWS_EC2_METADATA_DISABLED='true',
+            FACEBOOK_PAGE_ID_SECRET_NAME='facebook-page-id',
+            FACEBOOK_PAGE_TOKEN_SECRET_NAME='facebook-page-access-token',
+            SNS_TOPIC_ARN='arn:aws:sns:us-west-2:000000000000:local',
+            GRAPH_URL=graph.base_url
+        )
+        env.pop('CONTENT_BUCKET_NAME', None)
+        env.pop('FACEBOOK_PAGES_SECRET_NAME', None)
+
+        print(f"{args.image_size[0]}x{args.image_size[1]} image, base64 response of {len(aws.image) / 2 ** 20:.1f} MB, "
+              f"{'processed' if args.process else 'unprocessed'} upload, median of {args.runs} runs")
+        for path in PATHS:
+            results = [measure(path, args, env) for _ in range(args.runs)]
+            print(f"{path:<9} image path adds {statistics.median(r['added_mb'] for r in results):6.1f} MB  "
+                  f"process peak {statistics.median(r['peak_mb'] for r in results):6.1f} MB")
+
+        peak = statistics.median(measure('handler', args, env)['peak_mb'] for _ in range(args.runs))
+        memory_size = lambda_memory_size()
+        print(f"lambda_handler peak {peak:.1f} MB of lambda_memory_size {memory_size} MB "
+              f"({memory_size - peak:.1f} MB headroom)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures parse success rate and throughput of the model output parser over a corpus
+of model outputs, compared with the previous strip()-based extraction.
+
+The corpus is synthetic: its records are hand-written in the shape of the text model's
+outputs, one per failure mode of the previous extraction (code fences, surrounding text,
+unescaped characters, truncation, missing fields). They are not recorded Nova Lite outputs.
+
+The streaming path feeds each output to the incremental parser in chunks, as the text
+model streams it, and fails the output where the parser would abort the stream.
+
+Usage:
+    python benchmarks/bench_parser.py [--corpus benchmarks/parser_corpus.jsonl] [--iterations 2000] [--chunk-size 8]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ai_utils import extract_generated_data  # noqa: E402
+from parse_utils import IncrementalFieldParser  # noqa: E402
+from config import GENERATED_POST, IMAGE_GENERATION_PROMPT  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.jsonl')
+
+
+def legacy_extract(text: str):
+    """The extraction used before the single-pass parser."""
+    try:
+        inner_json = json.loads(text.strip('```json\n').rstrip('```'))
+        return {GENERATED_POST: inner_json[GENERATED_POST], IMAGE_GENERATION_PROMPT: inner_json[IMAGE_GENERATION_PROMPT]}
+    except Exception:
+        return None
+
+
+def current_extract(text: str):
+    return extract_generated_data({'output': {'message': {'content': [{'text': text}]}}})
+
+
+def streaming_extract(text: str, chunk_size: int):
+    """The streaming path: aborted when the incremental parser finds the output malformed."""
+    parser = IncrementalFieldParser()
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start:start + chunk_size])
+        if parser.malformed:
+            return None
+    return current_extract(text)
+
+
+def run(name, extract, records, iterations):
+    failures = [record['name'] for record in records if extract(record['text']) != record['expected']]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for record in records:
+            extract(record['text'])
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(record['text'].encode('utf-8')) for record in records) * iterations
+    success_rate = 100 * (len(records) - len(failures)) / len(records)
+    print(f"{name:<8} success {success_rate:5.1f}%  "
+          f"{len(records) * iterations / elapsed:10.0f} outputs/s  {total_bytes / elapsed / 1e6:6.1f} MB/s")
+    for failure in failures:
+        print(f"         failed: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--chunk-size', type=int, default=8, help='characters per streamed chunk')
+    args = parser.parse_args()
+
+    # parse failures are expected for part of the corpus, keep the output readable
+    logging.disable(logging.CRITICAL)
+    with open(args.corpus, encoding='utf-8') as corpus:
+        records = [json.loads(line) for line in corpus if line.strip()]
+    print(f"{len(records)} recorded outputs, {args.iterations} iterations")
+    run('legacy', legacy_extract, records, args.iterations)
+    run('current', current_extract, records, args.iterations)
+    run('stream', lambda text: streaming_extract(text, args.chunk_size), records, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
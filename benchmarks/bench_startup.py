@@ -0,0 +1,136 @@
+"""
+Measures the cold start cost of the Lambda function in each startup mode: the import time
+of every module (as reported by `python -X importtime`), the time to create the clients on
+first use, and the size of the deployment package with each requirements file.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 10]
+"""
+import argparse
+import importlib.metadata
+import io
+import os
+import re
+import statistics
+import subprocess
+import sys
+import zipfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+MODES = ['lazy', 'init_warmup']
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Imports the handler module in the given mode, then creates the clients an invocation needs
+# and prints how long that first use took
+STARTUP_SCRIPT = """
+import sys, time
+import config
+config.STARTUP_MODE = sys.argv[1]
+start = time.perf_counter()
+import generate_post_lambda
+import_seconds = time.perf_counter() - start
+start = time.perf_counter()
+from client_utils import get_client, get_http_session
+for service_name, region_name in config.INIT_WARMUP_CLIENTS:
+    get_client(service_name, region_name)
+get_http_session()
+generate_post_lambda.load_image_library()
+print(import_seconds, time.perf_counter() - start)
+"""
+
+
+def measure_startup(mode):
+    """Runs the startup script in a fresh interpreter and returns its timings and import times."""
+    # with a content bucket set, the S3 client is part of the warmup as in the deployed function
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'), CONTENT_BUCKET_NAME='benchmark')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT, mode],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    import_seconds, first_use_seconds = (float(value) for value in completed.stdout.split()[-2:])
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return import_seconds, first_use_seconds, modules
+
+
+def report_startup(runs, top):
+    own_modules = {file_name[:-3] for file_name in os.listdir(SRC_DIR) if file_name.endswith('.py')}
+    for mode in MODES:
+        measurements = [measure_startup(mode) for _ in range(runs)]
+        import_seconds = statistics.median(measurement[0] for measurement in measurements)
+        first_use_seconds = statistics.median(measurement[1] for measurement in measurements)
+        print(f"\n{mode}: import {import_seconds * 1000:7.1f} ms, clients on first use {first_use_seconds * 1000:7.1f} ms "
+              f"(median of {runs} runs)")
+
+        # per module import times of the last run: the repo's own modules and the heaviest top-level imports
+        modules = measurements[-1][2]
+        own = sorted((name for name in modules if name in own_modules), key=lambda name: -modules[name][1])
+        heaviest = sorted(
+            (name for name in modules if '.' not in name and name not in own_modules),
+            key=lambda name: -modules[name][1]
+        )[:top]
+        print(f"  {'module':<28}{'self ms':>10}{'cumulative ms':>16}")
+        for name in own + heaviest:
+            self_us, cumulative_us, _ = modules[name]
+            print(f"  {name:<28}{self_us / 1000:10.1f}{cumulative_us / 1000:16.1f}")
+
+
+def read_requirements(path):
+    """Returns the distribution names from a requirements file, which may be UTF-16 encoded."""
+    with open(path, 'rb') as requirements_file:
+        content = requirements_file.read()
+    text = content.decode('utf-16') if content[:2] in (b'\xff\xfe', b'\xfe\xff') else content.decode('utf-8')
+    names = []
+    for line in text.splitlines():
+        line = line.split('#')[0].strip()
+        if line:
+            names.append(re.split(r'[=<>!~\[; ]', line)[0])
+    return names
+
+
+def installed_size(distribution_name):
+    """Returns the installed size in bytes of a distribution, None if it is not installed."""
+    try:
+        files = importlib.metadata.distribution(distribution_name).files or []
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    return sum(file.size or 0 for file in files)
+
+
+def source_zip_size():
+    """Returns the size of the zipped source files of the function."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for file_name in os.listdir(SRC_DIR):
+            if file_name.endswith('.py'):
+                archive.write(os.path.join(SRC_DIR, file_name), file_name)
+    return buffer.tell()
+
+
+def report_package_size():
+    print("\nPackage size (installed dependencies, uncompressed)")
+    print(f"  function source, zipped: {source_zip_size() / 1024:8.1f} KiB")
+    for requirements_name in ('requirements.txt', 'requirements-lambda.txt'):
+        sizes = {name: installed_size(name) for name in read_requirements(os.path.join(SRC_DIR, requirements_name))}
+        total = sum(size for size in sizes.values() if size)
+        missing = [name for name, size in sizes.items() if size is None]
+        print(f"  {requirements_name:<25}{total / 1024 / 1024:8.1f} MiB in {len(sizes)} distributions"
+              + (f" (not installed here: {', '.join(missing)})" if missing else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='number of heaviest third-party imports to list')
+    args = parser.parse_args()
+
+    report_startup(args.runs, args.top)
+    report_package_size()
+
+
+if __name__ == '__main__':
+    main()
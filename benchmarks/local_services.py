@@ -0,0 +1,434 @@
+"""
+Local stand-ins for the external services the Lambda function talks to, so benchmarks
+can run without AWS or Facebook access.
+
+`LocalGraphServer` mimics the parts of the Facebook Graph API used to publish a post:
+photo uploads, photo lookups, feed posts and batch requests. An uploaded photo only
+becomes usable after a processing delay, and a feed post attaching a photo that is not
+processed yet fails, which is the race the publisher has to avoid.
+
+`LocalAwsServer` speaks the wire protocols boto3 uses for Bedrock runtime (including
+response streams), Secrets Manager and SNS, so the unmodified clients can be pointed
+at it with the AWS_ENDPOINT_URL environment variable.
+
+Both have configurable latency and error rates, and the generated text and image sizes
+are configurable as well.
+"""
+import base64
+import binascii
+import email.parser
+import email.policy
+import itertools
+import json
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = (
+    'empire river battle treaty crown voyage harbor siege council plague revolt temple bridge fleet '
+    'merchant harvest comet eclipse charter cathedral fortress rebellion expedition dynasty archive'
+).split()
+
+
+class _LocalServer:
+    """
+    Base of the stand-in servers: a threaded HTTP server on a free local port,
+    running in a background thread while used as a context manager.
+    """
+
+    def __init__(self, latency: float, error_rate: float, seed: Optional[int]):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def start_request(self) -> bool:
+        """Counts and delays a request, and returns True if it should fail."""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        time.sleep(self.latency)
+        return failed
+
+    def _make_handler(self):
+        raise NotImplementedError
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def respond(self, status: int, body: bytes, content_type: str = 'application/json', headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class LocalGraphServer(_LocalServer):
+    """
+    A Graph API stand-in running on a local port in a background thread.
+
+    Args:
+        latency (float): Seconds added to every request, simulating the network round trip.
+        photo_ready_delay (Tuple[float, float]): Range of the random time in seconds an
+                                                 uploaded photo takes to be processed.
+        seed (Optional[int]): Seed of the processing delay and error generator.
+        error_rate (float): Share of photo uploads and feed posts failing with a server error.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.05,
+            photo_ready_delay: Tuple[float, float] = (0.2, 1.5),
+            seed: Optional[int] = None,
+            error_rate: float = 0.0
+    ):
+        self.photo_ready_delay = photo_ready_delay
+        self.photos: Dict[str, float] = {}
+        self.posts: Dict[str, str] = {}
+        self.stories: Dict[str, str] = {}
+        self._ids = itertools.count(1)
+        super().__init__(latency, error_rate, seed)
+
+    # --- Graph API operations, shared by plain and batch requests ---
+
+    def upload_photo(self) -> Tuple[int, dict]:
+        with self._lock:
+            photo_id = str(next(self._ids))
+            self.photos[photo_id] = time.monotonic() + self._random.uniform(*self.photo_ready_delay)
+        return 200, {'id': photo_id}
+
+    def get_photo(self, photo_id: str) -> Tuple[int, dict]:
+        ready_at = self.photos.get(photo_id)
+        if ready_at is None:
+            return 404, _graph_error(f"Unsupported get request. Object with ID '{photo_id}' does not exist", 100)
+        result = {'id': photo_id}
+        if time.monotonic() >= ready_at:
+            result['images'] = [{'height': 1024, 'width': 1024, 'source': f"https://example.com/{photo_id}.jpg"}]
+        return 200, result
+
+    def create_feed_post(self, page_id: str, form: Dict[str, str], wait_for_photos: bool = False) -> Tuple[int, dict]:
+        photo_ids = [media['media_fbid'] for media in json.loads(form.get('attached_media', '[]'))]
+        for photo_id in photo_ids:
+            ready_at = self.photos.get(photo_id)
+            if ready_at is None:
+                return 400, _graph_error(f"Invalid media_fbid '{photo_id}'", 100)
+            if wait_for_photos:
+                time.sleep(max(ready_at - time.monotonic(), 0))
+            elif time.monotonic() < ready_at:
+                return 400, _graph_error('The photo is still being processed', 100)
+        with self._lock:
+            post_id = f"{page_id}_{next(self._ids)}"
+            self.posts[post_id] = form.get('message', '')
+        return 200, {'id': post_id}
+
+    def create_story(self, page_id: str, form: Dict[str, str]) -> Tuple[int, dict]:
+        photo_id = form.get('photo_id', '')
+        if photo_id not in self.photos:
+            return 400, _graph_error(f"Invalid photo_id '{photo_id}'", 100)
+        with self._lock:
+            post_id = f"{page_id}_{next(self._ids)}"
+            self.stories[post_id] = photo_id
+        return 200, {'success': True, 'post_id': post_id}
+
+    def run_batch(self, operations: list) -> list:
+        """
+        Runs the operations of a batch request in order. A dependent operation can
+        reference earlier results with '{result=<name>:$.id}' and is assumed to be
+        resolved by Facebook once the referenced photo is usable.
+        """
+        results, named = [], {}
+        for operation in operations:
+            body = operation.get('body', '')
+            for name, result in named.items():
+                body = body.replace(f"%7Bresult%3D{name}%3A%24.id%7D", result.get('id', ''))
+            form = {key: values[0] for key, values in parse_qs(body).items()}
+            path = operation['relative_url'].strip('/').split('/')
+            if operation.get('depends_on') and operation['depends_on'] not in named:
+                status, result = 400, _graph_error('The operation it depends on failed', 100)
+            elif path[-1] == 'photos':
+                status, result = self.upload_photo()
+            elif path[-1] == 'feed':
+                status, result = self.create_feed_post(path[-2], form, wait_for_photos=True)
+            else:
+                status, result = 400, _graph_error(f"Unsupported batch operation {operation['relative_url']}", 100)
+            if status == 200 and 'name' in operation:
+                named[operation['name']] = result
+            results.append({'code': status, 'headers': [], 'body': json.dumps(result)})
+        return results
+
+    def _make_handler(self):
+        graph = self
+
+        class GraphRequestHandler(_RequestHandler):
+            def do_HEAD(self) -> None:
+                self.respond(200, b'')
+
+            def do_GET(self) -> None:
+                graph.start_request()
+                path = urlsplit(self.path).path.strip('/').split('/')
+                self._respond_json(*graph.get_photo(path[-1]))
+
+            def do_POST(self) -> None:
+                failed = graph.start_request()
+                form = self._read_form()
+                path = urlsplit(self.path).path.strip('/').split('/')
+                if failed and path[-1] in ('photos', 'feed'):
+                    self._respond_json(500, _graph_error('An unexpected error has occurred. Please retry your request later.', 2))
+                elif len(path) == 1:
+                    self._respond_json(200, graph.run_batch(json.loads(form['batch'])))
+                elif path[-1] == 'photos':
+                    self._respond_json(*graph.upload_photo())
+                elif path[-1] == 'feed':
+                    self._respond_json(*graph.create_feed_post(path[-2], form))
+                elif path[-1] == 'photo_stories':
+                    self._respond_json(*graph.create_story(path[-2], form))
+                else:
+                    self._respond_json(404, _graph_error(f"Unknown path {self.path}", 100))
+
+            def _read_form(self) -> Dict[str, str]:
+                body = self.read_body()
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('multipart/form-data'):
+                    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+                    )
+                    # uploaded files are not needed, only the text fields
+                    return {
+                        part.get_param('name', header='content-disposition'): part.get_content()
+                        for part in message.iter_parts() if part.get_filename() is None
+                    }
+                return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+            def _respond_json(self, status: int, result) -> None:
+                self.respond(status, json.dumps(result).encode('utf-8'))
+
+        return GraphRequestHandler
+
+
+def _graph_error(message: str, code: int) -> dict:
+    return {'error': {'message': message, 'type': 'OAuthException' if code == 190 else 'GraphMethodException', 'code': code}}
+
+
+class LocalAwsServer(_LocalServer):
+    """
+    A stand-in for Bedrock runtime, Secrets Manager and SNS on a local port.
+
+    Bedrock text requests get a post of random words in the Nova response format,
+    streamed in chunks at `tokens_per_second` for response stream requests. Image
+    requests get a random noise PNG of `image_size`. Every requested secret exists,
+    with the values from `secrets` or a generated one.
+
+    Args:
+        latency (float): Seconds added to every request, simulating the network round trip.
+        error_rate (float): Share of Bedrock requests failing with a ThrottlingException.
+        text_latency (float): Seconds before the text model responds or streams its first chunk.
+        tokens_per_second (float): Generation speed of the streamed text.
+        image_latency (float): Seconds the image model takes to respond.
+        post_words (int): Number of words of the generated posts.
+        image_size (Tuple[int, int]): Width and height of the generated images.
+        secrets (Optional[Dict[str, str]]): Secret values by secret name.
+        seed (Optional[int]): Seed of the error and text generator.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.02,
+            error_rate: float = 0.0,
+            text_latency: float = 0.3,
+            tokens_per_second: float = 200,
+            image_latency: float = 1.0,
+            post_words: int = 150,
+            image_size: Tuple[int, int] = (1344, 768),
+            secrets: Optional[Dict[str, str]] = None,
+            seed: Optional[int] = None
+    ):
+        self.text_latency = text_latency
+        self.tokens_per_second = tokens_per_second
+        self.image_latency = image_latency
+        self.post_words = post_words
+        self.secrets = secrets or {}
+        self.published_messages = 0
+        self.image = base64.b64encode(random_png(*image_size)).decode('ascii')
+        super().__init__(latency, error_rate, seed)
+
+    # --- Bedrock runtime ---
+
+    def generate_text(self) -> Tuple[str, dict]:
+        """Returns the model output text of a new post and its token usage."""
+        with self._lock:
+            words = [self._random.choice(WORDS) for _ in range(self.post_words)]
+        post = ' '.join(words) + ' 📜 ' + ' '.join(f"#{word}" for word in words[:5])
+        output = {'image_generation_prompt': 'A painting of the ' + ' '.join(words[:12]), 'generated_post': post}
+        text = '```json\n' + json.dumps(output, ensure_ascii=False, indent=2) + '\n```'
+        usage = {'inputTokens': 250, 'outputTokens': len(text) // 4, 'totalTokens': 250 + len(text) // 4,
+                 'cacheReadInputTokenCount': 0, 'cacheWriteInputTokenCount': 0}
+        return text, usage
+
+    def text_chunks(self, text: str, usage: dict) -> Iterable[Tuple[float, dict]]:
+        """Yields the delay before each stream chunk and the chunk, as sent by Nova models."""
+        yield self.text_latency, {'messageStart': {'role': 'assistant'}}
+        chunk_size = 16  # about four tokens
+        for start in range(0, len(text), chunk_size):
+            yield chunk_size / 4 / self.tokens_per_second, {
+                'contentBlockDelta': {'delta': {'text': text[start:start + chunk_size]}, 'contentBlockIndex': 0}
+            }
+        yield 0, {'contentBlockStop': {'contentBlockIndex': 0}}
+        yield 0, {'messageStop': {'stopReason': 'end_turn'}}
+        yield 0, {'metadata': {'usage': usage, 'metrics': {}, 'trace': {}}}
+
+    # --- Secrets Manager ---
+
+    def get_secret_value(self, secret_name: str) -> dict:
+        return {
+            'ARN': f"arn:aws:secretsmanager:us-east-1:000000000000:secret:{secret_name}",
+            'Name': secret_name,
+            'SecretString': self.secrets.get(secret_name, f"local-{secret_name}"),
+            'VersionId': 'local',
+            'VersionStages': ['AWSCURRENT'],
+            'CreatedDate': 0
+        }
+
+    def _make_handler(self):
+        aws = self
+
+        class AwsRequestHandler(_RequestHandler):
+            def do_POST(self) -> None:
+                failed = aws.start_request()
+                body = self.read_body()
+                path = urlsplit(self.path).path
+                target = self.headers.get('X-Amz-Target', '')
+                if path.startswith('/model/'):
+                    if failed:
+                        self.respond(429, b'{"message": "Too many requests, please wait before trying again."}',
+                                     headers={'x-amzn-ErrorType': 'ThrottlingException'})
+                    elif path.endswith('/invoke-with-response-stream'):
+                        self._stream_text()
+                    elif b'"prompt"' in body or b'"taskType"' in body:
+                        time.sleep(aws.image_latency)
+                        self._respond_json({'images': [aws.image], 'finish_reasons': [None], 'seeds': [0]})
+                    else:
+                        time.sleep(aws.text_latency + aws.post_words * 1.5 / aws.tokens_per_second)
+                        text, usage = aws.generate_text()
+                        self._respond_json({
+                            'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                            'stopReason': 'end_turn',
+                            'usage': usage
+                        })
+                elif target.startswith('secretsmanager.'):
+                    request = json.loads(body or b'{}')
+                    if target.endswith('.BatchGetSecretValue'):
+                        values = [aws.get_secret_value(name) for name in request.get('SecretIdList', [])]
+                        self._respond_json({'SecretValues': values, 'Errors': []}, 'application/x-amz-json-1.1')
+                    else:
+                        self._respond_json(aws.get_secret_value(request['SecretId']), 'application/x-amz-json-1.1')
+                else:
+                    self._respond_sns({key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()})
+
+            def _stream_text(self) -> None:
+                text, usage = aws.generate_text()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+                self.send_header('x-amzn-bedrock-content-type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for delay, chunk in aws.text_chunks(text, usage):
+                    time.sleep(delay)
+                    payload = json.dumps({'bytes': base64.b64encode(json.dumps(chunk).encode('utf-8')).decode('ascii')})
+                    message = encode_event_message(
+                        {':event-type': 'chunk', ':content-type': 'application/json', ':message-type': 'event'},
+                        payload.encode('utf-8')
+                    )
+                    self.wfile.write(f"{len(message):x}\r\n".encode('ascii') + message + b'\r\n')
+                    self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _respond_sns(self, form: Dict[str, str]) -> None:
+                action = form.get('Action')
+                request_id = uuid.uuid4()
+                if action == 'Publish':
+                    aws.published_messages += 1
+                    result = f"<MessageId>{uuid.uuid4()}</MessageId>"
+                elif action == 'PublishBatch':
+                    ids = [value for key, value in form.items() if key.startswith('PublishBatchRequestEntries.member.') and key.endswith('.Id')]
+                    aws.published_messages += len(ids)
+                    members = ''.join(f"<member><Id>{entry_id}</Id><MessageId>{uuid.uuid4()}</MessageId></member>" for entry_id in ids)
+                    result = f"<Successful>{members}</Successful><Failed/>"
+                else:
+                    self.respond(400, b'<ErrorResponse><Error><Code>InvalidAction</Code></Error></ErrorResponse>', 'text/xml')
+                    return
+                self.respond(200, (
+                    f'<{action}Response xmlns="http://sns.amazonaws.com/doc/2010-03-31/">'
+                    f"<{action}Result>{result}</{action}Result>"
+                    f"<ResponseMetadata><RequestId>{request_id}</RequestId></ResponseMetadata>"
+                    f"</{action}Response>"
+                ).encode('utf-8'), 'text/xml')
+
+            def _respond_json(self, result: dict, content_type: str = 'application/json') -> None:
+                self.respond(200, json.dumps(result).encode('utf-8'), content_type)
+
+        return AwsRequestHandler
+
+
+def encode_event_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encodes a message of the AWS event stream format used by Bedrock response streams."""
+    encoded_headers = b''
+    for name, value in headers.items():
+        name_bytes, value_bytes = name.encode('utf-8'), value.encode('utf-8')
+        # header value type 7 is a string
+        encoded_headers += struct.pack('>B', len(name_bytes)) + name_bytes + struct.pack('>BH', 7, len(value_bytes)) + value_bytes
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack('>II', total_length, len(encoded_headers))
+    message = prelude + struct.pack('>I', binascii.crc32(prelude)) + encoded_headers + payload
+    return message + struct.pack('>I', binascii.crc32(message))
+
+
+def random_png(width: int, height: int) -> bytes:
+    """Returns a PNG of random noise, which hardly compresses, like a detailed generated image."""
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    # every row starts with filter type 0
+    rows = b''.join(b'\x00' + os.urandom(width * 3) for _ in range(height))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(rows, 1))
+        + chunk(b'IEND', b'')
+    )
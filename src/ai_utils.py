@@ -1,9 +1,21 @@
-import boto3
 import json
 import logging
-import base64
-from typing import Optional, Dict, Any
-from botocore.exceptions import ClientError
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
+from client_utils import get_client
+from bedrock_utils import invoke_model, call_with_retries, get_remaining_time
+from image_model_utils import (
+    choose_image_models,
+    get_image_adapter,
+    get_image_model_regions,
+    read_image_response,
+    record_image_model_call
+)
+from parse_utils import IncrementalFieldParser, parse_model_output
+from catalog_utils import HistoricalEvent
+from metrics_utils import Span, span
 from config import (
     AI_MODEL,
     TEMPERATURE,
@@ -17,23 +29,57 @@ from config import (
     PROMPT_PERIOD_INSTRUCTION,
     PROMPT_INSTRUCTIONS,
     PROMPT_OUTPUT_FORMAT,
-    DEFAULT_REGION,
+    PROMPT_PERIOD_MESSAGE,
+    PROMPT_EVENT_MESSAGE,
+    PROMPT_CACHING_ENABLED,
+    PROMPT_CACHE_MIN_TOKENS,
+    PROMPT_CHARS_PER_TOKEN,
     IMAGE_ASPECT_RATIO,
-    IMAGE_GENERATION_MODE,
-    IMAGE_OUTPUT_FORMAT,
-    IMAGE_GENERATION_MODEL
+    IMAGE_VARIANT_MAX_CONCURRENCY,
+    IMAGE_MODEL_ATTEMPTS_BEFORE_FALLBACK,
+    BEDROCK_MAX_ATTEMPTS,
+    AI_MODEL_FALLBACK_REGIONS,
+    TEXT_HEDGE_AFTER_SECONDS,
+    IMAGE_HEDGE_AFTER_SECONDS,
+    TEXT_DEADLINE_RESERVE_SECONDS,
+    IMAGE_DEADLINE_RESERVE_SECONDS
 )
 
 logger = logging.getLogger(__name__)
 
+# The static part of the prompt, identical in every request, so it forms a cacheable prefix.
+# The order and content of these constants are crucial for AI's response format.
+SYSTEM_PROMPT = (
+        PROMPT_ROLE +
+        PROMPT_CONTEXT +
+        PROMPT_PERIOD_INSTRUCTION +
+        PROMPT_INSTRUCTIONS +
+        PROMPT_OUTPUT_FORMAT
+)
+# A cache point on a prefix shorter than the model minimum is never hit, so it is only added above it
+PROMPT_CACHE_ACTIVE = PROMPT_CACHING_ENABLED and len(SYSTEM_PROMPT) / PROMPT_CHARS_PER_TOKEN >= PROMPT_CACHE_MIN_TOKENS
+if PROMPT_CACHING_ENABLED and not PROMPT_CACHE_ACTIVE:
+    logger.warning(
+        f"Prompt caching is enabled, but the prompt prefix of about {len(SYSTEM_PROMPT) // PROMPT_CHARS_PER_TOKEN} "
+        f"tokens is below the {PROMPT_CACHE_MIN_TOKENS} tokens the model caches, no cache point is sent."
+    )
+TOKEN_USAGE_FIELDS = ('inputTokens', 'outputTokens', 'cacheReadInputTokenCount', 'cacheWriteInputTokenCount')
+
+# Token counts of all text model responses in this execution environment
+_token_usage = dict.fromkeys(TOKEN_USAGE_FIELDS + ('responses',), 0)
+_usage_lock = threading.Lock()
+# Image model calls of the aspect ratio variants of a post
+_variant_executor = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_MAX_CONCURRENCY)
+
 
 def generate_new_post(prompt: str) -> Optional[Dict[str, Any]]:
     """
     Invokes an AWS Bedrock AI model to generate a new post based on a given prompt.
 
-    This function initializes a Bedrock Runtime client and sends a structured
-    request to the configured AI model with the user's prompt and
-    inference parameters (temperature, max tokens, stop sequences).
+    This function sends a structured request to the configured AI model with
+    the user's prompt and inference parameters (temperature, max tokens, stop sequences).
+    Throttled or failed calls are retried in the configured regions within the
+    invocation's time budget.
     It logs the invocation process and handles potential API errors,
     JSON decoding issues, or other exceptions.
 
@@ -46,42 +92,30 @@ def generate_new_post(prompt: str) -> Optional[Dict[str, Any]]:
         The structure of the returned dictionary depends on the specific
         AI model used.
     """
-    try:
-        # Initialize Bedrock Runtime client
-        bedrock_runtime = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=AI_MODEL_REGION
-        )
-        # The 'body' structure depends on the specific AI model being used
-        body = json.dumps({
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "text": prompt
-                        }
-                    ]
-                }
-            ],
-            "inferenceConfig": {
-                "temperature": TEMPERATURE,
-                "maxTokens": MAX_TOKEN_COUNT,
-                "stopSequences": STOP_SEQUENCES
-            }
-        })
+    # botocore is imported on first use, to keep it off the cold start import path
+    from botocore.exceptions import ClientError
 
-        logger.info(f"Invoking Bedrock model '{AI_MODEL}' with prompt: {prompt}")
-        response = bedrock_runtime.invoke_model(
-            modelId=AI_MODEL,
-            contentType="application/json",
-            accept="application/json",
-            body=body
-        )
-        response_body_str = response.get("body").read().decode('utf-8')
-        response_body = json.loads(response_body_str)
+    try:
+        with span('prompt_build') as build_span:
+            body = json.dumps(build_text_request(prompt))
+            build_span.set(RequestBytes=len(body))
+
+        logger.info(f"Invoking Bedrock model '{AI_MODEL}'.")
+        logger.debug('Prompt: %s', prompt)
+        with span('text_call') as call_span:
+            # Retried with backoff, failing over and hedging to the fallback regions, within the invocation's time budget
+            response_body = invoke_model(
+                AI_MODEL,
+                body,
+                [AI_MODEL_REGION] + AI_MODEL_FALLBACK_REGIONS,
+                hedge_after=TEXT_HEDGE_AFTER_SECONDS,
+                reserve_seconds=TEXT_DEADLINE_RESERVE_SECONDS
+            )
+            call_span.set(RequestBytes=len(body))
+            call_span.set_usage(response_body.get('usage', {}))
 
         logger.info('Bedrock model invoked successfully.')
+        record_token_usage(response_body.get('usage', {}))
 
         return response_body
 
@@ -102,15 +136,178 @@ def generate_new_post(prompt: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def generate_new_post_streaming(
+        prompt: str,
+        on_image_prompt: Optional[Callable[[str], Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Invokes the AWS Bedrock AI model with a response stream and parses the output as it arrives.
+
+    The streamed text is fed to an incremental parser, and `on_image_prompt` is
+    called as soon as the image generation prompt has been streamed in, so the image
+    can be generated while the rest of the post is still being written. The generator
+    passes it when a single candidate is generated (`POST_CANDIDATE_COUNT` of 1). The
+    stream is aborted as soon as the output is recognized as malformed.
+
+    Args:
+        prompt (str): The text prompt to send to the AI model for content generation.
+        on_image_prompt (Optional[Callable[[str], Any]]): Called with the image generation
+                                                          prompt once it is complete.
+
+    Returns:
+        Optional[Dict[str, Any]]: A dictionary in the same format as the response body
+        of a non-streaming invocation, so it can be passed to `extract_generated_data`.
+        None if the invocation failed or the output was malformed.
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        with span('prompt_build') as build_span:
+            body = json.dumps(build_text_request(prompt))
+            build_span.set(RequestBytes=len(body))
+
+        logger.info(f"Invoking Bedrock model '{AI_MODEL}' with response stream.")
+        logger.debug('Prompt: %s', prompt)
+        with span('text_call') as call_span:
+            response_body = _stream_text(body, on_image_prompt, call_span)
+        if response_body is not None:
+            logger.info('Bedrock model stream finished successfully.')
+        return response_body
+
+    except ClientError as e:
+        logger.error(
+            f"Bedrock API error (ClientError): {e.response.get('Error', {}).get('Code')} - {e.response.get('Error', {}).get('Message')}",
+            exc_info=True
+        )
+        return None
+    except Exception as e:
+        logger.error(f'An unexpected error occurred in generate_new_post_streaming: {e}', exc_info=True)
+        return None
+
+
+def _stream_text(body: str, on_image_prompt: Optional[Callable[[str], Any]], call_span: Span) -> Optional[Dict[str, Any]]:
+    """
+    Streams the text model output for the request body, see `generate_new_post_streaming`.
+
+    Args:
+        body (str): The JSON request body.
+        on_image_prompt (Optional[Callable[[str], Any]]): Called with the image generation prompt once it is complete.
+        call_span (Span): The span of the text call, getting the payload sizes and token counts.
+
+    Returns:
+        Optional[Dict[str, Any]]: The response in the format of a non-streaming invocation,
+        None if the output was malformed.
+    """
+    start = time.perf_counter()
+    time_to_first_token = None
+    # Only opening the stream is retried, a stream is never hedged
+    response = call_with_retries(
+        lambda region: get_client('bedrock-runtime', region).invoke_model_with_response_stream(
+            modelId=AI_MODEL,
+            contentType="application/json",
+            accept="application/json",
+            body=body
+        ),
+        AI_MODEL,
+        [AI_MODEL_REGION] + AI_MODEL_FALLBACK_REGIONS,
+        reserve_seconds=TEXT_DEADLINE_RESERVE_SECONDS
+    )
+
+    parser = IncrementalFieldParser()
+    text_parts = []
+    usage = {}
+    stop_reason = None
+    response_bytes = 0
+    stream = response.get("body")
+    for event in stream:
+        chunk = {}
+        if 'chunk' in event:
+            response_bytes += len(event['chunk']['bytes'])
+            chunk = json.loads(event['chunk']['bytes'])
+        if 'contentBlockDelta' in chunk:
+            text = chunk['contentBlockDelta'].get('delta', {}).get('text', '')
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+            text_parts.append(text)
+            image_prompt_known = IMAGE_GENERATION_PROMPT in parser.fields
+            parser.feed(text)
+            if parser.malformed:
+                stream.close()
+                call_span.fail()
+                logger.error(f"Aborted malformed model output stream: {parser.error}")
+                return None
+            if not image_prompt_known and IMAGE_GENERATION_PROMPT in parser.fields and on_image_prompt:
+                on_image_prompt(parser.fields[IMAGE_GENERATION_PROMPT])
+        elif 'messageStop' in chunk:
+            stop_reason = chunk['messageStop'].get('stopReason')
+        elif 'metadata' in chunk:
+            usage = chunk['metadata'].get('usage', {})
+
+    call_span.set(RequestBytes=len(body), ResponseBytes=response_bytes)
+    call_span.set_usage(usage)
+    if time_to_first_token is not None:
+        call_span.set(TimeToFirstToken=time_to_first_token * 1000)
+    record_token_usage(usage, time_to_first_token)
+
+    return {
+        'output': {'message': {'role': 'assistant', 'content': [{'text': ''.join(text_parts)}]}},
+        'stopReason': stop_reason,
+        'usage': usage
+    }
+
+
+def build_text_request(prompt: str, cache_point: bool = True) -> Dict[str, Any]:
+    """
+    Builds the request body for the text generation model.
+
+    The static instructions are sent as the system prompt, followed by a cache point
+    when prompt caching is enabled and the prefix is long enough to be cached, and only
+    the prompt with the historical period is sent as the user message. The same body
+    is used for on-demand invocations and for the records of Bedrock batch inference jobs.
+
+    Args:
+        prompt (str): The user message returned by `prepare_prompt`.
+        cache_point (bool): Whether the request may have a cache point, False for batch
+                            inference records, which are not served from the prompt cache.
+
+    Returns:
+        Dict[str, Any]: The request body in the format expected by the configured AI model.
+    """
+    system = [{"text": SYSTEM_PROMPT}]
+    if cache_point and PROMPT_CACHE_ACTIVE:
+        system.append({"cachePoint": {"type": "default"}})
+
+    # The 'body' structure depends on the specific AI model being used
+    return {
+        "system": system,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "text": prompt
+                    }
+                ]
+            }
+        ],
+        "inferenceConfig": {
+            "temperature": TEMPERATURE,
+            "maxTokens": MAX_TOKEN_COUNT,
+            "stopSequences": STOP_SEQUENCES
+        }
+    }
+
+
 def extract_generated_data(data: dict) -> Optional[Dict[str, str]]:
     """
     Extracts structured data (generated post and image generation prompt)
     from the raw response dictionary received from the Bedrock AI model.
 
     This function expects the 'text' content within the Bedrock response
-    to be a JSON string wrapped in Markdown code blocks (e.g., ```json\\n...\\n```).
-    It parses this inner JSON and extracts specific fields defined by
-    `GENERATED_POST` and `IMAGE_GENERATION_PROMPT` from the config.
+    to contain a JSON object, optionally wrapped in Markdown code blocks
+    (e.g., ```json\\n...\\n```) or surrounded by other text. It parses this
+    inner JSON in a single pass, repairing common model mistakes, and extracts
+    specific fields defined by `GENERATED_POST` and `IMAGE_GENERATION_PROMPT` from the config.
 
     Args:
         data (dict): The raw response dictionary obtained from the
@@ -127,111 +324,162 @@ def extract_generated_data(data: dict) -> Optional[Dict[str, str]]:
     try:
         text_content = data['output']['message']['content'][0]['text']
 
-        # Remove the wrapping ```json\n and trailing ```
-        json_str = text_content.strip('```json\n').rstrip('```')
-
-        # Parse the inner JSON string
-        inner_json = json.loads(json_str)
+        # Locate and parse the inner JSON object, ignoring code fences and surrounding text
+        with span('parse') as parse_span:
+            inner_json = parse_model_output(text_content)
+            parse_span.set(RequestBytes=len(text_content.encode('utf-8')))
+            if inner_json is None:
+                parse_span.fail()
+        if inner_json is None:
+            logger.error(f"No valid JSON object found in AI response text: {text_content!r}")
+            return None
 
         #  Extract the fields
         generated_post = inner_json[GENERATED_POST]
         image_generation_prompt = inner_json[IMAGE_GENERATION_PROMPT]
+        if not isinstance(generated_post, str) or not isinstance(image_generation_prompt, str):
+            logger.error(f"Generated fields are not strings: {inner_json}")
+            return None
 
-        logger.info(f"Generated Post: {generated_post}")
-        logger.info(f"Generated Image Prompt: {image_generation_prompt}")
+        logger.info(f"Generated a post of {len(generated_post)} characters.")
+        logger.debug('Generated Post: %s', generated_post)
+        logger.debug('Generated Image Prompt: %s', image_generation_prompt)
 
         return {GENERATED_POST: generated_post, IMAGE_GENERATION_PROMPT: image_generation_prompt}
+    except KeyError as e:
+        logger.error(f"Missing field {e} in Bedrock response or generated JSON.", exc_info=True)
+        return None
     except (TypeError, IndexError) as e:
         logger.error(f"Unexpected data structure from Bedrock response during extraction: {e}", exc_info=True)
         return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse inner JSON from AI response text: {e}", exc_info=True)
-        return None
     except Exception as e:
         # Catch any other unforeseen errors during extraction
         logger.error(f'An unexpected error occurred while extracting generated data: {e}', exc_info=True)
         return None
 
 
-def prepare_prompt(historical_period: str) -> str:
+def prepare_prompt(historical_period: str, event: Optional[HistoricalEvent] = None) -> str:
     """
-    Constructs a detailed prompt for the AI model based on a selected historical period
-    and predefined instructions.
+    Constructs the user message for the AI model with the selected historical period.
 
-    This function concatenates several predefined prompt components (role, context,
-    period-specific instructions, general instructions, and output format) with
-    the dynamically provided historical period to form a complete instruction
-    for the AI model.
+    The predefined instructions (role, context, general instructions and output format)
+    are not part of the message, they are sent as the system prompt by `build_text_request`.
+    Keeping the only variable part at the end lets Bedrock reuse the processed static prefix.
 
     Args:
         historical_period (str): The specific historical period to incorporate
                                  into the AI prompt, guiding the content generation.
+        event (Optional[HistoricalEvent]): The event of the period to write about, picked
+                                           from the catalog. Without it, the model chooses one.
 
     Returns:
-        str: The complete, formatted prompt string ready to be sent to the AI model.
-    """
-    logger.info(f"Preparing AI prompt for historical period: '{historical_period}'")
-    # Concatenate prompt components defined in config.
-    # The order and content of these constants are crucial for AI's response format.
-    prompt_str = (
-            PROMPT_ROLE +
-            PROMPT_CONTEXT +
-            PROMPT_PERIOD_INSTRUCTION + historical_period +
-            PROMPT_INSTRUCTIONS +
-            PROMPT_OUTPUT_FORMAT
+        str: The user message ready to be sent to the AI model.
+    """
+    if event is None:
+        logger.info(f"Preparing AI prompt for historical period: '{historical_period}'")
+        return PROMPT_PERIOD_MESSAGE + historical_period
+    logger.info(f"Preparing AI prompt for historical period: '{historical_period}', event: '{event.describe()}'")
+    return PROMPT_PERIOD_MESSAGE + historical_period + PROMPT_EVENT_MESSAGE + event.describe()
+
+
+def record_token_usage(usage: Dict[str, int], time_to_first_token: Optional[float] = None) -> None:
+    """
+    Adds the token counts of a text model response to the totals of the execution environment.
+
+    The cache read and write counts show whether the static prompt prefix was served
+    from the prompt cache, which lowers the cost of the input tokens and the time to first token.
+
+    Args:
+        usage (Dict[str, int]): The 'usage' of the model response.
+        time_to_first_token (Optional[float]): Seconds until the first streamed token, if streamed.
+    """
+    with _usage_lock:
+        for field in TOKEN_USAGE_FIELDS:
+            _token_usage[field] += usage.get(field) or 0
+        _token_usage['responses'] += 1
+    logger.info(
+        f"Token usage: {usage.get('inputTokens', 0)} input "
+        f"({usage.get('cacheReadInputTokenCount') or 0} read from cache, "
+        f"{usage.get('cacheWriteInputTokenCount') or 0} written to cache), "
+        f"{usage.get('outputTokens', 0)} output"
+        + (f", first token after {time_to_first_token:.3f}s." if time_to_first_token is not None else '.')
     )
 
-    return prompt_str
+
+def get_token_usage() -> Dict[str, int]:
+    """
+    Returns the token counts of all text model responses in this execution environment.
+
+    Returns:
+        Dict[str, int]: The summed token counts and the number of responses.
+    """
+    with _usage_lock:
+        return dict(_token_usage)
 
 
-def generate_image(image_prompt: str) -> Optional[bytes]:
+def generate_image(image_prompt: str, aspect_ratio: str = IMAGE_ASPECT_RATIO) -> Optional[memoryview]:
     """
     Generates an image using an AWS Bedrock text-to-image model based on a given prompt.
 
-    This function initializes a Bedrock Runtime client, constructs a request
-    for a specified image generation model (e.g., Stability Diffusion),
-    and sends the image prompt along with desired aspect ratio and output format.
-    It decodes the base64-encoded image from the response.
+    The model is chosen from `IMAGE_GENERATION_MODELS` by the recent latency and error
+    rate of each model and the time left in the invocation. When the chosen model fails
+    or is throttled, the next eligible one is tried within the remaining time. Each
+    model's request body and response are handled by its adapter, and the
+    base64-encoded image is decoded from the response while it streams in.
 
     Args:
         image_prompt (str): The text description or prompt used to guide the
                             image generation AI model.
+        aspect_ratio (str): The aspect ratio of the image, a key of `IMAGE_SIZES`.
 
     Returns:
-        Optional[bytes]: The generated image content as bytes if successful,
+        Optional[memoryview]: The generated image content as bytes if successful,
                          otherwise None if an error occurs during invocation,
                          response parsing, or decoding.
     """
-    try:
-        # Initialize Bedrock Runtime client for image generation
-        # Using DEFAULT_REGION as configured for image models if different from AI_MODEL_REGION
-        bedrock_runtime = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=DEFAULT_REGION
-        )
-
-        # Body structure for Stability AI models via Bedrock
-        body = json.dumps({
-            'prompt': image_prompt,
-            'aspect_ratio': IMAGE_ASPECT_RATIO,  # Configurable aspect ratio
-            'mode': IMAGE_GENERATION_MODE,  # Specifying text-to-image mode
-            'output_format': IMAGE_OUTPUT_FORMAT  # Desired output image format
-        })
-
-        model_id = 'stability.sd3-5-large-v1:0'
-        logger.info(f"Invoking Bedrock model {model_id} with prompt: {image_prompt}")
-        response = bedrock_runtime.invoke_model(
-            body=body,
-            modelId=model_id,
-        )
-
-        output_body = json.loads(response["body"].read().decode("utf-8"))
-        base64_output_image = output_body["images"][0]  # Stability Diffusion returns a list of images
-        image_data = base64.b64decode(base64_output_image)
+    from botocore.exceptions import ClientError
 
-        logger.info(f"Successfully generated image using model '{model_id}'.")
-
-        return image_data
+    try:
+        logger.debug('Image prompt: %s', image_prompt)
+        tried_models, last_error = [], None
+        while True:
+            remaining_seconds = get_remaining_time(IMAGE_DEADLINE_RESERVE_SECONDS)
+            model_ids = choose_image_models(remaining_seconds, tried_models)
+            if last_error is not None and (not model_ids or remaining_seconds <= 0):
+                raise last_error
+            if not model_ids:
+                raise ValueError('No image generation model is configured.')
+            model_id = model_ids[0]
+            tried_models.append(model_id)
+            adapter = get_image_adapter(model_id)
+            body = json.dumps(adapter.build_request(image_prompt, aspect_ratio))
+
+            logger.info(f"Invoking Bedrock model {model_id} for a {aspect_ratio} image.")
+            start = time.perf_counter()
+            try:
+                with span('image_call') as call_span:
+                    # a model with fallbacks after it gets fewer attempts, so a throttled model does not use up the budget
+                    output_body = invoke_model(
+                        model_id,
+                        body,
+                        get_image_model_regions(model_id),
+                        hedge_after=IMAGE_HEDGE_AFTER_SECONDS,
+                        reserve_seconds=IMAGE_DEADLINE_RESERVE_SECONDS,
+                        max_attempts=IMAGE_MODEL_ATTEMPTS_BEFORE_FALLBACK if len(model_ids) > 1 else BEDROCK_MAX_ATTEMPTS,
+                        read_body=read_image_response
+                    )
+                    image_data = adapter.parse_response(output_body)
+                    call_span.set(RequestBytes=len(body), ResponseBytes=len(image_data))
+            except Exception as e:
+                record_image_model_call(model_id, time.perf_counter() - start, e)
+                last_error = e
+                logger.warning(f"Image generation with model '{model_id}' failed: {e}")
+                continue
+            record_image_model_call(model_id, time.perf_counter() - start)
+
+            logger.info(f"Successfully generated image using model '{model_id}'.")
+
+            return image_data
 
     except ClientError as e:
         logger.error(
@@ -248,3 +496,30 @@ def generate_image(image_prompt: str) -> Optional[bytes]:
     except Exception as e:
         logger.error(f'An unexpected error occurred in generate_image: {e}', exc_info=True)
         return None
+
+
+def generate_image_variants(image_prompt: str, aspect_ratios: List[str]) -> Dict[str, Optional[memoryview]]:
+    """
+    Generates an image of the same prompt in each aspect ratio, calling the image models concurrently.
+
+    At most `IMAGE_VARIANT_MAX_CONCURRENCY` calls are in flight at once, so the variants
+    take about as long as a single image while staying within the models' quotas. Each
+    variant is routed and retried on its own by `generate_image`, and a throttled model
+    is skipped by the variants routed after it. A failed variant does not affect the others.
+
+    Args:
+        image_prompt (str): The image generation prompt of the post.
+        aspect_ratios (List[str]): The aspect ratios to generate, keys of `IMAGE_SIZES`.
+
+    Returns:
+        Dict[str, Optional[memoryview]]: The image of each aspect ratio, None where the generation failed.
+    """
+    futures = {
+        aspect_ratio: _variant_executor.submit(generate_image, image_prompt, aspect_ratio)
+        for aspect_ratio in aspect_ratios
+    }
+    images = {aspect_ratio: future.result() for aspect_ratio, future in futures.items()}
+    failed = [aspect_ratio for aspect_ratio, image in images.items() if image is None]
+    if failed:
+        logger.warning(f"Generated {len(images) - len(failed)} of {len(images)} image variants, failed: {', '.join(failed)}.")
+    return images
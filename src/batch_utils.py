@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from client_utils import get_client
+from storage_utils import get_store, claim, LocalStore, S3Store
+from ai_utils import build_text_request, extract_generated_data, prepare_prompt, TOKEN_USAGE_FIELDS
+from catalog_utils import pick_events
+from schedule_utils import plan_next
+from config import (
+    AI_MODEL,
+    AI_MODEL_REGION,
+    HISTORICAL_PERIODS,
+    HISTORICAL_PERIOD,
+    BACKLOG_POST_ID,
+    BATCH_INFERENCE_REGION,
+    BATCH_RECORD_COUNT,
+    BATCH_JOBS_PREFIX,
+    BATCH_JOB_NAME_PREFIX,
+    POST_BACKLOG_PREFIX,
+    BACKLOG_CLAIM_PREFIX,
+    BACKLOG_CLAIM_TIMEOUT,
+    COLLECTED_JOBS_PREFIX,
+    EVENT_CATALOG_ENABLED,
+    PERIOD_SCHEDULER_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_INPUT_FILE_NAME = 'input.jsonl'
+BATCH_COMPLETED_STATUSES = ('Completed', 'PartiallyCompleted')
+
+
+
+def build_batch_records(record_count: int = BATCH_RECORD_COUNT) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Builds the records of a Bedrock batch inference job, one prompt per record.
+
+    The historical periods of all records are planned by the period scheduler in one
+    call, continuing its rounds, or taken in order from `HISTORICAL_PERIODS` when the
+    scheduler is disabled. Each record gets its own unused event from the catalog,
+    so a period repeated in the job is not written about twice.
+
+    Args:
+        record_count (int): The number of records to build.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, str]]: The JSONL records and the
+        historical period of each record keyed by its record ID.
+    """
+    records = []
+    periods = {}
+    if PERIOD_SCHEDULER_ENABLED:
+        record_periods = plan_next(record_count)
+    else:
+        record_periods = [HISTORICAL_PERIODS[index % len(HISTORICAL_PERIODS)] for index in range(record_count)]
+    events = pick_events(record_periods) if EVENT_CATALOG_ENABLED else [None] * record_count
+    for index, (historical_period, historical_event) in enumerate(zip(record_periods, events)):
+        record_id = f"REC{index:08d}"
+        records.append({
+            'recordId': record_id,
+            'modelInput': build_text_request(prepare_prompt(historical_period, historical_event), cache_point=False)
+        })
+        periods[record_id] = historical_period
+    return records, periods
+
+
+def submit_batch_job(record_count: int = BATCH_RECORD_COUNT, bedrock_client: Optional[Any] = None) -> str:
+    """
+    Writes a JSONL job input to the content store and submits it as a Bedrock
+    model invocation job.
+
+    Args:
+        record_count (int): The number of posts to generate in the job.
+        bedrock_client (Optional[Any]): The client used to submit the job. A Bedrock
+                                        client is used for the S3 store, and a
+                                        `LocalBatchInferenceClient` for the local store.
+
+    Returns:
+        str: The ARN of the submitted job.
+    """
+    store = get_store()
+    job_name = f"{BATCH_JOB_NAME_PREFIX}{datetime.now(timezone.utc):%Y%m%d-%H%M%S}"
+    job_prefix = f"{BATCH_JOBS_PREFIX}{job_name}/"
+
+    records, periods = build_batch_records(record_count)
+    input_key = job_prefix + BATCH_INPUT_FILE_NAME
+    store.write(input_key, '\n'.join(json.dumps(record) for record in records).encode('utf-8'))
+    store.write(job_prefix + 'manifest.json', json.dumps({'periods': periods}).encode('utf-8'))
+
+    bedrock_client = bedrock_client or _get_batch_client(store)
+    response = bedrock_client.create_model_invocation_job(
+        jobName=job_name,
+        roleArn=os.environ.get('BEDROCK_BATCH_ROLE_ARN'),
+        modelId=AI_MODEL,
+        inputDataConfig={'s3InputDataConfig': {'s3InputFormat': 'JSONL', 's3Uri': store.uri(input_key)}},
+        outputDataConfig={'s3OutputDataConfig': {'s3Uri': store.uri(job_prefix + 'output/')}}
+    )
+    logger.info(f"Submitted batch inference job '{job_name}' with {record_count} records: {response['jobArn']}")
+    return response['jobArn']
+
+
+def collect_batch_job(job_arn: str, bedrock_client: Optional[Any] = None) -> int:
+    """
+    Parses the output of a finished batch inference job into the post backlog.
+
+    Every output record goes through `extract_generated_data`, records that
+    failed or could not be parsed are skipped. The collected job is recorded, so
+    collecting it again adds nothing, and its posts are named by job and record,
+    so a collect interrupted before recording the job rewrites the same posts.
+
+    Args:
+        job_arn (str): The ARN of the batch inference job.
+        bedrock_client (Optional[Any]): The client used to check the job status.
+
+    Returns:
+        int: The number of posts added to the backlog, 0 if the job is not finished yet
+        or was already collected.
+    """
+    store = get_store()
+    bedrock_client = bedrock_client or _get_batch_client(store)
+    job = bedrock_client.get_model_invocation_job(jobIdentifier=job_arn)
+    if job['status'] not in BATCH_COMPLETED_STATUSES:
+        logger.info(f"Batch inference job {job_arn} is not finished yet, status: {job['status']}")
+        return 0
+
+    job_prefix = f"{BATCH_JOBS_PREFIX}{job['jobName']}/"
+    job_id = job_arn.split('/')[-1]
+    collected_key = f"{COLLECTED_JOBS_PREFIX}{job_id}.json"
+    if store.read(collected_key) is not None:
+        logger.info(f"Batch inference job {job_arn} was already collected, skipping it.")
+        return 0
+    # Bedrock writes the output next to the job ID as '<input file name>.out'
+    output = store.read(f"{job_prefix}output/{job_id}/{BATCH_INPUT_FILE_NAME}.out")
+    if output is None:
+        logger.error(f"No output found for batch inference job {job_arn}")
+        return 0
+    manifest = json.loads(store.read(job_prefix + 'manifest.json') or b'{}')
+    periods = manifest.get('periods', {})
+
+    posts = {}
+    token_usage = dict.fromkeys(TOKEN_USAGE_FIELDS, 0)
+    for line in output.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if 'modelOutput' not in record:
+            logger.error(f"Batch record {record.get('recordId')} failed: {record.get('error')}")
+            continue
+        record_usage = record['modelOutput'].get('usage', {})
+        for field in TOKEN_USAGE_FIELDS:
+            token_usage[field] += record_usage.get(field) or 0
+        clean_data = extract_generated_data(record['modelOutput'])
+        if clean_data is None:
+            continue
+        clean_data[HISTORICAL_PERIOD] = periods.get(record.get('recordId'))
+        # the job name starts with its submission time, so the backlog lists the oldest job first
+        posts[f"{job['jobName']}-{record.get('recordId')}"] = clean_data
+
+    add_to_backlog(posts)
+    store.write(collected_key, json.dumps({'job_arn': job_arn, 'post_count': len(posts)}).encode('utf-8'))
+    logger.info(f"Added {len(posts)} posts from batch inference job {job_arn} to the backlog.")
+    logger.info(f"Token usage of batch inference job {job_arn}: {json.dumps(token_usage)}")
+    return len(posts)
+
+
+def add_to_backlog(posts: Dict[str, Dict[str, str]]) -> None:
+    """
+    Adds ready-to-publish posts to the post backlog, each as its own object.
+
+    Args:
+        posts (Dict[str, Dict[str, str]]): The extracted post data to store, keyed by post ID.
+    """
+    store = get_store()
+    for post_id, post in posts.items():
+        store.write(_backlog_post_key(post_id), json.dumps(post).encode('utf-8'))
+
+
+def claim_backlog_post() -> Optional[Dict[str, str]]:
+    """
+    Claims the oldest post in the backlog that no other invocation is publishing.
+
+    The claim is taken with a conditional write (see `storage_utils.claim`), so two
+    concurrent invocations never take the same post. The post stays in the backlog
+    until `remove_from_backlog` is called after publishing it. If the invocation ends
+    without publishing it, a retry of the event resumes it from its checkpoint, and
+    otherwise the claim is taken over by another invocation after `BACKLOG_CLAIM_TIMEOUT` seconds.
+
+    Returns:
+        Optional[Dict[str, str]]: The claimed post data with its backlog ID in
+        `BACKLOG_POST_ID`, or None if no post is available.
+    """
+    store = get_store()
+    post_keys = store.list(POST_BACKLOG_PREFIX)
+    for post_key in post_keys:
+        post_id = post_key[len(POST_BACKLOG_PREFIX):].rsplit('.', 1)[0]
+        if not claim(_claim_key(post_id), BACKLOG_CLAIM_TIMEOUT):
+            continue
+        data = store.read(post_key)
+        if data is None:  # published and removed by another invocation since listing
+            store.delete(_claim_key(post_id))
+            continue
+        post = json.loads(data)
+        post[BACKLOG_POST_ID] = post_id
+        logger.info(f"Claimed pre-generated post '{post_id}' from the backlog, {len(post_keys)} posts in the backlog.")
+        return post
+    return None
+
+
+def remove_from_backlog(post_id: str) -> None:
+    """
+    Removes a published or rejected post and its claim from the backlog.
+
+    Args:
+        post_id (str): The backlog ID of the post.
+    """
+    store = get_store()
+    store.delete(_backlog_post_key(post_id))
+    store.delete(_claim_key(post_id))
+    logger.info(f"Removed post '{post_id}' from the backlog.")
+
+
+def _backlog_post_key(post_id: str) -> str:
+    return f"{POST_BACKLOG_PREFIX}{post_id}.json"
+
+
+def _claim_key(post_id: str) -> str:
+    return f"{BACKLOG_CLAIM_PREFIX}{post_id}.json"
+
+
+def _get_batch_client(store: LocalStore | S3Store) -> Any:
+    """
+    Returns the client for batch inference jobs matching the content store.
+
+    Args:
+        store (LocalStore | S3Store): The content store holding the job input and output.
+
+    Returns:
+        Any: The Bedrock client for the S3 store, or a local stand-in for the local store.
+    """
+    if isinstance(store, LocalStore):
+        return LocalBatchInferenceClient(store)
+    # the batch job has to run in the same region as the bucket with its input and output
+    return get_client('bedrock', BATCH_INFERENCE_REGION)
+
+
+class LocalBatchInferenceClient:
+    """
+    Local stand-in for the Bedrock batch inference API.
+
+    The job runs synchronously when it is submitted: each input record is sent
+    to `model_invoker` and the output is written to the store in the same layout
+    Bedrock uses, so `collect_batch_job` works the same way for both.
+    """
+
+    def __init__(self, store: LocalStore | S3Store, model_invoker: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.store = store
+        self.model_invoker = model_invoker or _invoke_text_model
+
+    def create_model_invocation_job(self, jobName: str, modelId: str, inputDataConfig: Dict[str, Any],
+                                    outputDataConfig: Dict[str, Any], **kwargs: Any) -> Dict[str, str]:
+        """Runs every record of the job input and writes the job output."""
+        job_id = uuid.uuid4().hex[:12]
+        job_arn = f"arn:local:bedrock:{BATCH_INFERENCE_REGION}:000000000000:model-invocation-job/{job_id}"
+        input_key = self._key_from_uri(inputDataConfig['s3InputDataConfig']['s3Uri'])
+        output_prefix = self._key_from_uri(outputDataConfig['s3OutputDataConfig']['s3Uri'])
+
+        output_lines = []
+        for line in (self.store.read(input_key) or b'').decode('utf-8').splitlines():
+            record = json.loads(line)
+            try:
+                record['modelOutput'] = self.model_invoker(record['modelInput'])
+            except Exception as e:
+                record['error'] = {'errorMessage': str(e)}
+            output_lines.append(json.dumps(record))
+
+        input_file_name = input_key.rsplit('/', 1)[-1]
+        self.store.write(f"{output_prefix}{job_id}/{input_file_name}.out", '\n'.join(output_lines).encode('utf-8'))
+        job = {'jobArn': job_arn, 'jobName': jobName, 'modelId': modelId, 'status': 'Completed'}
+        self.store.write(f"{BATCH_JOBS_PREFIX}local-jobs/{job_id}.json", json.dumps(job).encode('utf-8'))
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier: str) -> Dict[str, str]:
+        """Returns the stored description of a local job."""
+        job_id = jobIdentifier.split('/')[-1]
+        job = self.store.read(f"{BATCH_JOBS_PREFIX}local-jobs/{job_id}.json")
+        if job is None:
+            raise ValueError(f"Unknown local batch inference job: {jobIdentifier}")
+        return json.loads(job)
+
+    def _key_from_uri(self, uri: str) -> str:
+        return uri[len(self.store.uri('')):]
+
+
+def _invoke_text_model(model_input: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sends one batch record to the on-demand text generation model.
+
+    Args:
+        model_input (Dict[str, Any]): The request body of the record.
+
+    Returns:
+        Dict[str, Any]: The response body of the model.
+    """
+    response = get_client('bedrock-runtime', AI_MODEL_REGION).invoke_model(
+        modelId=AI_MODEL,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(model_input)
+    )
+    return json.loads(response['body'].read().decode('utf-8'))
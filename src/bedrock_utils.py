@@ -0,0 +1,232 @@
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from client_utils import get_client
+from config import (
+    BEDROCK_MAX_ATTEMPTS,
+    BEDROCK_BACKOFF_BASE_SECONDS,
+    BEDROCK_BACKOFF_MAX_SECONDS,
+    BEDROCK_RETRYABLE_ERROR_CODES,
+    DEFAULT_TIME_BUDGET_SECONDS,
+    LATENCY_HISTOGRAM_BUCKETS
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Hedged and abandoned requests keep running in these threads, so the pool is larger than a single request needs
+_executor = ThreadPoolExecutor(max_workers=8)
+_deadline: Optional[float] = None
+_histograms: Dict[tuple, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a Bedrock call cannot finish within the invocation's time budget."""
+
+
+def set_invocation_deadline(context: Any = None) -> None:
+    """
+    Sets the time budget of the current invocation from the Lambda context.
+
+    Args:
+        context (Any): The Lambda context. Without it, `DEFAULT_TIME_BUDGET_SECONDS` is used.
+    """
+    global _deadline
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        _deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000
+    else:
+        _deadline = time.monotonic() + DEFAULT_TIME_BUDGET_SECONDS
+
+
+def get_remaining_time(reserve_seconds: float = 0.0) -> float:
+    """
+    Returns the time in seconds left in the invocation's budget.
+
+    Args:
+        reserve_seconds (float): Time to keep for the stages that follow the current one.
+
+    Returns:
+        float: The remaining time, negative if the budget is already used up.
+    """
+    if _deadline is None:
+        set_invocation_deadline()
+    return _deadline - time.monotonic() - reserve_seconds
+
+
+def invoke_model(
+        model_id: str,
+        body: str,
+        regions: List[str],
+        hedge_after: Optional[float] = None,
+        reserve_seconds: float = 0.0,
+        max_attempts: int = BEDROCK_MAX_ATTEMPTS,
+        read_body: Optional[Callable[[Any, Optional[int]], Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Invokes a Bedrock model and returns its parsed JSON response body, retrying
+    throttled or failed calls in the configured regions.
+
+    Args:
+        model_id (str): The Bedrock model ID.
+        body (str): The JSON request body.
+        regions (List[str]): The regions to use in order of preference.
+        hedge_after (Optional[float]): Seconds after which a hedged request is sent to
+                                       the next region, if there is more than one.
+        reserve_seconds (float): Time to keep for the stages after this call.
+        max_attempts (int): Attempts at most, including the first one.
+        read_body (Optional[Callable[[Any, Optional[int]], Dict[str, Any]]]): Parses the streamed
+            response body given its content length, instead of reading it whole and parsing it.
+
+    Returns:
+        Dict[str, Any]: The parsed response body.
+
+    Raises:
+        ClientError: On non-retryable errors or when all attempts failed.
+        DeadlineExceededError: When the time budget ran out.
+    """
+    def invoke(region: str) -> Dict[str, Any]:
+        response = get_client('bedrock-runtime', region).invoke_model(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=body
+        )
+        if read_body is not None:
+            content_length = response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('content-length')
+            return read_body(response['body'], int(content_length) if content_length else None)
+        return json.loads(response["body"].read().decode("utf-8"))
+
+    return call_with_retries(invoke, model_id, regions, hedge_after, reserve_seconds, max_attempts)
+
+
+def call_with_retries(
+        operation: Callable[[str], T],
+        model_id: str,
+        regions: List[str],
+        hedge_after: Optional[float] = None,
+        reserve_seconds: float = 0.0,
+        max_attempts: int = BEDROCK_MAX_ATTEMPTS
+) -> T:
+    """
+    Calls a Bedrock operation with retries, cross-region failover and optional hedging.
+
+    Each attempt goes to the next region in the list. If the attempt has not finished
+    after `hedge_after` seconds, the same request is also sent to the following region
+    and the first successful response wins. Retries wait with jittered exponential
+    backoff, and no attempt or wait goes beyond the invocation's time budget.
+
+    Args:
+        operation (Callable[[str], T]): Performs the call in the given region.
+        model_id (str): The Bedrock model ID, used to label latency histograms.
+        regions (List[str]): The regions to use in order of preference.
+        hedge_after (Optional[float]): Seconds after which a hedged request is sent.
+        reserve_seconds (float): Time to keep for the stages after this call.
+        max_attempts (int): Attempts at most, including the first one.
+
+    Returns:
+        T: The result of the first successful call.
+
+    Raises:
+        ClientError: On non-retryable errors or when all attempts failed.
+        DeadlineExceededError: When the time budget ran out.
+    """
+    last_error = None
+    for attempt in range(max_attempts):
+        if get_remaining_time(reserve_seconds) <= 0:
+            break
+
+        region = regions[attempt % len(regions)]
+        futures = {_executor.submit(_timed_call, operation, model_id, region): region}
+        if hedge_after is not None and len(regions) > 1:
+            done, _ = wait(futures, timeout=min(hedge_after, max(get_remaining_time(reserve_seconds), 0)))
+            if not done and get_remaining_time(reserve_seconds) > 0:
+                hedge_region = regions[(attempt + 1) % len(regions)]
+                logger.warning(f"No response from '{model_id}' in {region} after {hedge_after}s, hedging to {hedge_region}.")
+                futures[_executor.submit(_timed_call, operation, model_id, hedge_region)] = hedge_region
+
+        while futures:
+            done, _ = wait(futures, timeout=max(get_remaining_time(reserve_seconds), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceededError(f"No response from '{model_id}' within the invocation's time budget.")
+            for future in done:
+                failed_region = futures.pop(future)
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if not _is_retryable(error):
+                    raise error
+                logger.warning(f"Retryable error from '{model_id}' in {failed_region} (attempt {attempt + 1}): {error}")
+                last_error = error
+
+        backoff = random.uniform(0, min(BEDROCK_BACKOFF_MAX_SECONDS, BEDROCK_BACKOFF_BASE_SECONDS * 2 ** attempt))
+        if attempt + 1 < max_attempts and backoff < get_remaining_time(reserve_seconds):
+            time.sleep(backoff)
+
+    if last_error is not None:
+        raise last_error
+    raise DeadlineExceededError(f"No time left in the invocation's budget to call '{model_id}'.")
+
+
+def get_latency_histograms() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the latency histograms of Bedrock calls per model and region.
+
+    Each histogram has the number of calls per bucket (labelled by the bucket's upper
+    bound in seconds), and the number of errors and total time of all calls.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The histograms keyed by 'model_id region'.
+    """
+    with _lock:
+        return {
+            f"{model_id} {region}": {
+                'buckets': dict(zip([str(bound) for bound in LATENCY_HISTOGRAM_BUCKETS] + ['+Inf'], histogram['counts'])),
+                'errors': histogram['errors'],
+                'total_seconds': round(histogram['total_seconds'], 3)
+            }
+            for (model_id, region), histogram in _histograms.items()
+        }
+
+
+def _timed_call(operation: Callable[[str], T], model_id: str, region: str) -> T:
+    """
+    Calls the operation in the region and records its latency in the region's histogram.
+    """
+    start = time.perf_counter()
+    try:
+        result = operation(region)
+    except Exception:
+        _record_latency(model_id, region, time.perf_counter() - start, failed=True)
+        raise
+    _record_latency(model_id, region, time.perf_counter() - start, failed=False)
+    return result
+
+
+def _record_latency(model_id: str, region: str, duration: float, failed: bool) -> None:
+    with _lock:
+        histogram = _histograms.setdefault((model_id, region), {
+            'counts': [0] * (len(LATENCY_HISTOGRAM_BUCKETS) + 1),
+            'errors': 0,
+            'total_seconds': 0.0
+        })
+        histogram['counts'][bisect_left(LATENCY_HISTOGRAM_BUCKETS, duration)] += 1
+        histogram['total_seconds'] += duration
+        if failed:
+            histogram['errors'] += 1
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """
+    Checks whether a failed call is worth retrying (throttling, service or connection errors).
+    """
+    from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, HTTPClientError
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in BEDROCK_RETRYABLE_ERROR_CODES
+    return isinstance(error, (BotocoreConnectionError, HTTPClientError))
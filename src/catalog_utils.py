@@ -0,0 +1,220 @@
+import logging
+import os
+import random
+import threading
+from array import array
+from hashlib import blake2b
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from storage_utils import get_store
+from config import (
+    EVENT_CATALOG_FILE,
+    EVENT_USAGE_KEY,
+    STATE_WRITE_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), EVENT_CATALOG_FILE)
+
+# The lines of the bundled catalog file, grouped by period, read once per execution environment
+_catalog_lines = None
+_lock = threading.Lock()
+
+
+class HistoricalEvent(NamedTuple):
+    """A candidate event of the catalog."""
+    period: str
+    date: str
+    name: str
+    place: str
+
+    @property
+    def event_id(self) -> int:
+        """A stable 64-bit ID of the event, independent of its position in the catalog file."""
+        key = f"{self.period}\t{self.date}\t{self.name}".encode('utf-8')
+        return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+    def describe(self) -> str:
+        """Returns the event as inserted into the prompt."""
+        return f"{self.name} ({self.date}, {self.place})"
+
+
+class EventCatalog:
+    """
+    The bundled candidate events indexed by historical period, with the IDs of the events already used.
+
+    Loading only groups the catalog lines by period. The lines of a period are parsed
+    into events when the period is first picked from, and its unused events are kept
+    in a list, so picking one is a random position, a swap with the last event and
+    a pop, however large the catalog grows.
+    """
+
+    def __init__(self, lines: Dict[str, List[str]], used_ids: Optional[Set[int]] = None):
+        self._lines = lines
+        self.used_ids = used_ids or set()
+        self._unused: Dict[str, List[HistoricalEvent]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(lines) for lines in self._lines.values())
+
+    def count_unused(self, period: str) -> int:
+        """Returns the number of events of the period not used yet."""
+        return len(self._get_unused(period))
+
+    def pick_unused(self, period: str) -> Optional[HistoricalEvent]:
+        """
+        Returns a random unused event of the period and marks it as used.
+
+        When every event of the period was used, the period's usage is reset, so its
+        events are picked again rather than falling back to a prompt without an event.
+
+        Args:
+            period (str): The historical period, as in `HISTORICAL_PERIODS`.
+
+        Returns:
+            Optional[HistoricalEvent]: The event, or None if the catalog has no events of the period.
+        """
+        unused = self._get_unused(period)
+        if not unused:
+            events = self._parse(period)
+            if not events:
+                return None
+            logger.info(f"All {len(events)} catalog events of '{period}' were used, starting over.")
+            self.used_ids.difference_update(event.event_id for event in events)
+            unused = self._unused[period] = events
+        position = random.randrange(len(unused))
+        unused[position], unused[-1] = unused[-1], unused[position]
+        event = unused.pop()
+        self.used_ids.add(event.event_id)
+        return event
+
+    def usage_to_bytes(self) -> bytes:
+        """Serializes the IDs of the used events as sorted 64-bit integers."""
+        return array('Q', sorted(self.used_ids)).tobytes()
+
+    @classmethod
+    def load(cls, path: str, usage_data: Optional[bytes] = None) -> 'EventCatalog':
+        """
+        Loads the catalog file, one tab separated event per line, and the serialized usage history.
+
+        Lines without the four fields of an event are skipped with a warning. An invalid
+        usage history is logged and replaced by an empty one, the catalog itself is still loaded.
+        """
+        return cls(cls.read_lines(path), cls.parse_usage(usage_data))
+
+    @staticmethod
+    def read_lines(path: str) -> Dict[str, List[str]]:
+        """Reads the lines of the catalog file grouped by period, skipping malformed lines with a warning."""
+        lines: Dict[str, List[str]] = {}
+        with open(path, encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                if line.startswith('#') or not line.strip():
+                    continue
+                line = line.rstrip('\n')
+                if line.count('\t') < 3:
+                    logger.warning(f"Skipping malformed line {line_number} of the event catalog: {line!r}")
+                    continue
+                lines.setdefault(line[:line.index('\t')], []).append(line)
+        return lines
+
+    @staticmethod
+    def parse_usage(usage_data: Optional[bytes]) -> Set[int]:
+        """Parses the serialized usage history, an invalid one is logged and replaced by an empty one."""
+        used_ids = array('Q')
+        if usage_data:
+            try:
+                used_ids.frombytes(usage_data)
+            except ValueError as e:
+                logger.error(f"Invalid event usage history, starting a new one: {e}")
+                used_ids = array('Q')
+        return set(used_ids)
+
+    def _get_unused(self, period: str) -> List[HistoricalEvent]:
+        unused = self._unused.get(period)
+        if unused is None:
+            unused = self._unused[period] = [
+                event for event in self._parse(period) if event.event_id not in self.used_ids
+            ]
+        return unused
+
+    def _parse(self, period: str) -> List[HistoricalEvent]:
+        return [HistoricalEvent(*line.split('\t', 3)) for line in self._lines.get(period, [])]
+
+
+def get_event_catalog() -> EventCatalog:
+    """
+    Returns the event catalog with its usage history as currently stored.
+
+    The catalog file is read on first use, not at import time, so its size does not add
+    to the cold start. The usage history is read on every call, so events used by other
+    execution environments are not picked again.
+
+    Returns:
+        EventCatalog: The catalog.
+    """
+    catalog, _ = _read_catalog()
+    return catalog
+
+
+def pick_events(periods: List[str]) -> List[Optional[HistoricalEvent]]:
+    """
+    Picks an unused catalog event for each period and saves the usage history once.
+
+    The events are picked from the usage history as currently stored, and it is written
+    back only if no other writer changed it in between, otherwise the events are picked
+    again from the new history, so concurrent runs do not undo each other's usage.
+
+    Args:
+        periods (List[str]): The historical periods, a period may appear more than once.
+
+    Returns:
+        List[Optional[HistoricalEvent]]: The event of each period, None where the catalog
+                                         has no events of the period or could not be loaded.
+    """
+    for _ in range(STATE_WRITE_ATTEMPTS):
+        try:
+            catalog, version = _read_catalog()
+            events = [catalog.pick_unused(period) for period in periods]
+        except Exception as e:
+            logger.error(f"Failed to pick events from the catalog: {e}")
+            return [None] * len(periods)
+
+        # a lost write only makes the events available again, it must not fail the run
+        try:
+            if get_store().write_if_unchanged(EVENT_USAGE_KEY, catalog.usage_to_bytes(), version):
+                return events
+        except Exception as e:
+            logger.error(f"Failed to save event usage history: {e}")
+            return events
+    logger.error(f"The event usage history kept changing, the events were not recorded after {STATE_WRITE_ATTEMPTS} attempts.")
+    return events
+
+
+def pick_event(period: str) -> Optional[HistoricalEvent]:
+    """
+    Picks an unused catalog event of the period and records it as used.
+
+    Args:
+        period (str): The historical period, as in `HISTORICAL_PERIODS`.
+
+    Returns:
+        Optional[HistoricalEvent]: The event, or None if there is none for the period.
+    """
+    return pick_events([period])[0]
+
+
+def _read_catalog() -> Tuple[EventCatalog, Optional[str]]:
+    """
+    Returns the catalog with the stored usage history, and the store version of the history.
+
+    Returns:
+        Tuple[EventCatalog, Optional[str]]: The catalog, and the version of the usage
+        history, None if there is none.
+    """
+    global _catalog_lines
+    with _lock:
+        if _catalog_lines is None:
+            _catalog_lines = EventCatalog.read_lines(CATALOG_PATH)
+            logger.info(f"Loaded event catalog with {sum(len(lines) for lines in _catalog_lines.values())} events.")
+    usage_data, version = get_store().read_version(EVENT_USAGE_KEY)
+    return EventCatalog(_catalog_lines, EventCatalog.parse_usage(usage_data)), version
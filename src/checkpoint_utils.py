@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from storage_utils import get_store
+from image_utils import ImageVariant, ProcessedImage
+from facebook_utils import PagePublishResult
+from config import (
+    CHECKPOINT_PREFIX,
+    IMAGE_STORE_PREFIX,
+    IDEMPOTENCY_KEY_FIELD
+)
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_KEY_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]')
+
+
+class PipelineCheckpoint:
+    """
+    The completed stages of one pipeline run, saved to the store after every stage.
+
+    The checkpoint holds the generated post, references to the content-addressed image
+    and its variants, and the pages already published to. A rerun with the same idempotency key (an
+    EventBridge or Lambda retry, or a manual rerun) loads it and resumes at the first
+    incomplete stage, so Bedrock is not called again and no page gets the post twice.
+    """
+
+    def __init__(self, key: str, state: Optional[Dict[str, Any]] = None, store_key: Optional[str] = None):
+        self.key = key
+        # outbox items are checkpoints kept under the outbox prefix
+        self.store_key = store_key or _checkpoint_key(key)
+        self.state = state or {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'post': None,
+            'image': None,
+            'variants': [],
+            'pages': {},
+            'completed': False
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def completed(self) -> bool:
+        """True once the post was published to every page and the notification was sent."""
+        return self.state['completed']
+
+    def get_post(self, post_source: Callable[[], Optional[Dict[str, str]]]) -> Optional[Dict[str, str]]:
+        """
+        Returns the checkpointed post, or gets a new one from the source and checkpoints it.
+
+        Args:
+            post_source (Callable[[], Optional[Dict[str, str]]]): Returns the post data to publish.
+
+        Returns:
+            Optional[Dict[str, str]]: The post data, or None if the source returned none.
+        """
+        if self.state['post'] is not None:
+            logger.info(f"Resuming checkpoint '{self.key}' with the already generated post.")
+            return self.state['post']
+        post = post_source()
+        if post is not None:
+            with self._lock:
+                self.state['post'] = post
+                self._save()
+        return post
+
+    def load_image(self) -> Optional[ProcessedImage]:
+        """
+        Returns the checkpointed image ready for upload, or None if there is none yet.
+
+        Returns:
+            Optional[ProcessedImage]: The image read from the store.
+        """
+        if self.state['image'] is None:
+            return None
+        image = read_image(self.state['image'])
+        if image is None:
+            logger.warning(f"Checkpointed image '{self.state['image']['key']}' is missing from the store.")
+            return None
+        logger.info(f"Resuming checkpoint '{self.key}' with the already generated image.")
+        return image
+
+    def load_variants(self) -> List[ImageVariant]:
+        """
+        Returns the checkpointed image variants, leaving out those missing from the store.
+
+        Returns:
+            List[ImageVariant]: The image variants read from the store.
+        """
+        return read_variants(self.state.get('variants', []))
+
+    def save_image(self, image: ProcessedImage, variants: Optional[List[ImageVariant]] = None) -> None:
+        """
+        Writes the image and its variants to the store under the hash of their content and checkpoints their keys.
+
+        Args:
+            image (ProcessedImage): The image ready for upload.
+            variants (Optional[List[ImageVariant]]): The image in other aspect ratios.
+        """
+        try:
+            image_reference = store_image(image)
+            variant_references = store_variants(variants or [])
+        except Exception as e:
+            logger.error(f"Failed to store image for checkpoint '{self.key}': {e}")
+            return
+        with self._lock:
+            self.state['image'] = image_reference
+            self.state['variants'] = variant_references
+            self._save()
+
+    def published_results(self) -> List[PagePublishResult]:
+        """
+        Returns the results of the pages the post was already published to.
+
+        Returns:
+            List[PagePublishResult]: The checkpointed results of the published pages.
+        """
+        with self._lock:
+            return [PagePublishResult(**result) for result in self.state['pages'].values()]
+
+    def record_page(self, result: PagePublishResult) -> None:
+        """
+        Checkpoints a page right after the post was published to it. Called from the publishing threads.
+
+        Args:
+            result (PagePublishResult): The publishing result of the page, ignored if it failed.
+        """
+        if not result.published:
+            return
+        with self._lock:
+            self.state['pages'][result.page_name] = result._asdict()
+            self._save()
+
+    def complete(self) -> None:
+        """Marks the run as complete, so further reruns with the same key do nothing."""
+        with self._lock:
+            self.state['completed'] = True
+            self._save()
+
+    def _save(self) -> None:
+        # a failed write only loses the ability to resume, it must not fail the run itself
+        try:
+            get_store().write(self.store_key, json.dumps(self.state).encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint '{self.key}': {e}")
+
+
+def store_image(image: ProcessedImage) -> Dict[str, str]:
+    """
+    Writes an image to the store, named by the SHA-256 of its content.
+
+    The same image is stored only once, however many checkpoints or outbox items refer to it.
+
+    Args:
+        image (ProcessedImage): The image ready for upload.
+
+    Returns:
+        Dict[str, str]: The reference to the stored image, with its store key, file name and MIME type.
+    """
+    extension = os.path.splitext(image.file_name)[1]
+    image_key = f"{IMAGE_STORE_PREFIX}{hashlib.sha256(image.data).hexdigest()}{extension}"
+    get_store().write(image_key, image.data)
+    return {'key': image_key, 'file_name': image.file_name, 'file_type': image.file_type}
+
+
+def read_image(image_reference: Dict[str, str]) -> Optional[ProcessedImage]:
+    """
+    Reads an image written by `store_image`.
+
+    Args:
+        image_reference (Dict[str, str]): The reference returned by `store_image`.
+
+    Returns:
+        Optional[ProcessedImage]: The image ready for upload, or None if it is not in the store.
+    """
+    data = get_store().read(image_reference['key'])
+    if data is None:
+        return None
+    return ProcessedImage(data, image_reference['file_name'], image_reference['file_type'], len(data), len(data), 0.0)
+
+
+def store_variants(variants: List[ImageVariant]) -> List[Dict[str, str]]:
+    """
+    Writes image variants to the store with `store_image`.
+
+    Args:
+        variants (List[ImageVariant]): The image variants.
+
+    Returns:
+        List[Dict[str, str]]: The reference to each stored image, with its aspect ratio and upload target.
+    """
+    return [
+        {'aspect_ratio': variant.aspect_ratio, 'target': variant.target, **store_image(variant.image)}
+        for variant in variants
+    ]
+
+
+def read_variants(variant_references: List[Dict[str, str]]) -> List[ImageVariant]:
+    """
+    Reads image variants written by `store_variants`, leaving out those missing from the store.
+
+    Args:
+        variant_references (List[Dict[str, str]]): The references returned by `store_variants`.
+
+    Returns:
+        List[ImageVariant]: The image variants ready for upload.
+    """
+    variants = []
+    for reference in variant_references:
+        image = read_image(reference)
+        if image is None:
+            logger.warning(f"Image variant '{reference['key']}' is missing from the store, it is not uploaded.")
+            continue
+        variants.append(ImageVariant(reference['aspect_ratio'], reference['target'], image))
+    return variants
+
+
+def get_idempotency_key(event: Any, context: Any) -> Optional[str]:
+    """
+    Returns the idempotency key of an invocation.
+
+    An explicit key in the event (for a manual rerun) comes first, then the ID of the
+    EventBridge event, which stays the same when EventBridge retries the delivery, then
+    the Lambda request ID, which stays the same when Lambda retries an async invocation.
+
+    Args:
+        event (Any): The Lambda event.
+        context (Any): The Lambda context.
+
+    Returns:
+        Optional[str]: The idempotency key, or None if the invocation has none.
+    """
+    if isinstance(event, dict):
+        key = event.get(IDEMPOTENCY_KEY_FIELD) or event.get('id')
+        if key:
+            return str(key)
+    return getattr(context, 'aws_request_id', None)
+
+
+def load_checkpoint(key: str) -> PipelineCheckpoint:
+    """
+    Loads the checkpoint of the idempotency key, or starts a new one.
+
+    Args:
+        key (str): The idempotency key of the invocation.
+
+    Returns:
+        PipelineCheckpoint: The checkpoint of the earlier run with the key, or an empty one.
+    """
+    try:
+        data = get_store().read(_checkpoint_key(key))
+    except Exception as e:
+        logger.error(f"Failed to load checkpoint '{key}', starting over: {e}")
+        data = None
+    if data is None:
+        return PipelineCheckpoint(key)
+    try:
+        return PipelineCheckpoint(key, json.loads(data))
+    except ValueError as e:
+        logger.error(f"Invalid checkpoint '{key}', starting over: {e}")
+        return PipelineCheckpoint(key)
+
+
+def _checkpoint_key(key: str) -> str:
+    return f"{CHECKPOINT_PREFIX}{UNSAFE_KEY_CHARACTERS.sub('_', key)}.json"
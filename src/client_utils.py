@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+from config import (
+    BOTO_MAX_POOL_CONNECTIONS,
+    BOTO_MAX_ATTEMPTS,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE
+)
+
+# boto3 and requests are imported when the first client or session is created, not on import of this module
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# Module-scope state survives between warm Lambda invocations of the same execution environment
+_boto_session = None
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_http_session: Optional['requests.Session'] = None
+_lock = threading.Lock()
+
+POOL_STATS = {
+    'client_hits': 0,
+    'client_misses': 0,
+    'session_hits': 0,
+    'session_misses': 0
+}
+
+
+def get_client(service_name: str, region_name: Optional[str] = None) -> Any:
+    """
+    Returns a shared boto3 client for the given service and region.
+
+    Clients are created once per execution environment and reused by later
+    calls and warm invocations, which skips client construction and reuses
+    the connections already opened by the client's pool.
+
+    Args:
+        service_name (str): The AWS service name (e.g., 'bedrock-runtime', 'sns').
+        region_name (Optional[str]): The AWS region. The default region of the
+                                     environment is used when None.
+
+    Returns:
+        Any: The boto3 client for the service and region.
+    """
+    global _boto_session
+    key = (service_name, region_name)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            POOL_STATS['client_hits'] += 1
+            return client
+
+        POOL_STATS['client_misses'] += 1
+        import boto3
+        from botocore.config import Config
+        # boto3's default session is not thread-safe, so clients are created from a dedicated session under the lock
+        if _boto_session is None:
+            _boto_session = boto3.session.Session()
+        client_config = Config(max_pool_connections=BOTO_MAX_POOL_CONNECTIONS, tcp_keepalive=True)
+        if service_name in BOTO_MAX_ATTEMPTS:
+            client_config = client_config.merge(Config(retries={'total_max_attempts': BOTO_MAX_ATTEMPTS[service_name]}))
+        client = _boto_session.client(
+            service_name=service_name,
+            region_name=region_name,
+            config=client_config
+        )
+        _clients[key] = client
+        logger.info(f"Created new '{service_name}' client for region '{region_name}'.")
+        return client
+
+
+def get_http_session() -> 'requests.Session':
+    """
+    Returns the shared `requests.Session` used for HTTP calls to external APIs.
+
+    The session keeps connections alive between requests and invocations,
+    so only the first request to a host pays for the TCP and TLS handshakes.
+
+    Returns:
+        requests.Session: The pooled HTTP session.
+    """
+    global _http_session
+    with _lock:
+        if _http_session is not None:
+            POOL_STATS['session_hits'] += 1
+            return _http_session
+
+        POOL_STATS['session_misses'] += 1
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _http_session = session
+        return session
+
+
+def warm_up_clients(clients: Iterable[Tuple[str, Optional[str]]]) -> float:
+    """
+    Creates the given boto3 clients and the HTTP session ahead of their first use.
+
+    Meant for the Lambda init phase: importing boto3 and requests and loading the
+    service models of the clients is CPU-bound work, which is done before the first
+    invocation starts. No network calls are made. Failures are logged and ignored,
+    as the clients are created again on first use.
+
+    Args:
+        clients (Iterable[Tuple[str, Optional[str]]]): The service names and regions of the clients.
+
+    Returns:
+        float: The time in seconds the warmup took.
+    """
+    start = time.perf_counter()
+    try:
+        for service_name, region_name in clients:
+            get_client(service_name, region_name)
+        get_http_session()
+    except Exception as e:
+        logger.warning(f"Client warmup failed, clients are created on first use: {e}")
+    return time.perf_counter() - start
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """
+    Returns the registry counters together with the number of HTTP connections
+    opened so far by the shared session.
+
+    A warm invocation is expected to increase only the hit counters, while
+    'http_connections_opened' stays the same if the keep-alive connection was reused.
+
+    Returns:
+        Dict[str, int]: The pool counters.
+    """
+    with _lock:
+        stats = dict(POOL_STATS)
+        stats['http_connections_opened'] = 0
+        if _http_session is not None:
+            for adapter in set(_http_session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    stats['http_connections_opened'] += pools[pool_key].num_connections
+        return stats
+
+
+def reset_pools() -> None:
+    """
+    Drops all shared clients and the HTTP session, as in a new execution environment.
+    """
+    global _boto_session, _http_session
+    with _lock:
+        _clients.clear()
+        if _http_session is not None:
+            _http_session.close()
+        _http_session = None
+        _boto_session = None
+        for counter in POOL_STATS:
+            POOL_STATS[counter] = 0
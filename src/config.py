@@ -2,8 +2,10 @@
 GENERATED_POST = "generated_post"
 TAGS = 'tags'
 IMAGE_GENERATION_PROMPT = 'image_generation_prompt'
+HISTORICAL_PERIOD = 'historical_period'
+BACKLOG_POST_ID = 'backlog_post_id'
 
-# List of historical periods for random selection
+# List of historical periods, assigned to posts by the period scheduler
 HISTORICAL_PERIODS = [
     "Prehistory",
     "Ancient History",
@@ -98,31 +100,219 @@ Your audience is a general Facebook audience interested in surprising or signifi
 in an accessible and engaging way. The post needs to be concise (under 300 words) and end with five relevant hashtags.
 It should include some emojis.
 """
-PROMPT_PERIOD_INSTRUCTION = "1. Choose a historical event from "
+PROMPT_PERIOD_INSTRUCTION = "1. Write about the historical event given in the user message. If only a historical period is given, choose an event from it."
 PROMPT_INSTRUCTIONS = """
 2.  Briefly explain what happened, when, and where. Focus on the most compelling details.
 3.  Highlight why is this event interesting or noteworthy.
 4.  Include 5 relevant hashtags that summarize the content and encourage discoverability.
 """
+# The image prompt comes first, so with streaming and a single candidate the image can be generated while the post is still being written
 PROMPT_OUTPUT_FORMAT = f"""
-Output Format: Your response MUST be a valid JSON object with the following keys:
+Output Format: Your response MUST be a valid JSON object with the following keys, in this order:
 {{
-  "{GENERATED_POST}": "Your engaging Facebook post text goes here (max 300 words).",
-  "{IMAGE_GENERATION_PROMPT}": "A detailed prompt for image generation AI related to the event."
+  "{IMAGE_GENERATION_PROMPT}": "A detailed prompt for image generation AI related to the event.",
+  "{GENERATED_POST}": "Your engaging Facebook post text goes here (max 300 words)."
 }}
 """
 
+PROMPT_PERIOD_MESSAGE = "Historical period: " # The user message, followed by the randomly chosen historical period
+PROMPT_EVENT_MESSAGE = "\nHistorical event: " # Follows the period in the user message, with the event picked from the catalog
+# The static prompt components are sent as a system block, with a cache point when enabled, so Bedrock can reuse the
+# processed prefix. Nova models only cache prefixes of at least 1,000 tokens, the current prompt is about 250 tokens.
+PROMPT_CACHING_ENABLED = False # Add the cache point, only done when the prefix reaches PROMPT_CACHE_MIN_TOKENS
+PROMPT_CACHE_MIN_TOKENS = 1000 # Minimum prefix length in tokens the text model caches
+PROMPT_CHARS_PER_TOKEN = 4 # Characters per token, to estimate the prefix length of English text
+
+# --- Event Catalog Configuration ---
+EVENT_CATALOG_ENABLED = True # Insert an unused event from the bundled catalog into the prompt, instead of letting the model choose one
+EVENT_CATALOG_FILE = 'event_catalog.tsv' # Candidate events per historical period (period, date, name, place), bundled next to the code
+EVENT_USAGE_KEY = 'catalog/used_events.bin' # Store key of the IDs of the catalog events already used in a prompt
+
+# --- Period Scheduler Configuration ---
+PERIOD_SCHEDULER_ENABLED = True # Assign periods by weighted sampling without replacement, otherwise pick one at random
+PERIOD_SCHEDULE_KEY = 'schedule/periods.json' # Store key of the scheduler state (current round, recent and assigned periods)
+PERIOD_COOLDOWN_ASSIGNMENTS = 12 # A period is not assigned again within this many assignments (12 weeks with weekly posts)
+PERIOD_WEIGHTS = {} # Relative weights of periods, e.g. {"World War II": 2.0}, unlisted periods have 1.0 and 0 excludes a period
+
+# --- Streaming Text Generation Configuration ---
+STREAMING_TEXT_GENERATION = True # Stream the text model output and start the image generation as soon as its prompt is complete
+STREAM_MAX_PREAMBLE_CHARS = 200 # Output without a JSON object within this many characters is treated as malformed
+IMAGE_RESPONSE_CHUNK_SIZE = 64 * 1024 # Bytes of the image model response read and base64 decoded at a time
+
 # --- Facebook Graph API Configuration ---
 GRAPH_API_VERSION = "v23.0"
+GRAPH_API_BASE_URL = "https://graph.facebook.com"
+GRAPH_WARMUP_TIMEOUT = 3 # Seconds to wait for the Graph API connection warmup request
+GRAPH_INVALID_TOKEN_ERROR_CODE = 190 # Graph API error code for an invalid or expired access token
+# How the feed post waits for the uploaded photo: "poll" checks until the photo is processed,
+# "batch" sends upload and feed post in one Graph API batch request, "sleep" waits a fixed second
+FACEBOOK_PUBLISH_STRATEGY = 'poll'
+GRAPH_PHOTO_READY_TIMEOUT = 5 # Seconds to wait at most for the uploaded photo to be processed
+GRAPH_PHOTO_POLL_INITIAL_DELAY = 0.05 # First delay between photo readiness checks, doubled after each check
+GRAPH_PHOTO_POLL_MAX_DELAY = 0.25 # Upper bound of the delay between photo readiness checks
 PUBLISH_WHEN_POSTED = 'false' # Boolean string for Facebook API (true for immediate publish, false for draft)
-IMAGE_FILE_NAME = 'image.png' # Default filename for the image when posting to Facebook
-IMAGE_FILE_TYPE = 'image/png' # MIME type of the image file
+IMAGE_UPLOAD_FORMAT = 'jpeg' # Format of the uploaded image after post-processing ("jpeg", "webp" or "png")
+IMAGE_UPLOAD_EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+IMAGE_FILE_NAME = f'image.{IMAGE_UPLOAD_EXTENSIONS[IMAGE_UPLOAD_FORMAT]}' # Default filename for the image when posting to Facebook
+IMAGE_FILE_TYPE = f'image/{IMAGE_UPLOAD_FORMAT}' # MIME type of the image file
+
+# --- Multi-Page Publishing Configuration ---
+# Pages are read from the JSON secret named by the FACEBOOK_PAGES_SECRET_NAME environment variable when set,
+# as a list of {"name": ..., "page_id": ..., "access_token": ...} objects, otherwise the single configured page is used
+DEFAULT_PAGE_NAME = 'default' # Name of the single page configured with the page ID and page token secrets
+PAGE_PUBLISH_MAX_WORKERS = 4 # Maximum number of pages published to concurrently
+GRAPH_PAGE_RATE_LIMIT = 5 # Graph API calls per second allowed for a single page
+GRAPH_PAGE_BURST = 10 # Graph API calls a single page can make at once before the rate limit applies
+GRAPH_APP_RATE_LIMIT = 20 # Graph API calls per second allowed for the whole app, across all pages
+GRAPH_APP_BURST = 40 # Graph API calls the app can make at once before the rate limit applies
+GRAPH_RATE_LIMIT_MAX_WAIT = 10 # Seconds a Graph API call waits at most for the rate limit before failing
 
 # --- AI Model Configuration for Image Generation (Bedrock) ---
-IMAGE_GENERATION_MODEL = 'stability.sd3-5-large-v1:0'
+IMAGE_GENERATION_MODEL = 'stability.sd3-5-large-v1:0' # Preferred image model
+# Image models in order of preference, the later ones are faster fallbacks (model access has to be granted for each)
+IMAGE_GENERATION_MODELS = [IMAGE_GENERATION_MODEL, 'stability.stable-image-core-v1:1', 'amazon.nova-canvas-v1:0']
 IMAGE_ASPECT_RATIO = "16:9" # Desired aspect ratio for generated images (e.g., "16:9", "1:1", "4:3")
 IMAGE_GENERATION_MODE = "text-to-image" # Mode of image generation (e.g., "text-to-image")
 IMAGE_OUTPUT_FORMAT = "png" # Output format for the generated image (e.g., "png", "jpeg")
+# Width and height for models taking a pixel size instead of an aspect ratio (multiples of 16 for Nova Canvas)
+IMAGE_SIZES = {"16:9": (1280, 720), "1:1": (1024, 1024), "9:16": (720, 1280), "4:3": (1152, 864), "3:2": (1152, 768)}
+
+# --- Image Variants Configuration ---
+IMAGE_VARIANTS_ENABLED = False # Also generate the aspect ratios of IMAGE_VARIANT_TARGETS from the same image prompt
+# Where each aspect ratio is uploaded: "feed" variants are attached to the feed post, "story" variants are posted as Page stories
+IMAGE_VARIANT_TARGETS = {"16:9": "feed", "1:1": "feed", "9:16": "story"}
+IMAGE_VARIANT_MAX_CONCURRENCY = 3 # Image model calls in flight at once per post, keep within the models' requests per minute quota
+
+# --- Image Model Routing Configuration ---
+IMAGE_MODEL_REGIONS = { # Regions of each image model in order of preference, the first one is used by default
+    'stability.sd3-5-large-v1:0': [DEFAULT_REGION],
+    'stability.stable-image-core-v1:1': [DEFAULT_REGION],
+    'amazon.nova-canvas-v1:0': ['us-east-1'],
+}
+IMAGE_MODEL_EXPECTED_SECONDS = { # Latency assumed for each image model until its calls were measured
+    'stability.sd3-5-large-v1:0': 12,
+    'stability.stable-image-core-v1:1': 5,
+    'amazon.nova-canvas-v1:0': 6,
+}
+IMAGE_MODEL_SLOW_SECONDS = 20 # Models with a recent average latency above this are skipped for the next ones
+IMAGE_MODEL_MAX_ERROR_RATE = 0.5 # Models with a recent error rate above this are skipped for the next ones
+IMAGE_MODEL_THROTTLE_COOLDOWN_SECONDS = 60 # How long a throttled model is skipped for the next ones
+IMAGE_MODEL_STATS_WEIGHT = 0.3 # Weight of the latest call in the moving averages of latency and error rate
+IMAGE_MODEL_STATS_TTL_SECONDS = 900 # Stats of a model not called for this long are reset to its expected latency
+IMAGE_MODEL_ATTEMPTS_BEFORE_FALLBACK = 2 # Attempts of a model before falling back, the last model gets BEDROCK_MAX_ATTEMPTS
+
+# --- Bedrock Retry, Hedging and Failover Configuration ---
+AI_MODEL_FALLBACK_REGIONS = [] # Extra regions for the text model, tried in order on retries and hedging (e.g. ["us-west-2"])
+IMAGE_MODEL_FALLBACK_REGIONS = [] # Extra regions for every image model, tried after the regions in IMAGE_MODEL_REGIONS
+TEXT_HEDGE_AFTER_SECONDS = 8 # Send a hedged text request to the next region when no response arrived by then
+IMAGE_HEDGE_AFTER_SECONDS = 15 # Send a hedged image request to the next region when no response arrived by then
+TEXT_DEADLINE_RESERVE_SECONDS = 12 # Time left for image generation and publishing when retrying the text call
+IMAGE_DEADLINE_RESERVE_SECONDS = 4 # Time left for publishing when retrying the image call
+DEFAULT_TIME_BUDGET_SECONDS = 30 # Time budget used without a Lambda context, e.g. when running locally
+BEDROCK_MAX_ATTEMPTS = 4 # Attempts per Bedrock call, including the first one
+BEDROCK_BACKOFF_BASE_SECONDS = 0.5 # Base of the jittered exponential backoff between attempts
+BEDROCK_BACKOFF_MAX_SECONDS = 4 # Upper bound of a single backoff
+BEDROCK_RETRYABLE_ERROR_CODES = [
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+]
+LATENCY_HISTOGRAM_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32] # Upper bounds in seconds of the latency histogram buckets
+
+# --- Client and Connection Pool Configuration ---
+BOTO_MAX_POOL_CONNECTIONS = 10 # Maximum number of connections kept by each boto3 client
+BOTO_MAX_ATTEMPTS = {'bedrock-runtime': 1} # botocore retry attempts per service, Bedrock retries are handled by bedrock_utils
+HTTP_POOL_CONNECTIONS = 4 # Number of hosts the shared HTTP session keeps connection pools for
+HTTP_POOL_MAXSIZE = 10 # Maximum number of keep-alive connections kept per host
+
+# --- Startup Configuration ---
+# "init_warmup" imports boto3, requests and Pillow and creates the clients every invocation needs
+# during the Lambda init phase, "lazy" defers all of it to first use
+STARTUP_MODE = 'init_warmup'
+INIT_WARMUP_CLIENTS = [ # Services and regions of the clients created during the init phase
+    ('bedrock-runtime', AI_MODEL_REGION),
+    ('bedrock-runtime', DEFAULT_REGION),
+    ('secretsmanager', None),
+    ('sns', DEFAULT_REGION),
+    ('s3', DEFAULT_REGION),
+]
+
+# --- Metrics and Logging Configuration ---
+METRICS_ENABLED = True # Emit per-stage durations, payload sizes and token counts in CloudWatch embedded metric format
+METRICS_NAMESPACE = 'MomentsInHistory' # CloudWatch namespace of the emitted metrics
+VERBOSE_LOGGING = False # Log full events, prompts and posts at DEBUG level, otherwise these log lines are not even built
+
+# --- Secrets Manager Configuration ---
+SECRET_CACHE_TTL_SECONDS = 3600 # How long fetched secrets are reused between warm invocations
+
+# --- Content Store Configuration ---
+# S3 bucket from the CONTENT_BUCKET_NAME environment variable is used when set, otherwise this local directory
+LOCAL_STORE_DIR = '/tmp/moments-in-history'
+STATE_WRITE_ATTEMPTS = 5 # Attempts of a conditional state update, each after another writer changed the state in between
+
+# --- Near-Duplicate Detection Configuration ---
+DEDUP_INDEX_KEY = 'dedup/post_index.bin' # Store key of the similarity index of published posts
+DEDUP_SIGNATURE_SIZE = 64 # Number of MinHash values per post
+DEDUP_BAND_SIZE = 4 # MinHash values per LSH band, 16 bands of 4 find posts with similarity above ~0.5
+DEDUP_SHINGLE_SIZE = 3 # Number of consecutive words in a shingle
+DUPLICATE_SIMILARITY_THRESHOLD = 0.5 # Posts at least this similar to a published post are regenerated
+
+# --- Post Candidate Scoring Configuration ---
+POST_CANDIDATE_COUNT = 3 # Posts generated concurrently for one period, only the best scoring one gets an image (1 disables it and starts the image while the text streams)
+MAX_POST_TEXT_CALLS = 5 # Text model calls per post at most, the candidates included, when no candidate is acceptable one more is generated at a time
+POST_REGENERATION_TIME_SECONDS = 8 # Time a regenerated candidate may take, none is started with less time left before the text deadline reserve
+MAX_POST_WORDS = 300 # Posts with more words break the prompt's length rule
+REQUIRED_HASHTAG_COUNT = 5 # Number of hashtags the prompt asks for
+# Score of a candidate: the weight of every rule it follows, plus the novelty weight times (1 - similarity to published posts)
+CANDIDATE_SCORE_WEIGHTS = {
+    'word_count': 1.0,
+    'hashtags': 1.0,
+    'emoji': 0.5,
+    'novelty': 2.0,
+}
+
+# --- Bedrock Batch Inference Configuration ---
+BATCH_INFERENCE_REGION = DEFAULT_REGION # Batch jobs must run in the region of the content bucket
+BATCH_RECORD_COUNT = 100 # Number of posts generated per batch job (Bedrock requires at least 100 records)
+BATCH_JOBS_PREFIX = 'batch-jobs/' # Store prefix for batch job input, output and manifests
+BATCH_JOB_NAME_PREFIX = 'moments-in-history-'
+USE_POST_BACKLOG = True # Publish pre-generated posts from the backlog before generating new ones
+POST_BACKLOG_PREFIX = 'backlog/posts/' # Store prefix of the pre-generated posts waiting to be published, one object per post
+BACKLOG_CLAIM_PREFIX = 'backlog/claims/' # Store prefix of the claims of backlog posts taken by a running invocation
+BACKLOG_CLAIM_TIMEOUT = 900 # Seconds after which the claim of an invocation that never finished is taken over
+COLLECTED_JOBS_PREFIX = 'backlog/collected-jobs/' # Store prefix recording the batch jobs already moved to the backlog
+
+# --- Pipeline Checkpoint Configuration ---
+PIPELINE_CHECKPOINTS_ENABLED = True # Checkpoint the post, image and published pages, so a rerun of the same event resumes where it failed
+CHECKPOINT_PREFIX = 'checkpoints/' # Store prefix of the checkpoints, one JSON object per idempotency key
+IMAGE_STORE_PREFIX = 'images/' # Store prefix of the generated images, named by the SHA-256 of their content
+IDEMPOTENCY_KEY_FIELD = 'idempotency_key' # {"idempotency_key": "..."} reruns the invocation with that key, logged by every run
+
+# --- Outbox Configuration ---
+OUTBOX_PREFIX = 'outbox/' # Store prefix of the posts generated ahead, publish_post_lambda publishes the oldest one
+OUTBOX_TARGET_SIZE = 3 # Number of posts a fill_outbox run keeps ready in the outbox
+OUTBOX_POST_TIME_BUDGET = 20 # Seconds generating one post may take, no new post is started with less time left
+OUTBOX_EMPTY_MESSAGE = 'The outbox is empty, no post was published.'
+OUTBOX_MAX_ATTEMPTS = 3 # Publisher runs an outbox post may fail on every page before it is moved to the dead letters
+OUTBOX_DEAD_LETTER_PREFIX = 'dead-letter/outbox/' # Store prefix of the outbox posts that kept failing, kept for inspection
+OUTBOX_CLAIM_PREFIX = 'claims/outbox/' # Store prefix of the claims of outbox posts taken by a running publisher
+OUTBOX_CLAIM_TIMEOUT = 300 # Seconds after which the claim of a publisher run that never finished is taken over
+
+# --- Lambda Event Modes ---
+BATCH_SUBMIT_MODE = 'batch_submit' # {"mode": "batch_submit", "record_count": 100} submits a batch inference job
+BATCH_COLLECT_MODE = 'batch_collect' # {"mode": "batch_collect", "job_arn": "..."} moves job output to the backlog
+FILL_OUTBOX_MODE = 'fill_outbox' # {"mode": "fill_outbox", "target_size": 3} generates posts into the outbox until it has target_size
+
+# --- Lambda Orchestration Configuration ---
+CONCURRENT_ORCHESTRATION = True # Run secrets fetch, Graph API warmup and SNS client setup alongside the text generation
+ORCHESTRATION_MAX_WORKERS = 4 # Thread pool size used by the concurrent orchestration
+
+# --- Image Post-Processing Configuration ---
+IMAGE_POSTPROCESSING_ENABLED = True # Downscale and re-encode generated images before upload (requires Pillow)
+IMAGE_UPLOAD_MAX_SIZE = (1200, 1920) # Maximum width and height, landscape images are uploaded 1200 px wide (Facebook feed size)
+IMAGE_UPLOAD_QUALITY = 85 # JPEG/WebP quality of the uploaded image
 
 # --- SNS Message Configuration ---
 MESSAGE_SUBJECT = "Moments in History Notification"
@@ -130,4 +320,10 @@ SUCCESS_MESSAGE = 'A new post was successfully posted!'
 ERROR_MESSAGE = """
 An error occurred while processing Lambda:
 
-"""
\ No newline at end of file
+"""
+# "digest" sends one message per invocation with its notifications, page results and stage timings, "batch" sends
+# each notification as its own message, both with PublishBatch when the invocation ends, "immediate" publishes
+# each notification as it happens. Errors of the run are always published immediately.
+NOTIFICATION_MODE = 'digest'
+SNS_PUBLISH_BATCH_SIZE = 10 # Messages per PublishBatch request, at most 10
+SNS_MAX_MESSAGE_BYTES = 256 * 1024 # SNS size limit of a message and of all messages of a PublishBatch request
\ No newline at end of file
@@ -0,0 +1,219 @@
+import logging
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import List, Optional, Tuple
+from storage_utils import get_store
+from config import (
+    DEDUP_INDEX_KEY,
+    DEDUP_SIGNATURE_SIZE,
+    DEDUP_BAND_SIZE,
+    DEDUP_SHINGLE_SIZE,
+    STATE_WRITE_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'MIHDEDUP'
+INDEX_HEADER = struct.Struct('<8sIII')  # magic, signature size, band size, number of posts
+MAX_HASH_VALUE = 0xFFFFFFFF
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class NearDuplicateIndex:
+    """
+    Compact similarity index of published posts.
+
+    Every post is reduced to a MinHash signature of its word shingles, computed with
+    one-permutation hashing (one hash per shingle, spread over the signature slots).
+    Signatures are kept in a flat 32-bit array, and locality-sensitive hashing band
+    keys in a sorted 64-bit array, so loading the index is a single buffer copy and
+    a lookup is a few binary searches, regardless of the number of posts.
+    """
+
+    def __init__(self, signature_size: int = DEDUP_SIGNATURE_SIZE, band_size: int = DEDUP_BAND_SIZE):
+        if signature_size % band_size:
+            raise ValueError('Signature size must be a multiple of band size.')
+        self.signature_size = signature_size
+        self.band_size = band_size
+        self.signatures = array('I')
+        self.band_keys = array('Q')
+        self.band_posts = array('I')
+
+    def __len__(self) -> int:
+        return len(self.signatures) // self.signature_size
+
+    def add(self, text: str) -> None:
+        """Adds a post to the index."""
+        signature = self.signature(text)
+        post_number = len(self)
+        self.signatures.extend(signature)
+        for band_key in self._band_keys(signature):
+            position = bisect_left(self.band_keys, band_key)
+            self.band_keys.insert(position, band_key)
+            self.band_posts.insert(position, post_number)
+
+    def most_similar(self, text: str) -> Tuple[float, Optional[int]]:
+        """
+        Returns the estimated Jaccard similarity of the closest indexed post and its number.
+
+        Only posts sharing at least one band with the text are compared, so posts
+        with a similarity well below the band threshold are not found.
+        """
+        signature = self.signature(text)
+        best_similarity, best_post = 0.0, None
+        compared = set()
+        for band_key in self._band_keys(signature):
+            position = bisect_left(self.band_keys, band_key)
+            while position < len(self.band_keys) and self.band_keys[position] == band_key:
+                post_number = self.band_posts[position]
+                position += 1
+                if post_number in compared:
+                    continue
+                compared.add(post_number)
+                similarity = self._similarity(signature, post_number)
+                if similarity > best_similarity:
+                    best_similarity, best_post = similarity, post_number
+        return best_similarity, best_post
+
+    def signature(self, text: str) -> array:
+        """Computes the one-permutation MinHash signature of the text's word shingles."""
+        words = WORD_PATTERN.findall(text.lower())
+        shingle_count = max(len(words) - DEDUP_SHINGLE_SIZE + 1, 1)
+        signature = array('I', [MAX_HASH_VALUE]) * self.signature_size
+        for start in range(shingle_count):
+            shingle = ' '.join(words[start:start + DEDUP_SHINGLE_SIZE]).encode('utf-8')
+            shingle_hash = int.from_bytes(blake2b(shingle, digest_size=8).digest(), 'little')
+            slot = shingle_hash % self.signature_size
+            value = (shingle_hash >> 32) & MAX_HASH_VALUE
+            if value < signature[slot]:
+                signature[slot] = value
+        return _densify(signature)
+
+    def to_bytes(self) -> bytes:
+        """Serializes the index to its binary format."""
+        header = INDEX_HEADER.pack(INDEX_MAGIC, self.signature_size, self.band_size, len(self))
+        return header + self.signatures.tobytes() + self.band_keys.tobytes() + self.band_posts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'NearDuplicateIndex':
+        """Loads an index from its binary format."""
+        magic, signature_size, band_size, post_count = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise ValueError('Not a near-duplicate index.')
+        index = cls(signature_size, band_size)
+        offset = INDEX_HEADER.size
+        signatures_end = offset + post_count * signature_size * index.signatures.itemsize
+        band_count = post_count * (signature_size // band_size)
+        band_keys_end = signatures_end + band_count * index.band_keys.itemsize
+        index.signatures.frombytes(data[offset:signatures_end])
+        index.band_keys.frombytes(data[signatures_end:band_keys_end])
+        index.band_posts.frombytes(data[band_keys_end:band_keys_end + band_count * index.band_posts.itemsize])
+        return index
+
+    def _band_keys(self, signature: array) -> List[int]:
+        keys = []
+        for band_start in range(0, self.signature_size, self.band_size):
+            band = signature[band_start:band_start + self.band_size].tobytes()
+            digest = blake2b(band, digest_size=8, salt=band_start.to_bytes(2, 'little')).digest()
+            keys.append(int.from_bytes(digest, 'little'))
+        return keys
+
+    def _similarity(self, signature: array, post_number: int) -> float:
+        offset = post_number * self.signature_size
+        stored = self.signatures[offset:offset + self.signature_size]
+        return sum(1 for first, second in zip(signature, stored) if first == second) / self.signature_size
+
+
+def _densify(signature: array) -> array:
+    """
+    Fills the empty slots of a one-permutation signature from the next non-empty slot,
+    so short texts still produce comparable signatures.
+    """
+    size = len(signature)
+    filled = [slot for slot in range(size) if signature[slot] != MAX_HASH_VALUE]
+    if not filled or len(filled) == size:
+        return signature
+    densified = array('I', signature)
+    for slot in range(size):
+        if signature[slot] == MAX_HASH_VALUE:
+            distance = 1
+            while signature[(slot + distance) % size] == MAX_HASH_VALUE:
+                distance += 1
+            # offset by the distance, so the borrowed values only match texts with the same empty slots
+            densified[slot] = (signature[(slot + distance) % size] + distance) % MAX_HASH_VALUE
+    return densified
+
+
+def get_post_index() -> NearDuplicateIndex:
+    """
+    Returns the near-duplicate index of published posts, read from the store.
+
+    The index is read on every call, so posts added by other execution environments
+    (e.g. the outbox filler and the publisher) are found. Callers checking several
+    posts read it once and pass it to `find_similar_post`.
+
+    Returns:
+        NearDuplicateIndex: The index as currently stored.
+    """
+    index, _ = _read_index()
+    return index
+
+
+def find_similar_post(text: str, index: Optional[NearDuplicateIndex] = None) -> float:
+    """
+    Estimates how similar the text is to the closest previously published post.
+
+    Args:
+        text (str): The generated post text.
+        index (Optional[NearDuplicateIndex]): The index read by `get_post_index`, read now if None.
+
+    Returns:
+        float: The estimated Jaccard similarity of word shingles (0.0-1.0).
+    """
+    similarity, _ = (index or get_post_index()).most_similar(text)
+    return similarity
+
+
+def add_published_post(text: str) -> None:
+    """
+    Adds a published post to the near-duplicate index and saves the index to the store.
+
+    The post is added to the index as currently stored and written back only if no other
+    writer changed it in between, otherwise the update is redone on the new index, so
+    concurrent writers do not drop each other's posts.
+
+    Args:
+        text (str): The published post text.
+    """
+    try:
+        store = get_store()
+        for _ in range(STATE_WRITE_ATTEMPTS):
+            index, version = _read_index()
+            index.add(text)
+            if store.write_if_unchanged(DEDUP_INDEX_KEY, index.to_bytes(), version):
+                return
+        logger.error(f"The near-duplicate index kept changing, the post was not added after {STATE_WRITE_ATTEMPTS} attempts.")
+    except Exception as e:
+        # the post is already published at this point, so a failed index update must not fail the run
+        logger.error(f"Failed to add post to the near-duplicate index: {e}", exc_info=True)
+
+
+def _read_index() -> Tuple[NearDuplicateIndex, Optional[str]]:
+    """
+    Reads the near-duplicate index and its store version.
+
+    Returns:
+        Tuple[NearDuplicateIndex, Optional[str]]: The index, a new one if none is stored
+        or it cannot be loaded, and the version of the stored index, None if there is none.
+    """
+    data, version = get_store().read_version(DEDUP_INDEX_KEY)
+    try:
+        index = NearDuplicateIndex.from_bytes(data) if data else NearDuplicateIndex()
+    except (ValueError, struct.error) as e:
+        logger.error(f"Failed to load near-duplicate index, starting a new one: {e}")
+        index = NearDuplicateIndex()
+    logger.debug('Read near-duplicate index with %d posts.', len(index))
+    return index, version
@@ -1,102 +1,677 @@
 import os
-import requests
 import logging
-import boto3
-import io
 import json
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
 from config import (
     GRAPH_API_VERSION,
     PUBLISH_WHEN_POSTED,
     IMAGE_FILE_NAME,
-    IMAGE_FILE_TYPE
+    IMAGE_FILE_TYPE,
+    GRAPH_API_BASE_URL,
+    GRAPH_WARMUP_TIMEOUT,
+    GRAPH_INVALID_TOKEN_ERROR_CODE,
+    FACEBOOK_PUBLISH_STRATEGY,
+    GRAPH_PHOTO_READY_TIMEOUT,
+    GRAPH_PHOTO_POLL_INITIAL_DELAY,
+    GRAPH_PHOTO_POLL_MAX_DELAY,
+    DEFAULT_PAGE_NAME,
+    PAGE_PUBLISH_MAX_WORKERS
 )
+from client_utils import get_http_session
+from image_utils import BufferReader, ImageVariant
+from metrics_utils import span
+from rate_limit_utils import get_graph_rate_limiter
+
+# requests is imported on first use, to keep it off the cold start import path
+if TYPE_CHECKING:
+    import requests
+from secrets_utils import get_secrets, invalidate_secrets
 
 logger = logging.getLogger(__name__)
-secrets_manager_client = boto3.client('secretsmanager')
 
 
-def post_to_facebook(generated_post: str, generated_image: bytes) -> bool | None:
+class FacebookPage(NamedTuple):
+    """A Facebook Page to publish to, with its access token."""
+    name: str
+    page_id: str
+    access_token: str
+
+
+class PagePublishResult(NamedTuple):
+    """The outcome of publishing a post to one Facebook Page."""
+    page_name: str
+    page_id: str
+    published: bool
+    duration_seconds: float
+    error: Optional[str] = None
+
+
+def post_to_facebook(
+        generated_post: str,
+        generated_image: bytes | memoryview,
+        page_id: str | None = None,
+        page_access_token: str | None = None,
+        file_name: str = IMAGE_FILE_NAME,
+        file_type: str = IMAGE_FILE_TYPE,
+        refresh_credentials: Callable[[], tuple[str | None, str | None]] | None = None,
+        variants: Optional[List[ImageVariant]] = None
+) -> bool | None:
     """
     Posts a text message and an image to a Facebook Page.
 
-    This function retrieves Facebook Page ID and Access Token from AWS Secrets Manager,
-    constructs a POST request to the Facebook Graph API, and sends the generated
-    text and image for publishing.
+    This function retrieves Facebook Page ID and Access Token from AWS Secrets Manager
+    (unless they were already fetched by the caller), constructs a POST request to the
+    Facebook Graph API, and sends the generated text and image for publishing.
 
     Args:
         generated_post (str): The text content of the post to be published on Facebook.
-        generated_image (bytes): The image content in bytes to be published along with the post.
+        generated_image (bytes | memoryview): The image content in bytes to be published along with the post.
+        page_id (str | None): Pre-fetched Facebook Page ID. Fetched from Secrets Manager when None.
+        page_access_token (str | None): Pre-fetched Page Access Token. Fetched from Secrets Manager when None.
+        file_name (str): The file name of the uploaded image.
+        file_type (str): The MIME type of the uploaded image.
+        refresh_credentials (Callable[[], tuple[str | None, str | None]] | None): Fetches a fresh page ID
+            and token after Facebook rejected the token. Defaults to `get_facebook_credentials`.
+        variants (Optional[List[ImageVariant]]): Other aspect ratios of the image, attached to the
+            feed post or posted as stories. A variant that fails to upload is left out.
 
     Returns:
         bool | None: True if the post was successful, None otherwise. Returns None
                      in case of network errors, HTTP errors from Facebook API,
                      or any other unexpected exceptions during the process.
     """
+    import requests
+
     try:
-        # get secrets for Facebook API integration
-        page_id = get_secret(os.environ.get('FACEBOOK_PAGE_ID_SECRET_NAME'))
-        page_access_token = get_secret(os.environ.get('FACEBOOK_PAGE_TOKEN_SECRET_NAME'))
+        # get secrets for Facebook API integration if the caller did not prefetch them
+        if page_id is None or page_access_token is None:
+            page_id, page_access_token = get_facebook_credentials()
 
-        # construct request for sending the generated photo
-        post_url = f"https://graph.facebook.com/{GRAPH_API_VERSION}/{page_id}/photos"
-        payload = {
-            'message': generated_post,
-            'access_token': page_access_token,
-            'published': PUBLISH_WHEN_POSTED
-        }
-        files = {
-            'source': (IMAGE_FILE_NAME, io.BytesIO(generated_image), IMAGE_FILE_TYPE)
-        }
-
-        # send request to API
-        response = requests.post(post_url, data=payload, files=files)
+        try:
+            return _publish_post(
+                generated_post, generated_image, page_id, page_access_token, file_name, file_type, variants or []
+            )
+        except requests.exceptions.HTTPError as e:
+            if not _is_token_rejected(e.response):
+                raise
+            # the cached token was revoked or rotated, fetch fresh secrets and try once more
+            logger.warning(f"Facebook API rejected the page access token, refreshing secrets: {e}")
+            if refresh_credentials is None:
+                invalidate_secrets(_get_facebook_secret_names())
+                page_id, page_access_token = get_facebook_credentials()
+            else:
+                page_id, page_access_token = refresh_credentials()
+            return _publish_post(
+                generated_post, generated_image, page_id, page_access_token, file_name, file_type, variants or []
+            )
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error posting to Facebook: {e}")
+        return None
+
+    except Exception as e:
+        logger.error(f'An error occurred while processing Facebook post: {e}')
+        return None
+
+
+def _publish_post(
+        generated_post: str,
+        generated_image: bytes | memoryview,
+        page_id: str,
+        page_access_token: str,
+        file_name: str,
+        file_type: str,
+        variants: List[ImageVariant]
+) -> bool | None:
+    """
+    Uploads the image to the Facebook Page and creates a feed post with it attached.
+
+    The feed variants are uploaded unpublished and attached to the same feed post,
+    the story variants are posted as Page stories once the feed post exists.
+
+    Args:
+        generated_post (str): The text content of the post to be published on Facebook.
+        generated_image (bytes | memoryview): The image content in bytes to be published along with the post.
+        page_id (str): The Facebook Page ID.
+        page_access_token (str): The Page Access Token.
+        file_name (str): The file name of the uploaded image.
+        file_type (str): The MIME type of the uploaded image.
+        variants (List[ImageVariant]): Other aspect ratios of the image.
+
+    Returns:
+        bool | None: True if the post was successful, None if the photo upload returned no ID.
+
+    Raises:
+        requests.exceptions.RequestException: On network errors or HTTP errors from Facebook API.
+    """
+    if FACEBOOK_PUBLISH_STRATEGY == 'batch':
+        return _publish_post_batch(
+            generated_post, generated_image, page_id, page_access_token, file_name, file_type, variants
+        )
+
+    # construct request for sending the generated photo
+    post_url = f"{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/{page_id}/photos"
+    payload = {
+        'message': generated_post,
+        'access_token': page_access_token,
+        'published': PUBLISH_WHEN_POSTED
+    }
+    body, content_type = _multipart_body(payload, [('source', file_name, file_type, generated_image)])
+
+    # send request to API through the pooled session, reusing a keep-alive connection when available
+    graph_session = get_http_session()
+    with span('photo_upload') as upload_span:
+        upload_span.set(RequestBytes=len(generated_image))
+        get_graph_rate_limiter().acquire(page_id)
+        response = graph_session.post(post_url, data=body, headers={'Content-Type': content_type})
         response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
         result = response.json()
-        uploaded_photo_id = result.get('id')
-        if not uploaded_photo_id:
-            logger.error(f"Facebook API did not return photo ID after upload: {result}")
-            return None
+    uploaded_photo_id = result.get('id')
+    if not uploaded_photo_id:
+        logger.error(f"Facebook API did not return photo ID after upload: {result}")
+        return None
 
-        # add sleep to avoid racing condition
-        time.sleep(1)
+    # a feed variant that fails to upload is left out of the post rather than failing it
+    photo_ids = [uploaded_photo_id] + [
+        photo_id for photo_id in (
+            _upload_unpublished_photo(graph_session, page_id, page_access_token, variant)
+            for variant in variants if variant.target == 'feed'
+        ) if photo_id
+    ]
 
-        # construct request to send a generated post with the photo sent earlier
-        feed_post_url = f'https://graph.facebook.com/{GRAPH_API_VERSION}/{page_id}/feed'
-        feed_payload = {
-            'message': generated_post,
-            'access_token': page_access_token,
-            # Attach the photo using its ID.
-            'attached_media': json.dumps([{'media_fbid': uploaded_photo_id}])
-        }
+    # make sure the photos are ready before attaching them, to avoid racing condition
+    with span('photo_ready'):
+        if FACEBOOK_PUBLISH_STRATEGY == 'poll':
+            for photo_id in photo_ids:
+                _wait_for_photo(graph_session, page_id, photo_id, page_access_token)
+        else:
+            time.sleep(1)
+
+    # construct request to send a generated post with the photo sent earlier
+    feed_post_url = f'{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/{page_id}/feed'
+    feed_payload = {
+        'message': generated_post,
+        'access_token': page_access_token,
+        # Attach the photos using their IDs.
+        'attached_media': json.dumps([{'media_fbid': photo_id} for photo_id in photo_ids])
+    }
 
-        response = requests.post(feed_post_url, data=feed_payload)
+    with span('feed_post'):
+        get_graph_rate_limiter().acquire(page_id)
+        response = graph_session.post(feed_post_url, data=feed_payload)
         response.raise_for_status()
-        feed_result = response.json()
+    _log_feed_result(response.json())
 
-        if 'id' in feed_result:
-            logger.info(f"Successfully posted! View post at: https://www.facebook.com/{feed_result['id'].replace('_', '/posts/')}")
-        else:
-            logger.error(f"Error creating feed post: {feed_result}")
+    _publish_stories(graph_session, page_id, page_access_token, variants)
+    return True
 
-        return True
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error posting to Facebook: {e}")
-        return None
+def _upload_unpublished_photo(
+        graph_session: 'requests.Session',
+        page_id: str,
+        page_access_token: str,
+        variant: ImageVariant
+) -> Optional[str]:
+    """
+    Uploads an image variant to the Facebook Page without publishing it, to be attached to a post or story.
+
+    Args:
+        graph_session (requests.Session): The pooled HTTP session.
+        page_id (str): The Facebook Page ID.
+        page_access_token (str): The Page Access Token.
+        variant (ImageVariant): The image variant to upload.
 
+    Returns:
+        Optional[str]: The ID of the uploaded photo, or None if the upload failed.
+    """
+    image = variant.image
+    body, content_type = _multipart_body(
+        {'access_token': page_access_token, 'published': 'false'},
+        [('source', image.file_name, image.file_type, image.data)]
+    )
+    # a variant is optional, its failure is logged and must not fail the post
+    try:
+        with span('photo_upload') as upload_span:
+            upload_span.set(RequestBytes=len(image.data))
+            get_graph_rate_limiter().acquire(page_id)
+            response = graph_session.post(
+                f"{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/{page_id}/photos",
+                data=body,
+                headers={'Content-Type': content_type}
+            )
+            response.raise_for_status()
+        photo_id = response.json().get('id')
     except Exception as e:
-        logger.error(f'An error occurred while processing Facebook post: {e}')
+        logger.warning(f"Failed to upload the {variant.aspect_ratio} image variant to page {page_id}: {e}")
+        return None
+    if not photo_id:
+        logger.warning(f"Facebook API did not return photo ID after uploading the {variant.aspect_ratio} image variant.")
+    return photo_id
+
+
+def _publish_stories(
+        graph_session: 'requests.Session',
+        page_id: str,
+        page_access_token: str,
+        variants: List[ImageVariant]
+) -> int:
+    """
+    Posts the story variants of the image as Page stories, after the feed post was created.
+
+    Args:
+        graph_session (requests.Session): The pooled HTTP session.
+        page_id (str): The Facebook Page ID.
+        page_access_token (str): The Page Access Token.
+        variants (List[ImageVariant]): The image variants, only the story ones are posted.
+
+    Returns:
+        int: The number of stories posted.
+    """
+    posted_count = 0
+    for variant in variants:
+        if variant.target != 'story':
+            continue
+        photo_id = _upload_unpublished_photo(graph_session, page_id, page_access_token, variant)
+        if not photo_id:
+            continue
+        try:
+            with span('story_post'):
+                get_graph_rate_limiter().acquire(page_id)
+                response = graph_session.post(
+                    f"{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/{page_id}/photo_stories",
+                    data={'photo_id': photo_id, 'access_token': page_access_token}
+                )
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to post the {variant.aspect_ratio} image variant as a story to page {page_id}: {e}")
+            continue
+        logger.info(f"Posted the {variant.aspect_ratio} image variant as a story to page {page_id}.")
+        posted_count += 1
+    return posted_count
+
+
+def _multipart_body(
+        fields: Dict[str, Any],
+        files: List[Tuple[str, str, str, bytes | memoryview]]
+) -> Tuple[BufferReader, str]:
+    """
+    Builds a multipart/form-data request body that is streamed from the image buffer.
+
+    `requests` joins the parts of an upload with `files=` into a single bytes object,
+    a full copy of the image. Here only the small form fields and part headers are
+    encoded, and the images are read block by block from the caller's buffers as the
+    request is sent. Retries and redirects rewind the body with `seek`.
+
+    Args:
+        fields (Dict[str, Any]): The form fields sent before the files.
+        files (List[Tuple[str, str, str, bytes | memoryview]]): The form field name, file name,
+            MIME type and content of each uploaded image.
+
+    Returns:
+        Tuple[BufferReader, str]: The request body with a known length, and its Content-Type header.
+    """
+    boundary = uuid.uuid4().hex
+    head = ''.join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    parts = []
+    for file_field, file_name, file_type, file_data in files:
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+            f'Content-Type: {file_type}\r\n\r\n'
+        )
+        parts += [head.encode('utf-8'), file_data]
+        head = '\r\n'
+    parts.append(f'{head}--{boundary}--\r\n'.encode('utf-8'))
+    return BufferReader(*parts), f'multipart/form-data; boundary={boundary}'
+
+
+def _wait_for_photo(graph_session: 'requests.Session', page_id: str, photo_id: str, page_access_token: str) -> bool:
+    """
+    Polls the uploaded photo with a short exponential backoff until Facebook has processed it.
+
+    The photo is ready once the Graph API lists its rendered images. Instead of
+    a fixed sleep, this waits only as long as the processing actually takes,
+    up to `GRAPH_PHOTO_READY_TIMEOUT`.
+
+    Args:
+        graph_session (requests.Session): The pooled HTTP session.
+        page_id (str): The Facebook Page ID the photo was uploaded to.
+        photo_id (str): The ID of the uploaded photo.
+        page_access_token (str): The Page Access Token.
+
+    Returns:
+        bool: True if the photo is ready, False if it was still not ready at the timeout.
+    """
+    photo_url = f"{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/{photo_id}"
+    deadline = time.monotonic() + GRAPH_PHOTO_READY_TIMEOUT
+    delay = GRAPH_PHOTO_POLL_INITIAL_DELAY
+    polls = 0
+    while True:
+        polls += 1
+        get_graph_rate_limiter().acquire(page_id)
+        response = graph_session.get(photo_url, params={'fields': 'id,images', 'access_token': page_access_token})
+        if response.ok and response.json().get('images'):
+            logger.info(f"Photo {photo_id} ready after {polls} polls.")
+            return True
+        if time.monotonic() + delay > deadline:
+            logger.warning(f"Photo {photo_id} not ready after {GRAPH_PHOTO_READY_TIMEOUT}s, posting anyway.")
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, GRAPH_PHOTO_POLL_MAX_DELAY)
+
+
+def _publish_post_batch(
+        generated_post: str,
+        generated_image: bytes | memoryview,
+        page_id: str,
+        page_access_token: str,
+        file_name: str,
+        file_type: str,
+        variants: List[ImageVariant]
+) -> bool | None:
+    """
+    Uploads the image and creates the feed post in a single Graph API batch request.
+
+    The feed post depends on the photo upload and references its ID through
+    the batch's JSONPath result syntax, so Facebook runs both operations in order
+    on its side, and only one HTTP round trip is needed. The feed variants are uploaded
+    in the same batch, chained after the image, so a failed variant upload fails the
+    batch like any other operation. The story variants are posted after the batch.
+
+    Args:
+        generated_post (str): The text content of the post to be published on Facebook.
+        generated_image (bytes | memoryview): The image content in bytes to be published along with the post.
+        page_id (str): The Facebook Page ID.
+        page_access_token (str): The Page Access Token.
+        file_name (str): The file name of the uploaded image.
+        file_type (str): The MIME type of the uploaded image.
+        variants (List[ImageVariant]): Other aspect ratios of the image.
+
+    Returns:
+        bool | None: True if the post was successful, None if the batch returned no feed post result.
+
+    Raises:
+        requests.exceptions.RequestException: On network errors or HTTP errors from Facebook API,
+                                              including errors of the individual batch operations.
+    """
+    batch = [
+        {
+            'method': 'POST',
+            'name': 'photo',
+            'relative_url': f"{GRAPH_API_VERSION}/{page_id}/photos",
+            'attached_files': 'source',
+            'omit_response_on_success': False,
+            'body': urlencode({'message': generated_post, 'published': PUBLISH_WHEN_POSTED})
+        },
+    ]
+    files = [('source', file_name, file_type, generated_image)]
+    for index, variant in enumerate(variant for variant in variants if variant.target == 'feed'):
+        batch.append({
+            'method': 'POST',
+            'name': f"photo{index + 1}",
+            'depends_on': batch[-1]['name'],
+            'relative_url': f"{GRAPH_API_VERSION}/{page_id}/photos",
+            'attached_files': f"source{index + 1}",
+            'omit_response_on_success': False,
+            'body': urlencode({'published': 'false'})
+        })
+        files.append((f"source{index + 1}", variant.image.file_name, variant.image.file_type, variant.image.data))
+    batch.append({
+        'method': 'POST',
+        'depends_on': batch[-1]['name'],
+        'relative_url': f"{GRAPH_API_VERSION}/{page_id}/feed",
+        'body': urlencode({
+            'message': generated_post,
+            'attached_media': json.dumps([{'media_fbid': f"{{result={operation['name']}:$.id}}"} for operation in batch])
+        })
+    })
+    body, content_type = _multipart_body({'access_token': page_access_token, 'batch': json.dumps(batch)}, files)
+
+    import requests
+    with span('graph_batch') as batch_span:
+        batch_span.set(RequestBytes=len(body))
+        get_graph_rate_limiter().acquire(page_id)
+        response = get_http_session().post(
+            f"{GRAPH_API_BASE_URL}/{GRAPH_API_VERSION}/",
+            data=body,
+            headers={'Content-Type': content_type}
+        )
+        response.raise_for_status()
+
+    results = response.json()
+    for result in results:
+        if result is None or result.get('code') != 200:
+            # turn the failed operation into a regular HTTP error, so token rejections are handled the same way
+            failed_response = requests.Response()
+            failed_response.status_code = result.get('code', 500) if result else 500
+            failed_response._content = (result or {}).get('body', '').encode('utf-8')
+            raise requests.exceptions.HTTPError(
+                f"Graph API batch operation failed: {failed_response.status_code} {failed_response.text}",
+                response=failed_response
+            )
+
+    if len(results) < len(batch):
+        logger.error(f"Graph API batch returned no feed post result: {results}")
         return None
+    _log_feed_result(json.loads(results[-1]['body']))
+
+    _publish_stories(get_http_session(), page_id, page_access_token, variants)
+    return True
+
+
+def _log_feed_result(feed_result: dict) -> None:
+    """
+    Logs the link to the created feed post, or the error returned instead of it.
+
+    Args:
+        feed_result (dict): The Graph API response of the feed post request.
+    """
+    if 'id' in feed_result:
+        logger.info(f"Successfully posted! View post at: https://www.facebook.com/{feed_result['id'].replace('_', '/posts/')}")
+    else:
+        logger.error(f"Error creating feed post: {feed_result}")
+
+
+def _is_token_rejected(response: 'requests.Response | None') -> bool:
+    """
+    Checks whether a Graph API error response was caused by an invalid or expired access token.
+
+    Args:
+        response (requests.Response | None): The failed Graph API response.
+
+    Returns:
+        bool: True if the access token was rejected, False otherwise.
+    """
+    if response is None:
+        return False
+    if response.status_code == 401:
+        return True
+    try:
+        error = response.json().get('error', {})
+    except ValueError:
+        return False
+    # only code 190 means the token itself is invalid or expired, other OAuthException errors
+    # (permissions, rate limits) are not fixed by fetching the token again
+    return error.get('code') == GRAPH_INVALID_TOKEN_ERROR_CODE
+
+
+def publish_to_pages(
+        generated_post: str,
+        generated_image: bytes | memoryview,
+        pages: List[FacebookPage],
+        file_name: str = IMAGE_FILE_NAME,
+        file_type: str = IMAGE_FILE_TYPE,
+        max_workers: int = PAGE_PUBLISH_MAX_WORKERS,
+        on_result: Optional[Callable[[PagePublishResult], None]] = None,
+        variants: Optional[List[ImageVariant]] = None
+) -> List[PagePublishResult]:
+    """
+    Publishes the same post and image to several Facebook Pages concurrently.
+
+    The pages are published to from a bounded worker pool, all sharing the same
+    image bytes. Every Graph API call goes through the shared rate limiter, which
+    limits the calls of each page and of the whole app. A failure on one page does
+    not affect the others.
+
+    Args:
+        generated_post (str): The text content of the post to be published on Facebook.
+        generated_image (bytes | memoryview): The image content in bytes to be published along with the post.
+        pages (List[FacebookPage]): The pages to publish to.
+        file_name (str): The file name of the uploaded image.
+        file_type (str): The MIME type of the uploaded image.
+        max_workers (int): Maximum number of pages published to at the same time.
+        on_result (Optional[Callable[[PagePublishResult], None]]): Called from the worker thread
+            with the result of each page as soon as it is known, e.g. to checkpoint it.
+        variants (Optional[List[ImageVariant]]): Other aspect ratios of the image, uploaded to every page.
+
+    Returns:
+        List[PagePublishResult]: The result of each page, in the order of `pages`.
+    """
+    def publish(page: FacebookPage) -> PagePublishResult:
+        start = time.perf_counter()
+        published = post_to_facebook(
+            generated_post,
+            generated_image,
+            page.page_id,
+            page.access_token,
+            file_name,
+            file_type,
+            refresh_credentials=lambda: _refresh_page_credentials(page),
+            variants=variants
+        )
+        duration = time.perf_counter() - start
+        if published:
+            result = PagePublishResult(page.name, page.page_id, True, duration)
+        else:
+            result = PagePublishResult(page.name, page.page_id, False, duration, 'Publishing failed, see the logs for details.')
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    if len(pages) == 1:
+        # no need for a worker thread for the usual single page
+        results = [publish(pages[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pages)))) as executor:
+            results = list(executor.map(publish, pages))
+
+    published_count = sum(result.published for result in results)
+    logger.info(f"Published to {published_count} of {len(pages)} pages.")
+    return results
+
+
+def get_facebook_pages() -> List[FacebookPage]:
+    """
+    Retrieves the Facebook Pages to publish to from AWS Secrets Manager.
+
+    When the FACEBOOK_PAGES_SECRET_NAME environment variable is set, the pages are read
+    from that secret, a JSON list of objects with "name", "page_id" and "access_token".
+    Otherwise the single page from the page ID and page token secrets is used.
+
+    Returns:
+        List[FacebookPage]: The pages to publish to.
+
+    Raises:
+        ValueError: If the pages secret is not a valid list of pages.
+    """
+    pages_secret_name = os.environ.get('FACEBOOK_PAGES_SECRET_NAME')
+    if not pages_secret_name:
+        page_id, page_access_token = get_facebook_credentials()
+        return [FacebookPage(DEFAULT_PAGE_NAME, page_id, page_access_token)]
+
+    try:
+        pages = [
+            FacebookPage(str(page.get('name', page['page_id'])), str(page['page_id']), page['access_token'])
+            for page in json.loads(get_secrets([pages_secret_name])[pages_secret_name])
+        ]
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Secret '{pages_secret_name}' is not a valid list of Facebook Pages: {e}")
+    if not pages:
+        raise ValueError(f"Secret '{pages_secret_name}' has no Facebook Pages.")
+    return pages
+
+
+def _refresh_page_credentials(page: FacebookPage) -> tuple[str | None, str | None]:
+    """
+    Fetches a fresh page ID and token for the page after Facebook rejected its token.
+
+    Args:
+        page (FacebookPage): The page whose token was rejected.
+
+    Returns:
+        tuple[str | None, str | None]: The page ID and the page access token.
+    """
+    pages_secret_name = os.environ.get('FACEBOOK_PAGES_SECRET_NAME')
+    if not pages_secret_name:
+        invalidate_secrets(_get_facebook_secret_names())
+        return get_facebook_credentials()
+
+    invalidate_secrets([pages_secret_name])
+    for fresh_page in get_facebook_pages():
+        if fresh_page.name == page.name:
+            return fresh_page.page_id, fresh_page.access_token
+    return page.page_id, page.access_token
+
+
+def get_facebook_credentials() -> tuple[str | None, str | None]:
+    """
+    Retrieves the Facebook Page ID and Page Access Token from AWS Secrets Manager.
+
+    Both secrets are served from the secret cache and, when missing or expired,
+    fetched together in a single batched Secrets Manager call.
+
+    Returns:
+        tuple[str | None, str | None]: The page ID and the page access token.
+    """
+    page_id_secret_name, page_token_secret_name = _get_facebook_secret_names()
+    secrets = get_secrets([page_id_secret_name, page_token_secret_name])
+    return secrets[page_id_secret_name], secrets[page_token_secret_name]
+
+
+def _get_facebook_secret_names() -> tuple[str, str]:
+    """
+    Returns the names of the secrets holding the Facebook Page ID and Page Access Token.
+
+    Returns:
+        tuple[str, str]: The page ID secret name and the page access token secret name.
+    """
+    return os.environ.get('FACEBOOK_PAGE_ID_SECRET_NAME'), os.environ.get('FACEBOOK_PAGE_TOKEN_SECRET_NAME')
+
+
+def warm_up_graph_connection() -> bool:
+    """
+    Opens the TLS connection to the Facebook Graph API ahead of the actual upload.
+
+    The request is sent through the shared HTTP session, so the established
+    keep-alive connection is reused by `post_to_facebook`. Failures are logged
+    and ignored, as the warmup is only an optimization.
+
+    Returns:
+        bool: True if the connection was established, False otherwise.
+    """
+    import requests
+
+    try:
+        get_http_session().head(GRAPH_API_BASE_URL, timeout=GRAPH_WARMUP_TIMEOUT)
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Graph API connection warmup failed: {e}")
+        return False
 
 
 def get_secret(secret_name: str) -> str | None:
     """
     Retrieves a secret string from AWS Secrets Manager.
 
-    This function connects to AWS Secrets Manager using boto3 and fetches
-    the secret value associated with the given `secret_name`. It expects
-    the secret to be stored as a plain string ('SecretString').
+    This function returns the cached value of the secret associated with the
+    given `secret_name`, fetching it from Secrets Manager when it is missing
+    or expired. It expects the secret to be stored as a plain string ('SecretString').
 
     Args:
         secret_name (str): The name or ARN of the secret to retrieve from AWS Secrets Manager.
@@ -107,9 +682,7 @@ def get_secret(secret_name: str) -> str | None:
                     (e.g., secret not found, permissions error).
     """
     try:
-        response = secrets_manager_client.get_secret_value(SecretId=secret_name)
-        if 'SecretString' in response:
-            return response['SecretString']
+        return get_secrets([secret_name])[secret_name]
     except Exception as e:
-        print(f"Error retrieving secret '{secret_name}': {e}")
+        logger.error(f"Error retrieving secret '{secret_name}': {e}")
         raise
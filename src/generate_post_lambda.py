@@ -1,61 +1,583 @@
 import json
 import logging
+import os
 import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from config import (
     GENERATED_POST,
     IMAGE_GENERATION_PROMPT,
     HISTORICAL_PERIODS,
-    SUCCESS_MESSAGE,
-    ERROR_MESSAGE
+    BACKLOG_POST_ID,
+    ERROR_MESSAGE,
+    CONCURRENT_ORCHESTRATION,
+    ORCHESTRATION_MAX_WORKERS,
+    USE_POST_BACKLOG,
+    BATCH_RECORD_COUNT,
+    BATCH_SUBMIT_MODE,
+    BATCH_COLLECT_MODE,
+    FILL_OUTBOX_MODE,
+    OUTBOX_TARGET_SIZE,
+    OUTBOX_POST_TIME_BUDGET,
+    AI_MODEL,
+    MAX_POST_TEXT_CALLS,
+    POST_REGENERATION_TIME_SECONDS,
+    TEXT_DEADLINE_RESERVE_SECONDS,
+    POST_CANDIDATE_COUNT,
+    STREAMING_TEXT_GENERATION,
+    STARTUP_MODE,
+    INIT_WARMUP_CLIENTS,
+    IMAGE_POSTPROCESSING_ENABLED,
+    VERBOSE_LOGGING,
+    PIPELINE_CHECKPOINTS_ENABLED,
+    EVENT_CATALOG_ENABLED,
+    PERIOD_SCHEDULER_ENABLED,
+    IMAGE_ASPECT_RATIO,
+    IMAGE_VARIANTS_ENABLED,
+    IMAGE_VARIANT_TARGETS
 )
 from ai_utils import (
     generate_new_post,
+    generate_new_post_streaming,
     extract_generated_data,
     prepare_prompt,
-    generate_image
+    generate_image,
+    generate_image_variants,
+    get_token_usage
 )
-from sns_utils import send_notification
-from facebook_utils import post_to_facebook
+from sns_utils import send_notification, create_sns_client, flush_notifications
+from publish_utils import publish_post, PublishError
+from outbox_utils import add_to_outbox, get_outbox_size
+from facebook_utils import (
+    get_facebook_pages,
+    warm_up_graph_connection,
+    FacebookPage,
+    PagePublishResult
+)
+from client_utils import get_pool_stats, warm_up_clients
+from bedrock_utils import set_invocation_deadline, get_remaining_time, get_latency_histograms
+from image_model_utils import get_image_model_stats
+from batch_utils import submit_batch_job, collect_batch_job, claim_backlog_post, remove_from_backlog
+from dedup_utils import find_similar_post, add_published_post, get_post_index
+from scoring_utils import score_post, is_acceptable
+from image_utils import process_image, load_image_library, ImageVariant, ProcessedImage
+from metrics_utils import span, start_invocation, emit_metrics
+from checkpoint_utils import PipelineCheckpoint, get_idempotency_key, load_checkpoint
+from catalog_utils import pick_event
+from schedule_utils import next_period
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(logging.DEBUG if VERBOSE_LOGGING else logging.INFO)
+
+# Image generations started before the pipeline needs them, keyed by image prompt. A single
+# candidate starts its image while its text still streams, a rejected one keeps a worker busy
+_image_executor = ThreadPoolExecutor(max_workers=MAX_POST_TEXT_CALLS)
+_started_images: Dict[str, Future] = {}
+# Post candidates for one historical period, generated concurrently
+_candidate_executor = ThreadPoolExecutor(max_workers=max(1, POST_CANDIDATE_COUNT))
 
 
 def lambda_handler(event, context):
+    start_invocation(getattr(context, 'aws_request_id', None))
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
-        logger.debug(f"Received context: {context}")
-
-        # prepare prompt about random historical period
-        prepared_prompt = prepare_prompt(random.choice(HISTORICAL_PERIODS))
+        logger.debug('Received event: %s', event)
+        logger.debug('Received context: %s', context)
+        set_invocation_deadline(context)
 
-        # generate and extract AI generated data
-        raw_generated_data = generate_new_post(prepared_prompt)
-        clean_data = extract_generated_data(raw_generated_data)
-
-        # generate an image here to be passed to fb post
-        image_bytes = generate_image(clean_data.get(IMAGE_GENERATION_PROMPT))
+        mode = event.get('mode') if isinstance(event, dict) else None
+        if mode == BATCH_SUBMIT_MODE:
+            job_arn = submit_batch_job(event.get('record_count', BATCH_RECORD_COUNT))
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Batch inference job submitted.', 'job_arn': job_arn})
+            }
+        if mode == BATCH_COLLECT_MODE:
+            collected_count = collect_batch_job(event['job_arn'])
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Batch inference job collected.', 'collected_posts': collected_count})
+            }
+        if mode == FILL_OUTBOX_MODE:
+            generated_count = fill_outbox(event.get('target_size', OUTBOX_TARGET_SIZE), context)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Outbox filled.', 'generated_posts': generated_count})
+            }
 
-        # post generated post and image to facebook
-        post_to_facebook(clean_data.get(GENERATED_POST), image_bytes)
+        # resume the earlier run of a retried event instead of generating and posting again
+        idempotency_key = get_idempotency_key(event, context)
+        checkpoint = None
+        if PIPELINE_CHECKPOINTS_ENABLED and idempotency_key:
+            logger.info(f"Idempotency key: {idempotency_key}")
+            checkpoint = load_checkpoint(idempotency_key)
+            if checkpoint.completed:
+                logger.info(f"Checkpoint '{idempotency_key}' is already complete, nothing to do.")
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({
+                        'message': 'Facebook post was already published for this event.',
+                        'post_content': checkpoint.state['post'],
+                        'pages': [result._asdict() for result in checkpoint.published_results()]
+                    })
+                }
 
-        # send notification to SNS
-        send_notification(SUCCESS_MESSAGE)
+        post_source = get_post_data if checkpoint is None else lambda: checkpoint.get_post(get_post_data)
+        logger.info(f"Running the {'concurrent' if CONCURRENT_ORCHESTRATION else 'sequential'} pipeline.")
+        with span('pipeline'):
+            if CONCURRENT_ORCHESTRATION:
+                clean_data, page_results, overlap_saved = run_concurrent_pipeline(post_source, checkpoint)
+            else:
+                clean_data, page_results, overlap_saved = run_sequential_pipeline(post_source, checkpoint)
 
+        logger.info(f"Client and connection pool stats: {get_pool_stats()}")
+        logger.info(f"Bedrock latency histograms: {json.dumps(get_latency_histograms())}")
+        logger.info(f"Image model routing stats: {json.dumps(get_image_model_stats())}")
+        logger.info(f"Text model token usage: {json.dumps(get_token_usage())}")
         logger.info(f"Lambda finished successfully.")
 
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Facebook post generated successfully!',
-                'post_content': clean_data
+                'post_content': clean_data,
+                'pages': [result._asdict() for result in page_results],
+                'overlap_saved_seconds': overlap_saved
             })
         }
 
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
-        send_notification(ERROR_MESSAGE+str(e))
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': f'An unexpected error occurred: {str(e)}'})
-        }
+        # publishing to no page was already notified by publish_post
+        if not isinstance(e, PublishError):
+            send_notification(ERROR_MESSAGE+str(e))
+        # a failed invocation is retried by Lambda, and the retry resumes from the checkpoint of the event
+        raise
+
+    finally:
+        # the notifications buffered during the run, published once the post is out
+        flush_notifications()
+        # per-stage durations, payload sizes and token counts, extracted by CloudWatch from the log
+        emit_metrics()
+
+
+def get_post_data() -> Optional[Dict[str, str]]:
+    """
+    Returns the post to publish, picking the best scoring of several candidates, so no
+    image is generated for posts that break the prompt's rules or repeat published ones.
+
+    While the best candidate is not acceptable, one more candidate is generated at a
+    time for the same prompt, so no other period or catalog event is used up, until
+    `MAX_POST_TEXT_CALLS` text model calls were made or too little time is left for
+    another one. Then the best scoring candidate is used.
+
+    With `POST_CANDIDATE_COUNT` of 1, each candidate starts its image while its text
+    still streams (see `start_image_generation`). That image is dropped as soon as the candidate is not the
+    best one anymore, so at most the images of rejected single candidates are wasted.
+    The image of the chosen post is started right away otherwise, so it is generated
+    while the rest of the pipeline catches up.
+
+    Returns:
+        Optional[Dict[str, str]]: The extracted post data, or None if generation failed.
+    """
+    # images left over by an earlier invocation that failed before using them
+    discard_started_images()
+    best_data, best_score = None, None
+    candidates, prepared_prompt = get_post_candidates()
+    text_calls = 0 if prepared_prompt is None else max(1, POST_CANDIDATE_COUNT)
+    while True:
+        # read once per round, so the posts published since the last round are included
+        post_index = get_post_index()
+        scored = [(score_post(candidate, find_similar_post(candidate.get(GENERATED_POST, ''), post_index)), candidate)
+                  for candidate in candidates]
+        if len(scored) > 1:
+            logger.info(f"Candidate scores: {', '.join(f'{item[0].score:.2f}' for item in scored)}.")
+        for score, clean_data in scored:
+            if BACKLOG_POST_ID in clean_data and not is_acceptable(score):
+                # every later run would reject the pre-generated post too
+                remove_from_backlog(clean_data[BACKLOG_POST_ID])
+            if best_score is None or score.score > best_score.score:
+                if best_data is not None:
+                    discard_started_images(best_data.get(IMAGE_GENERATION_PROMPT))
+                best_data, best_score = clean_data, score
+            else:
+                discard_started_images(clean_data.get(IMAGE_GENERATION_PROMPT))
+        if best_score is not None and is_acceptable(best_score):
+            break
+
+        if prepared_prompt is None:
+            # the pre-generated post was rejected, new candidates are generated instead
+            candidates, prepared_prompt = get_post_candidates(use_backlog=False)
+            text_calls += max(1, POST_CANDIDATE_COUNT)
+            continue
+        if text_calls >= MAX_POST_TEXT_CALLS:
+            logger.error(f"No acceptable post after {text_calls} text model calls, using the best scoring one.")
+            break
+        if get_remaining_time(TEXT_DEADLINE_RESERVE_SECONDS) < POST_REGENERATION_TIME_SECONDS:
+            logger.error(f"No time left to regenerate after {text_calls} text model calls, using the best scoring one.")
+            break
+        if best_score is not None:
+            logger.warning(
+                f"Best post is not acceptable (similarity {best_score.similarity:.2f}, "
+                f"breaks rules: {', '.join(best_score.violations) or 'none'}), regenerating one candidate."
+            )
+        text_calls += 1
+        # with several candidates no image is spent before a post was chosen
+        clean_data = generate_post_candidate(prepared_prompt, start_image_generation if POST_CANDIDATE_COUNT <= 1 else None)
+        candidates = [clean_data] if clean_data is not None else []
+
+    if best_score is None or best_score.score == float('-inf'):
+        return None
+    start_image_generation(best_data[IMAGE_GENERATION_PROMPT])
+    return best_data
+
+
+def get_post_candidates(use_backlog: bool = USE_POST_BACKLOG) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """
+    Returns the post candidates: a pre-generated post from the backlog when available,
+    otherwise `POST_CANDIDATE_COUNT` posts generated concurrently for the same historical
+    period, so generating them takes about as long as a single text model call.
+
+    Args:
+        use_backlog (bool): Whether to take a pre-generated post from the backlog first.
+
+    Returns:
+        Tuple[List[Dict[str, str]], Optional[str]]: The extracted post data of the candidates
+        that were generated, and the prompt they were generated with, None for a backlog post.
+    """
+    if use_backlog:
+        backlog_post = claim_backlog_post()
+        if backlog_post is not None:
+            return [backlog_post], None
+
+    # prepare prompt about the next scheduled historical period, with an event of it not written about yet
+    historical_period = next_period() if PERIOD_SCHEDULER_ENABLED else random.choice(HISTORICAL_PERIODS)
+    historical_event = pick_event(historical_period) if EVENT_CATALOG_ENABLED else None
+    prepared_prompt = prepare_prompt(historical_period, historical_event)
+    if POST_CANDIDATE_COUNT <= 1:
+        clean_data = generate_post_candidate(prepared_prompt, start_image_generation)
+        return [clean_data] if clean_data is not None else [], prepared_prompt
+
+    # the image is only generated for the winner, so not started while the candidates stream
+    futures = [_candidate_executor.submit(generate_post_candidate, prepared_prompt)
+               for _ in range(POST_CANDIDATE_COUNT)]
+    return [clean_data for clean_data in (future.result() for future in futures) if clean_data is not None], prepared_prompt
+
+
+def generate_post_candidate(
+        prepared_prompt: str,
+        on_image_prompt: Optional[Callable[[str], Any]] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Generates a post with the text model and extracts its data.
+
+    Args:
+        prepared_prompt (str): The prompt for the text model.
+        on_image_prompt (Optional[Callable[[str], Any]]): Called with the image generation
+                                                          prompt once it has streamed in.
+
+    Returns:
+        Optional[Dict[str, str]]: The extracted post data, or None if generation failed.
+    """
+    # generate and extract AI generated data
+    if STREAMING_TEXT_GENERATION:
+        raw_generated_data = generate_new_post_streaming(prepared_prompt, on_image_prompt)
+    else:
+        raw_generated_data = generate_new_post(prepared_prompt)
+    return extract_generated_data(raw_generated_data)
+
+
+def start_image_generation(image_prompt: str) -> None:
+    """
+    Starts generating the images of a post in the background, before the pipeline needs them.
+
+    Called for a single candidate as soon as its image prompt has streamed in, so the image
+    is generated while the rest of the post is still being written, and for the chosen post.
+    Nothing is started when the images of the prompt were already started.
+
+    Args:
+        image_prompt (str): The image generation prompt of the post.
+    """
+    if image_prompt in _started_images:
+        return
+    logger.info('Starting image generation ahead of publishing.')
+    _started_images[image_prompt] = _image_executor.submit(generate_post_images, image_prompt)
+
+
+def discard_started_images(image_prompt: Optional[str] = None) -> None:
+    """
+    Drops images started for a post that was rejected, cancelling them if they have not
+    started yet. A Bedrock call already running cannot be cancelled, its result is ignored.
+
+    Args:
+        image_prompt (Optional[str]): The image generation prompt of the rejected post, all
+                                      started images are dropped when None.
+    """
+    prompts = list(_started_images) if image_prompt is None else [image_prompt]
+    for prompt in prompts:
+        started_images = _started_images.pop(prompt, None)
+        if started_images is not None and not started_images.cancel():
+            logger.info('Dropped the image started for a rejected post.')
+
+
+def generate_post_images(image_prompt: str) -> Dict[str, Optional[memoryview]]:
+    """
+    Generates the images of a post: the image in `IMAGE_ASPECT_RATIO` and, with variants
+    enabled, every aspect ratio of `IMAGE_VARIANT_TARGETS`, all generated concurrently.
+
+    Args:
+        image_prompt (str): The image generation prompt of the post.
+
+    Returns:
+        Dict[str, Optional[memoryview]]: The image of each aspect ratio, None where the generation failed.
+    """
+    if not IMAGE_VARIANTS_ENABLED:
+        return {IMAGE_ASPECT_RATIO: generate_image(image_prompt)}
+    aspect_ratios = [IMAGE_ASPECT_RATIO] + [ratio for ratio in IMAGE_VARIANT_TARGETS if ratio != IMAGE_ASPECT_RATIO]
+    return generate_image_variants(image_prompt, aspect_ratios)
+
+
+def get_generated_images(image_prompt: str) -> Dict[str, Optional[memoryview]]:
+    """
+    Returns the images for the prompt, waiting for the generation started with the post if there
+    is one, and generating them now otherwise.
+
+    Args:
+        image_prompt (str): The image generation prompt of the post being published.
+
+    Returns:
+        Dict[str, Optional[memoryview]]: The image of each aspect ratio, None where the generation failed.
+    """
+    started_images = _started_images.pop(image_prompt, None)
+    if started_images is not None:
+        return started_images.result()
+    return generate_post_images(image_prompt)
+
+
+def run_sequential_pipeline(
+        post_source: Callable[[], Optional[Dict[str, str]]],
+        checkpoint: Optional[PipelineCheckpoint] = None
+) -> Tuple[Dict[str, Any], List[PagePublishResult], float]:
+    """
+    Runs every stage of the pipeline one after another.
+
+    Args:
+        post_source (Callable[[], Optional[Dict[str, str]]]): Returns the post data to publish.
+        checkpoint (Optional[PipelineCheckpoint]): The checkpoint to resume from and save the stages to.
+
+    Returns:
+        Tuple[Dict[str, Any], List[PagePublishResult], float]: The extracted post data, the
+        publishing result of each page and the wall-clock time saved by overlapping stages,
+        which is always 0 in this mode.
+    """
+    clean_data = post_source()
+
+    page_results = publish_post_data(clean_data, checkpoint=checkpoint)
+
+    return clean_data, page_results, 0.0
+
+
+def run_concurrent_pipeline(
+        post_source: Callable[[], Optional[Dict[str, str]]],
+        checkpoint: Optional[PipelineCheckpoint] = None
+) -> Tuple[Dict[str, Any], List[PagePublishResult], float]:
+    """
+    Runs the pipeline, overlapping independent I/O with getting the post
+    (usually the Bedrock text generation call).
+
+    While the text model works, the Facebook Pages and their secrets are fetched, the TLS
+    connection to the Graph API is opened and the SNS client is built. The stages depending
+    on the generated text (image generation, Facebook posts, notification) run afterward.
+
+    Args:
+        post_source (Callable[[], Optional[Dict[str, str]]]): Returns the post data to publish.
+        checkpoint (Optional[PipelineCheckpoint]): The checkpoint to resume from and save the stages to.
+
+    Returns:
+        Tuple[Dict[str, Any], List[PagePublishResult], float]: The extracted post data, the
+        publishing result of each page and the wall-clock time in seconds saved by running
+        the independent stages concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=ORCHESTRATION_MAX_WORKERS) as executor:
+        overlap_start = time.perf_counter()
+        text_future = executor.submit(_timed, post_source)
+        pages_future = executor.submit(_timed, get_facebook_pages)
+        warmup_future = executor.submit(_timed, warm_up_graph_connection)
+        sns_client_future = executor.submit(_timed, create_sns_client)
+
+        clean_data, text_duration = text_future.result()
+        pages, pages_duration = pages_future.result()
+        _, warmup_duration = warmup_future.result()
+        sns_client, sns_client_duration = sns_client_future.result()
+        overlap_duration = time.perf_counter() - overlap_start
+
+    sequential_duration = text_duration + pages_duration + warmup_duration + sns_client_duration
+    overlap_saved = max(sequential_duration - overlap_duration, 0.0)
+    logger.info(
+        f"Concurrent stages took {overlap_duration:.3f}s instead of {sequential_duration:.3f}s, "
+        f"saved {overlap_saved:.3f}s of wall-clock time."
+    )
+
+    page_results = publish_post_data(clean_data, pages, sns_client, checkpoint)
+
+    return clean_data, page_results, overlap_saved
+
+
+def publish_post_data(
+        clean_data: Optional[Dict[str, str]],
+        pages: Optional[List[FacebookPage]] = None,
+        sns_client: Optional[Any] = None,
+        checkpoint: Optional[PipelineCheckpoint] = None
+) -> List[PagePublishResult]:
+    """
+    Generates the post image, prepares it for upload, publishes the post to every
+    Facebook Page and buffers the notification.
+
+    With a checkpoint, a previously generated image is reused and pages the post was
+    already published to are skipped. The checkpoint is completed once every page has it.
+
+    Args:
+        clean_data (Optional[Dict[str, str]]): The post data to publish.
+        pages (Optional[List[FacebookPage]]): Prefetched Facebook Pages, fetched when publishing if None.
+        sns_client (Optional[Any]): Prebuilt SNS client.
+        checkpoint (Optional[PipelineCheckpoint]): The checkpoint to resume from and save the stages to.
+
+    Returns:
+        List[PagePublishResult]: The publishing result of each page.
+
+    Raises:
+        ValueError: If no post data or no image was generated.
+        PublishError: If the post was not published to any page.
+    """
+    if clean_data is None:
+        raise ValueError('Failed to generate post data.')
+
+    image = checkpoint.load_image() if checkpoint is not None else None
+    if image is None:
+        image, variants = get_upload_image(clean_data)
+        if checkpoint is not None:
+            checkpoint.save_image(image, variants)
+    else:
+        variants = checkpoint.load_variants()
+
+    # post generated post and images to every facebook page it was not published to yet
+    page_results = publish_post(clean_data.get(GENERATED_POST), image, pages, sns_client, checkpoint, variants=variants)
+    # a pre-generated post leaves the backlog once published, a failed one is resumed from the checkpoint
+    if BACKLOG_POST_ID in clean_data:
+        remove_from_backlog(clean_data[BACKLOG_POST_ID])
+    return page_results
+
+
+def get_upload_image(clean_data: Dict[str, str]) -> Tuple[ProcessedImage, List[ImageVariant]]:
+    """
+    Generates the image of the post, and its variants when enabled, and prepares them for upload.
+
+    The feed post only needs one image, so failed variants are left out. When the image
+    in `IMAGE_ASPECT_RATIO` failed, another feed variant is used as the post image instead.
+
+    Args:
+        clean_data (Dict[str, str]): The post data with the image generation prompt.
+
+    Returns:
+        Tuple[ProcessedImage, List[ImageVariant]]: The image ready for upload, and the
+        variants generated in the other aspect ratios.
+
+    Raises:
+        ValueError: If no image for the feed post was generated.
+    """
+    # generate the images here to be passed to fb post, unless they were started when the post was chosen
+    images = get_generated_images(clean_data.get(IMAGE_GENERATION_PROMPT))
+    feed_ratios = [IMAGE_ASPECT_RATIO] + [ratio for ratio in images if IMAGE_VARIANT_TARGETS.get(ratio) == 'feed']
+    image_ratio = next((ratio for ratio in feed_ratios if images.get(ratio) is not None), None)
+    if image_ratio is None:
+        raise ValueError('Failed to generate image.')
+    if image_ratio != IMAGE_ASPECT_RATIO:
+        logger.warning(f"The {IMAGE_ASPECT_RATIO} image failed, posting the {image_ratio} variant instead.")
+
+    # downscale and re-encode the images for a smaller upload
+    with span('image_processing') as processing_span:
+        image = process_image(images[image_ratio])
+        variants = [
+            ImageVariant(ratio, IMAGE_VARIANT_TARGETS[ratio], process_image(image_bytes))
+            for ratio, image_bytes in images.items() if ratio != image_ratio and image_bytes is not None
+        ]
+        processing_span.set(
+            RequestBytes=sum(len(image_bytes) for image_bytes in images.values() if image_bytes is not None),
+            ResponseBytes=len(image.data) + sum(len(variant.image.data) for variant in variants)
+        )
+    return image, variants
+
+
+def fill_outbox(target_size: int, context: Any) -> int:
+    """
+    Generates posts with their images into the outbox until it holds `target_size` posts.
+
+    The posts are added to the near-duplicate index when queued, so the posts waiting
+    in the outbox are not repeated by the next ones generated. No new post is started
+    when less than `OUTBOX_POST_TIME_BUDGET` seconds of the invocation are left.
+
+    Args:
+        target_size (int): The number of posts the outbox should hold.
+        context (Any): The Lambda context, used for the remaining time.
+
+    Returns:
+        int: The number of posts added to the outbox.
+
+    Raises:
+        ValueError: If no post data or no image was generated.
+    """
+    generated_count = 0
+    while get_outbox_size() < target_size:
+        if context is not None and context.get_remaining_time_in_millis() < OUTBOX_POST_TIME_BUDGET * 1000:
+            logger.warning(f"Not enough time left to generate another post, {generated_count} added to the outbox.")
+            break
+        clean_data = get_post_data()
+        if clean_data is None:
+            raise ValueError('Failed to generate post data.')
+        image, variants = get_upload_image(clean_data)
+        add_to_outbox(clean_data, image, {'text_model': AI_MODEL}, variants)
+        add_published_post(clean_data.get(GENERATED_POST))
+        if BACKLOG_POST_ID in clean_data:
+            remove_from_backlog(clean_data[BACKLOG_POST_ID])
+        generated_count += 1
+    return generated_count
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """
+    Calls a function and measures how long it took.
+
+    Args:
+        func (Callable[..., Any]): The function to call.
+        *args (Any): Positional arguments passed to the function.
+
+    Returns:
+        Tuple[Any, float]: The function result and its duration in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def warm_up_init_phase() -> None:
+    """
+    Does the CPU-bound startup work during the Lambda init phase, before the first invocation.
+
+    The heavy libraries are imported and the clients every invocation needs are created,
+    so the invocation starts with them ready. Nothing that is only needed by some
+    invocations (e.g. the batch inference client) is prepared here.
+    """
+    start = time.perf_counter()
+    # the S3 client is only used when the content store is in S3
+    clients = [
+        (service_name, region_name) for service_name, region_name in INIT_WARMUP_CLIENTS
+        if service_name != 's3' or os.environ.get('CONTENT_BUCKET_NAME')
+    ]
+    warm_up_clients(clients)
+    if IMAGE_POSTPROCESSING_ENABLED:
+        load_image_library()
+    logger.info(f"Init phase warmup took {time.perf_counter() - start:.3f}s.")
+
+
+if STARTUP_MODE == 'init_warmup':
+    warm_up_init_phase()
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from typing import Any, BinaryIO, Dict, List, Optional
+from parse_utils import decode_base64_field
+from config import (
+    IMAGE_GENERATION_MODELS,
+    IMAGE_GENERATION_MODE,
+    IMAGE_OUTPUT_FORMAT,
+    IMAGE_SIZES,
+    IMAGE_MODEL_REGIONS,
+    IMAGE_MODEL_FALLBACK_REGIONS,
+    IMAGE_MODEL_EXPECTED_SECONDS,
+    IMAGE_MODEL_SLOW_SECONDS,
+    IMAGE_MODEL_MAX_ERROR_RATE,
+    IMAGE_MODEL_THROTTLE_COOLDOWN_SECONDS,
+    IMAGE_MODEL_STATS_WEIGHT,
+    IMAGE_MODEL_STATS_TTL_SECONDS,
+    DEFAULT_REGION
+)
+
+logger = logging.getLogger(__name__)
+
+# Latency assumed for models missing from IMAGE_MODEL_EXPECTED_SECONDS
+DEFAULT_EXPECTED_SECONDS = 10
+
+_stats: Dict[str, 'ImageModelStats'] = {}
+_lock = threading.Lock()
+
+
+class StabilityImageAdapter:
+    """
+    Request and response format of the Stability AI image models (Stable Diffusion 3.5, Stable Image Core/Ultra).
+    """
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        # only the Stable Diffusion 3 models take a generation mode
+        self.takes_mode = '.sd3' in model_id
+
+    def build_request(self, image_prompt: str, aspect_ratio: str) -> Dict[str, Any]:
+        """Returns the request body for the prompt and aspect ratio."""
+        request = {
+            'prompt': image_prompt,
+            'aspect_ratio': aspect_ratio,
+            'output_format': IMAGE_OUTPUT_FORMAT
+        }
+        if self.takes_mode:
+            request['mode'] = IMAGE_GENERATION_MODE
+        return request
+
+    def parse_response(self, response_body: Dict[str, Any]) -> memoryview:
+        """Returns the image from the response body, already decoded by `read_image_response`."""
+        return response_body['images'][0]
+
+
+class NovaCanvasAdapter:
+    """
+    Request and response format of the Amazon Nova Canvas and Titan Image Generator models.
+    """
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+
+    def build_request(self, image_prompt: str, aspect_ratio: str) -> Dict[str, Any]:
+        """Returns the request body for the prompt, with the pixel size of the aspect ratio."""
+        width, height = IMAGE_SIZES[aspect_ratio]
+        return {
+            'taskType': 'TEXT_IMAGE',
+            'textToImageParams': {'text': image_prompt},
+            'imageGenerationConfig': {'numberOfImages': 1, 'width': width, 'height': height, 'quality': 'standard'}
+        }
+
+    def parse_response(self, response_body: Dict[str, Any]) -> memoryview:
+        """Returns the image from the response body, raising an error reported by the model."""
+        if response_body.get('error'):
+            raise ValueError(f"Image model '{self.model_id}' returned an error: {response_body['error']}")
+        return response_body['images'][0]
+
+
+class ImageModelStats:
+    """
+    Recent latency and error rate of an image model, as exponentially weighted moving averages.
+
+    The stats are kept in the execution environment, so warm invocations route around
+    a model that was slow or failing in the previous ones. Stats not updated for
+    `IMAGE_MODEL_STATS_TTL_SECONDS` are reset, so a skipped model gets tried again.
+    """
+
+    def __init__(self, expected_seconds: float):
+        self.latency_seconds = expected_seconds
+        self.error_rate = 0.0
+        self.throttled_until = 0.0
+        self.updated = time.monotonic()
+
+    def record(self, duration: float, failed: bool, throttled: bool) -> None:
+        """Adds a call to the moving averages, failed calls only count towards the latency when slow."""
+        if not failed or duration > self.latency_seconds:
+            self.latency_seconds += IMAGE_MODEL_STATS_WEIGHT * (duration - self.latency_seconds)
+        self.error_rate += IMAGE_MODEL_STATS_WEIGHT * ((1.0 if failed else 0.0) - self.error_rate)
+        if throttled:
+            self.throttled_until = time.monotonic() + IMAGE_MODEL_THROTTLE_COOLDOWN_SECONDS
+        self.updated = time.monotonic()
+
+
+def get_image_adapter(model_id: str) -> StabilityImageAdapter | NovaCanvasAdapter:
+    """
+    Returns the request and response adapter of an image model.
+
+    Args:
+        model_id (str): The Bedrock model ID.
+
+    Returns:
+        StabilityImageAdapter | NovaCanvasAdapter: The adapter of the model's family.
+
+    Raises:
+        ValueError: If the model family is not supported.
+    """
+    if model_id.startswith('stability.'):
+        return StabilityImageAdapter(model_id)
+    if model_id.startswith(('amazon.nova-canvas', 'amazon.titan-image')):
+        return NovaCanvasAdapter(model_id)
+    raise ValueError(f"Unsupported image model '{model_id}'.")
+
+
+def read_image_response(stream: BinaryIO, content_length: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Reads the response body of an image model, decoding the image while it streams in.
+
+    Both model families return a list of base64 encoded images. The first one is decoded
+    straight into a preallocated buffer, so the response is not held in memory both as
+    the base64 string and as the decoded image.
+
+    Args:
+        stream (BinaryIO): The streamed response body.
+        content_length (Optional[int]): The length of the response body.
+
+    Returns:
+        Dict[str, Any]: The parsed response body, with the first image as a memoryview of its bytes.
+    """
+    return decode_base64_field(stream, 'images', content_length)
+
+
+def get_image_model_regions(model_id: str) -> List[str]:
+    """
+    Returns the regions to call an image model in, in order of preference.
+
+    Args:
+        model_id (str): The Bedrock model ID.
+
+    Returns:
+        List[str]: The model's configured regions followed by the fallback regions.
+    """
+    regions = IMAGE_MODEL_REGIONS.get(model_id, [DEFAULT_REGION])
+    return regions + [region for region in IMAGE_MODEL_FALLBACK_REGIONS if region not in regions]
+
+
+def choose_image_models(remaining_seconds: float, exclude: Optional[List[str]] = None) -> List[str]:
+    """
+    Returns the image models to try, in order, given the time left in the invocation.
+
+    Models are taken in the configured order of preference, skipping those that were
+    throttled recently, have a high recent error rate, are slow on average or would
+    not finish in the remaining time. When every model is skipped, the one expected
+    to finish soonest is returned, so an image is still attempted.
+
+    Args:
+        remaining_seconds (float): Time left for the image generation.
+        exclude (Optional[List[str]]): Models not to return, e.g. the ones that already failed.
+
+    Returns:
+        List[str]: The model IDs to try in order, empty if all of them are excluded.
+    """
+    now = time.monotonic()
+    models = [model_id for model_id in IMAGE_GENERATION_MODELS if model_id not in (exclude or [])]
+    with _lock:
+        stats = {model_id: _get_stats(model_id) for model_id in models}
+        eligible = [
+            model_id for model_id in models
+            if stats[model_id].throttled_until <= now
+            and stats[model_id].error_rate <= IMAGE_MODEL_MAX_ERROR_RATE
+            and stats[model_id].latency_seconds <= min(IMAGE_MODEL_SLOW_SECONDS, remaining_seconds)
+        ]
+        if eligible or not models:
+            return eligible
+        fastest = min(models, key=lambda model_id: stats[model_id].latency_seconds)
+    logger.warning(f"No image model expected to finish in {remaining_seconds:.1f}s, trying the fastest one '{fastest}'.")
+    return [fastest]
+
+
+def record_image_model_call(model_id: str, duration: float, error: Optional[BaseException] = None) -> None:
+    """
+    Records the outcome of an image model call in the model's routing stats.
+
+    Args:
+        model_id (str): The Bedrock model ID.
+        duration (float): How long the call took in seconds, including its retries.
+        error (Optional[BaseException]): The error the call failed with, None if it succeeded.
+    """
+    with _lock:
+        _get_stats(model_id).record(duration, error is not None, _is_throttling(error))
+
+
+def get_image_model_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns the routing stats of the image models called in this execution environment.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The average latency and error rate of each model.
+    """
+    with _lock:
+        return {
+            model_id: {'latency_seconds': round(stats.latency_seconds, 3), 'error_rate': round(stats.error_rate, 3)}
+            for model_id, stats in _stats.items()
+        }
+
+
+def _get_stats(model_id: str) -> ImageModelStats:
+    stats = _stats.get(model_id)
+    if stats is None or time.monotonic() - stats.updated > IMAGE_MODEL_STATS_TTL_SECONDS:
+        stats = _stats[model_id] = ImageModelStats(IMAGE_MODEL_EXPECTED_SECONDS.get(model_id, DEFAULT_EXPECTED_SECONDS))
+    return stats
+
+
+def _is_throttling(error: Optional[BaseException]) -> bool:
+    response = getattr(error, 'response', None)
+    return isinstance(response, dict) and response.get('Error', {}).get('Code') == 'ThrottlingException'
@@ -0,0 +1,157 @@
+import io
+import logging
+import time
+from typing import Any, NamedTuple, Optional, Tuple
+from config import (
+    IMAGE_POSTPROCESSING_ENABLED,
+    IMAGE_UPLOAD_MAX_SIZE,
+    IMAGE_UPLOAD_FORMAT,
+    IMAGE_UPLOAD_QUALITY,
+    IMAGE_FILE_NAME,
+    IMAGE_FILE_TYPE,
+    IMAGE_OUTPUT_FORMAT
+)
+
+logger = logging.getLogger(__name__)
+
+_NOT_LOADED = object()
+# Pillow's Image module, imported on first use, None if Pillow is not available
+_image_library: Any = _NOT_LOADED
+
+
+class ProcessedImage(NamedTuple):
+    """An image ready for upload, with the byte counts and duration of its processing."""
+    data: bytes | memoryview
+    file_name: str
+    file_type: str
+    original_bytes: int
+    processed_bytes: int
+    duration_seconds: float
+
+
+class ImageVariant(NamedTuple):
+    """The post image in another aspect ratio, with the Graph API upload it goes to ("feed" or "story")."""
+    aspect_ratio: str
+    target: str
+    image: ProcessedImage
+
+
+class BufferReader(io.RawIOBase):
+    """
+    A seekable binary file reading one or more buffers in sequence, without copying them.
+
+    Unlike `io.BytesIO`, which copies anything but `bytes` up front, only the blocks
+    actually read are copied, so an image is never held in memory twice when it is
+    opened by Pillow or streamed in an upload.
+    """
+
+    def __init__(self, *buffers: bytes | bytearray | memoryview):
+        self._buffers = [memoryview(buffer).cast('B') for buffer in buffers]
+        self._length = sum(len(buffer) for buffer in self._buffers)
+        self._position = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def readinto(self, block: bytearray | memoryview) -> int:
+        size, offset = 0, self._position
+        for buffer in self._buffers:
+            if size == len(block):
+                break
+            if offset >= len(buffer):
+                offset -= len(buffer)
+                continue
+            count = min(len(buffer) - offset, len(block) - size)
+            block[size:size + count] = buffer[offset:offset + count]
+            size += count
+            offset = 0
+        self._position += size
+        return size
+
+
+def load_image_library() -> Optional[Any]:
+    """
+    Imports Pillow's Image module on first use, keeping it off the cold start import path.
+
+    Returns:
+        Optional[Any]: The `PIL.Image` module, or None if Pillow is not available.
+    """
+    global _image_library
+    if _image_library is _NOT_LOADED:
+        try:
+            from PIL import Image
+            _image_library = Image
+        except ImportError:  # Pillow is optional, images are uploaded unchanged without it
+            _image_library = None
+    return _image_library
+
+
+def process_image(image_data: bytes | memoryview, max_size: Tuple[int, int] = IMAGE_UPLOAD_MAX_SIZE) -> ProcessedImage:
+    """
+    Prepares a generated image for upload to Facebook.
+
+    The image is downscaled to fit Facebook's recommended feed dimensions and
+    re-encoded to the configured upload format and quality, as Facebook recompresses
+    uploaded images anyway. When processing is disabled, Pillow is not available or
+    processing fails, the original image is returned unchanged.
+
+    Args:
+        image_data (bytes | memoryview): The image generated by the image model.
+        max_size (Tuple[int, int]): The maximum width and height of the uploaded image.
+
+    Returns:
+        ProcessedImage: The image to upload, with its file name and MIME type.
+    """
+    start = time.perf_counter()
+    Image = load_image_library() if IMAGE_POSTPROCESSING_ENABLED else None
+    if Image is not None:
+        try:
+            with Image.open(BufferReader(image_data)) as image:
+                original_dimensions = image.size
+                image.thumbnail(max_size, Image.LANCZOS)
+                if IMAGE_UPLOAD_FORMAT == 'jpeg' and image.mode != 'RGB':
+                    # JPEG has no alpha channel
+                    image = image.convert('RGB')
+                output = io.BytesIO()
+                image.save(output, format=IMAGE_UPLOAD_FORMAT.upper(), quality=IMAGE_UPLOAD_QUALITY, optimize=True)
+                processed = ProcessedImage(
+                    # a view of the encoded image, without copying it out of the output buffer
+                    output.getbuffer(),
+                    IMAGE_FILE_NAME,
+                    IMAGE_FILE_TYPE,
+                    len(image_data),
+                    output.tell(),
+                    time.perf_counter() - start
+                )
+            logger.info(
+                f"Processed image {original_dimensions} -> {image.size} {IMAGE_UPLOAD_FORMAT}: "
+                f"{processed.original_bytes} -> {processed.processed_bytes} bytes in {processed.duration_seconds:.3f}s."
+            )
+            return processed
+        except Exception as e:
+            logger.error(f"Image post-processing failed, uploading the original image: {e}", exc_info=True)
+    elif IMAGE_POSTPROCESSING_ENABLED:
+        logger.warning('Pillow is not available, uploading the original image.')
+
+    return ProcessedImage(
+        image_data,
+        f"image.{IMAGE_OUTPUT_FORMAT}",
+        f"image/{IMAGE_OUTPUT_FORMAT}",
+        len(image_data),
+        len(image_data),
+        time.perf_counter() - start
+    )
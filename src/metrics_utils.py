@@ -0,0 +1,144 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from config import (
+    METRICS_ENABLED,
+    METRICS_NAMESPACE
+)
+
+logger = logging.getLogger(__name__)
+
+# CloudWatch units of the metrics recorded by the stage spans
+METRIC_UNITS = {
+    'Duration': 'Milliseconds',
+    'Errors': 'Count',
+    'RequestBytes': 'Bytes',
+    'ResponseBytes': 'Bytes',
+    'InputTokens': 'Count',
+    'OutputTokens': 'Count',
+    'CacheReadInputTokens': 'Count',
+    'CacheWriteInputTokens': 'Count',
+    'TimeToFirstToken': 'Milliseconds',
+}
+# Metric names of the token counts in the 'usage' of Bedrock text model responses
+USAGE_METRICS = {
+    'inputTokens': 'InputTokens',
+    'outputTokens': 'OutputTokens',
+    'cacheReadInputTokenCount': 'CacheReadInputTokens',
+    'cacheWriteInputTokenCount': 'CacheWriteInputTokens',
+}
+# CloudWatch accepts at most 100 values per metric in one embedded metric document
+MAX_VALUES_PER_METRIC = 100
+
+# Metric values of the current invocation by stage, a stage can run several times (e.g. one photo upload per page)
+_stage_metrics: Dict[str, Dict[str, List[float]]] = {}
+_request_id: Optional[str] = None
+_lock = threading.Lock()
+
+
+class Span:
+    """The metrics of one run of a pipeline stage."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.metrics: Dict[str, float] = {}
+
+    def set(self, **metrics: float) -> None:
+        """Sets metrics of the stage, e.g. `RequestBytes`."""
+        self.metrics.update(metrics)
+
+    def set_usage(self, usage: Dict[str, Any]) -> None:
+        """Sets the token counts from the 'usage' of a Bedrock response."""
+        for field, metric in USAGE_METRICS.items():
+            if usage.get(field) is not None:
+                self.metrics[metric] = usage[field]
+
+    def fail(self) -> None:
+        """Marks the stage as failed, for stages that handle their errors without raising."""
+        self.metrics['Errors'] = 1
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Span]:
+    """
+    Measures a pipeline stage and records its duration and the metrics set on the span.
+
+    A stage left with an exception is counted as an error, and the exception is re-raised.
+
+    Args:
+        stage (str): The name of the stage, used as the 'Stage' dimension of the metrics.
+
+    Yields:
+        Span: The span to set the stage's payload sizes and token counts on.
+    """
+    current = Span(stage)
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception:
+        current.fail()
+        raise
+    finally:
+        current.metrics['Duration'] = (time.perf_counter() - start) * 1000
+        current.metrics.setdefault('Errors', 0)
+        with _lock:
+            stage_metrics = _stage_metrics.setdefault(stage, {})
+            for metric, value in current.metrics.items():
+                stage_metrics.setdefault(metric, []).append(value)
+
+
+def start_invocation(request_id: Optional[str] = None) -> None:
+    """
+    Starts collecting the metrics of a new invocation, dropping those of the previous one.
+
+    Args:
+        request_id (Optional[str]): The request ID of the invocation, added to the emitted metrics.
+    """
+    global _request_id
+    with _lock:
+        _stage_metrics.clear()
+        _request_id = request_id
+
+
+def get_stage_metrics() -> Dict[str, Dict[str, List[float]]]:
+    """
+    Returns the metric values recorded by each stage in the current invocation.
+
+    Returns:
+        Dict[str, Dict[str, List[float]]]: The values of each metric, by stage.
+    """
+    with _lock:
+        return {stage: {metric: list(values) for metric, values in metrics.items()} for stage, metrics in _stage_metrics.items()}
+
+
+def emit_metrics() -> None:
+    """
+    Writes the metrics of the current invocation to the log in CloudWatch embedded metric format.
+
+    One document is written per stage, with the stage as dimension, so CloudWatch extracts
+    per-stage metrics from the log without any API calls. The documents are printed to
+    stdout as they have to be the whole log line, without the log record prefix.
+    """
+    if not METRICS_ENABLED:
+        return
+    timestamp = int(time.time() * 1000)
+    for stage, metrics in get_stage_metrics().items():
+        document = {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Stage']],
+                    'Metrics': [{'Name': metric, 'Unit': METRIC_UNITS.get(metric, 'None')} for metric in metrics]
+                }]
+            },
+            'Stage': stage,
+            'RequestId': _request_id
+        }
+        for metric, values in metrics.items():
+            values = [round(value, 3) for value in values[:MAX_VALUES_PER_METRIC]]
+            document[metric] = values[0] if len(values) == 1 else values
+        print(json.dumps(document), flush=True)
@@ -0,0 +1,147 @@
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from storage_utils import get_store, claim
+from image_utils import ImageVariant, ProcessedImage
+from checkpoint_utils import PipelineCheckpoint, store_image, store_variants
+from config import (
+    OUTBOX_PREFIX,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_DEAD_LETTER_PREFIX,
+    OUTBOX_CLAIM_PREFIX,
+    OUTBOX_CLAIM_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+def add_to_outbox(
+        post: Dict[str, str],
+        image: ProcessedImage,
+        metadata: Optional[Dict[str, Any]] = None,
+        variants: Optional[List[ImageVariant]] = None
+) -> str:
+    """
+    Adds a finished post with its image to the outbox, to be published later by the publisher.
+
+    The image and its variants are written content-addressed to the store, the outbox item only refers to them.
+    Items are named by their creation time, so listing the outbox returns them oldest first.
+
+    Args:
+        post (Dict[str, str]): The extracted post data.
+        image (ProcessedImage): The image ready for upload.
+        metadata (Optional[Dict[str, Any]]): Additional information about the post, e.g. the models used.
+        variants (Optional[List[ImageVariant]]): The image in other aspect ratios.
+
+    Returns:
+        str: The ID of the outbox item.
+    """
+    now = datetime.now(timezone.utc)
+    item_id = f"{now:%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:8]}"
+    state = {
+        'created_at': now.isoformat(),
+        'post': post,
+        'image': store_image(image),
+        'variants': store_variants(variants or []),
+        'pages': {},
+        'completed': False,
+        'attempts': 0,
+        'metadata': metadata or {}
+    }
+    get_store().write(_outbox_key(item_id), json.dumps(state).encode('utf-8'))
+    logger.info(f"Added post '{item_id}' to the outbox.")
+    return item_id
+
+
+def next_outbox_item() -> Optional[PipelineCheckpoint]:
+    """
+    Claims and returns the oldest post in the outbox that no other publisher run is publishing.
+
+    The item is returned as a checkpoint, so the pages it gets published to are recorded
+    on the item itself and a retried publisher run does not publish to them again. The
+    claim is taken with a conditional write (see `storage_utils.claim`), so overlapping
+    publisher runs never publish the same item. It is released when the item is removed
+    or its failed attempt is recorded, and taken over after `OUTBOX_CLAIM_TIMEOUT` seconds.
+
+    Returns:
+        Optional[PipelineCheckpoint]: The oldest unclaimed outbox item, or None if there is none.
+    """
+    store = get_store()
+    for key in store.list(OUTBOX_PREFIX):
+        item_id = key[len(OUTBOX_PREFIX):].rsplit('.', 1)[0]
+        if not claim(_claim_key(item_id), OUTBOX_CLAIM_TIMEOUT):
+            logger.info(f"Post '{item_id}' is being published by another run, skipping it.")
+            continue
+        data = store.read(key)
+        if data is None:  # removed by a concurrent publisher run since listing
+            store.delete(_claim_key(item_id))
+            continue
+        return PipelineCheckpoint(item_id, json.loads(data), store_key=key)
+    return None
+
+
+def remove_from_outbox(item: PipelineCheckpoint) -> None:
+    """
+    Removes a published post from the outbox. Its image stays in the store.
+
+    Args:
+        item (PipelineCheckpoint): The outbox item returned by `next_outbox_item`.
+    """
+    store = get_store()
+    store.delete(item.store_key)
+    store.delete(_claim_key(item.key))
+    logger.info(f"Removed post '{item.key}' from the outbox.")
+
+
+def record_failed_attempt(item: PipelineCheckpoint) -> bool:
+    """
+    Counts a publisher run that did not publish the outbox post to any page.
+
+    After `OUTBOX_MAX_ATTEMPTS` failed runs the post is moved to the dead-letter prefix,
+    so it no longer blocks the posts queued after it. Its image stays in the store.
+    The claim of the post is released, so the next publisher run can retry it.
+
+    Args:
+        item (PipelineCheckpoint): The outbox item returned by `next_outbox_item`.
+
+    Returns:
+        bool: True if the post was moved to the dead letters.
+    """
+    attempts = item.state.get('attempts', 0) + 1
+    item.state['attempts'] = attempts
+    store = get_store()
+    # a lost count only delays moving the post to the dead letters, it must not fail the run
+    try:
+        if attempts < OUTBOX_MAX_ATTEMPTS:
+            store.write(item.store_key, json.dumps(item.state).encode('utf-8'))
+            store.delete(_claim_key(item.key))
+            logger.warning(f"Publishing post '{item.key}' from the outbox failed, attempt {attempts} of {OUTBOX_MAX_ATTEMPTS}.")
+            return False
+        store.write(f"{OUTBOX_DEAD_LETTER_PREFIX}{item.key}.json", json.dumps(item.state).encode('utf-8'))
+        store.delete(item.store_key)
+        store.delete(_claim_key(item.key))
+    except Exception as e:
+        logger.error(f"Failed to record the failed attempt of outbox post '{item.key}': {e}")
+        return False
+    logger.error(f"Publishing post '{item.key}' failed {attempts} times, moved it to the dead letters.")
+    return True
+
+
+def get_outbox_size() -> int:
+    """
+    Returns the number of posts waiting in the outbox.
+
+    Returns:
+        int: The number of outbox items.
+    """
+    return len(get_store().list(OUTBOX_PREFIX))
+
+
+def _outbox_key(item_id: str) -> str:
+    return f"{OUTBOX_PREFIX}{item_id}.json"
+
+
+def _claim_key(item_id: str) -> str:
+    return f"{OUTBOX_CLAIM_PREFIX}{item_id}.json"
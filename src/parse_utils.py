@@ -0,0 +1,326 @@
+import binascii
+import json
+import logging
+import re
+from typing import Any, BinaryIO, Dict, Optional
+from config import STREAM_MAX_PREAMBLE_CHARS, IMAGE_RESPONSE_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Parser states
+BEFORE_OBJECT = 'before_object'
+BEFORE_KEY = 'before_key'
+IN_KEY = 'in_key'
+BEFORE_COLON = 'before_colon'
+BEFORE_VALUE = 'before_value'
+IN_VALUE = 'in_value'
+STRING_END = 'string_end'
+AFTER_VALUE = 'after_value'
+DONE = 'done'
+MALFORMED = 'malformed'
+
+STRING_SPECIAL_CHARS = re.compile(r'["\\\x00-\x1f]')
+STRUCTURE_SPECIAL_CHARS = re.compile(r'["{}\[\]]')
+CONTROL_CHAR_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+STRING_TERMINATORS = ':}]'
+VALUE_STARTS = '"{[]}-0123456789'
+
+
+class IncrementalFieldParser:
+    """
+    Incremental parser for the flat JSON object with string values the text model returns.
+
+    Text chunks are fed as they stream in, and every field becomes available in
+    `fields` as soon as its closing quote has arrived, before the rest of the
+    object is generated. Structural errors mark the output as malformed right
+    away, so the stream can be aborted without waiting for it to finish.
+
+    The same model mistakes as in `parse_model_output` are repaired: a quote inside
+    a string only ends it when the next non-whitespace character is a delimiter
+    (checked once that character has streamed in), raw control characters are
+    kept in strings, and a trailing comma before the closing brace is ignored.
+    """
+
+    def __init__(self, max_preamble_chars: int = STREAM_MAX_PREAMBLE_CHARS):
+        self.max_preamble_chars = max_preamble_chars
+        self.fields: Dict[str, str] = {}
+        self.state = BEFORE_OBJECT
+        self.error: Optional[str] = None
+        self._preamble_chars = 0
+        self._buffer = []
+        self._escaped = False
+        self._key = None
+        # the string state a quote was found in, and the characters after it that decide whether it ended the string
+        self._string_state = None
+        self._lookahead = []
+        self._after_comma = False
+
+    @property
+    def malformed(self) -> bool:
+        return self.state == MALFORMED
+
+    @property
+    def done(self) -> bool:
+        return self.state == DONE
+
+    def feed(self, chunk: str) -> None:
+        """Processes the next chunk of streamed text."""
+        for char in chunk:
+            if self.state in (DONE, MALFORMED):
+                return
+            self._consume(char)
+
+    def _consume(self, char: str) -> None:
+        state = self.state
+        if state in (IN_KEY, IN_VALUE):
+            if self._escaped:
+                self._escaped = False
+            elif char == '\\':
+                self._escaped = True
+            elif char == '"':
+                self._string_state = state
+                self.state = STRING_END
+                return
+            self._buffer.append(char)
+        elif state == STRING_END:
+            self._resolve_quote(char)
+        elif state == BEFORE_OBJECT:
+            # tolerate a Markdown code fence or a short introduction before the object
+            if char == '{':
+                self.state = BEFORE_KEY
+            else:
+                self._preamble_chars += 1
+                if self._preamble_chars > self.max_preamble_chars:
+                    self._fail(f'no JSON object within the first {self.max_preamble_chars} characters')
+        elif char.isspace():
+            return
+        elif state == BEFORE_KEY:
+            if char == '"':
+                self.state = IN_KEY
+            elif char == '}':
+                # an empty object, or a trailing comma after the last field
+                self.state = DONE
+            else:
+                self._fail(f"expected a key, got {char!r}")
+        elif state == BEFORE_COLON:
+            if char == ':':
+                self.state = BEFORE_VALUE
+            else:
+                self._fail(f"expected ':', got {char!r}")
+        elif state == BEFORE_VALUE:
+            if char == '"':
+                self.state = IN_VALUE
+            else:
+                self._fail(f"expected a string value for '{self._key}', got {char!r}")
+        elif state == AFTER_VALUE:
+            if char == ',':
+                self.state = BEFORE_KEY
+            elif char == '}':
+                self.state = DONE
+            else:
+                self._fail(f"expected ',' or '}}', got {char!r}")
+
+    def _resolve_quote(self, char: str) -> None:
+        self._lookahead.append(char)
+        if char.isspace():
+            return
+        if char == ',' and not self._after_comma:
+            self._after_comma = True
+            return
+        # the same rule as `_closes_string`, after a comma the next key or value has to follow
+        closes = char in VALUE_STARTS if self._after_comma else char in STRING_TERMINATORS
+        lookahead = self._lookahead
+        self._lookahead, self._after_comma = [], False
+        self.state = self._string_state
+        if closes:
+            self._end_string()
+        else:
+            self._buffer.append('\\"')
+        # the characters after the quote are delimiters of the object, or the rest of the string
+        for lookahead_char in lookahead:
+            self._consume(lookahead_char)
+
+    def _end_string(self) -> None:
+        try:
+            # strict=False accepts raw newlines inside strings, which models often produce
+            value = json.loads('"' + ''.join(self._buffer) + '"', strict=False)
+        except json.JSONDecodeError as e:
+            self._fail(f"invalid string: {e}")
+            return
+        self._buffer = []
+        if self.state == IN_KEY:
+            self._key = value
+            self.state = BEFORE_COLON
+        else:
+            self.fields[self._key] = value
+            self.state = AFTER_VALUE
+
+    def _fail(self, error: str) -> None:
+        self.state = MALFORMED
+        self.error = error
+
+
+def parse_model_output(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses the JSON object from the text model output in a single pass.
+
+    The object is located regardless of Markdown code fences or text around it,
+    and common model mistakes are repaired on the way: raw newlines and other
+    control characters inside strings, unescaped quotes inside strings and
+    trailing commas before a closing bracket.
+
+    Args:
+        text (str): The raw text generated by the model.
+
+    Returns:
+        Optional[Dict[str, Any]]: The parsed object, or None if the text does not
+        contain a complete JSON object.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    repaired = []
+    depth = 0
+    in_string = False
+    position = start
+    length = len(text)
+    while True:
+        # jump to the next character that matters in the current context, copying the span before it as is
+        match = (STRING_SPECIAL_CHARS if in_string else STRUCTURE_SPECIAL_CHARS).search(text, position)
+        if match is None:
+            # the object was never closed, e.g. the output hit the token limit
+            return None
+        special = match.start()
+        repaired.append(text[position:special])
+        char = text[special]
+        position = special + 1
+        if in_string:
+            if char == '\\':
+                repaired.append(text[special:special + 2])
+                position = special + 2
+            elif char == '"':
+                if _closes_string(text, position):
+                    in_string = False
+                    repaired.append(char)
+                else:
+                    repaired.append('\\"')
+            else:
+                repaired.append(CONTROL_CHAR_ESCAPES.get(char, f'\\u{ord(char):04x}'))
+        elif char == '"':
+            in_string = True
+            repaired.append(char)
+        elif char in '{[':
+            depth += 1
+            repaired.append(char)
+        else:
+            # drop a trailing comma before the closing bracket, it is always in the span copied last
+            if repaired[-1].rstrip().endswith(','):
+                repaired[-1] = repaired[-1].rstrip()[:-1]
+            repaired.append(char)
+            depth -= 1
+            if depth == 0:
+                break
+        if position >= length:
+            return None
+
+    try:
+        parsed = json.loads(''.join(repaired))
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON from model output: {e}")
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def decode_base64_field(
+        stream: BinaryIO,
+        field: str,
+        content_length: Optional[int] = None,
+        chunk_size: int = IMAGE_RESPONSE_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Parses a JSON response body, decoding the first base64 string of a list field while it streams in.
+
+    The encoded string is never held in memory as a whole: it is decoded chunk by chunk
+    into a buffer preallocated from the content length, which is an upper bound of the
+    decoded size. The rest of the body is parsed as usual, so small fields such as an
+    error message are still available.
+
+    Args:
+        stream (BinaryIO): The response body, read in chunks.
+        field (str): The name of the list field, e.g. 'images'.
+        content_length (Optional[int]): The length of the body, the buffer grows as needed without it.
+        chunk_size (int): Bytes read from the stream at a time.
+
+    Returns:
+        Dict[str, Any]: The parsed body, with the first string of the field replaced by
+                        a memoryview of the decoded bytes.
+
+    Raises:
+        json.JSONDecodeError: If the body is not valid JSON.
+        binascii.Error: If the string is not valid base64.
+    """
+    value_start = re.compile(rb'"%s"\s*:\s*\[\s*"' % re.escape(field.encode('utf-8')))
+    head, tail, pending = bytearray(), bytearray(), b''
+    decoded = bytearray(content_length * 3 // 4 if content_length else 0)
+    decoded_length = 0
+    in_value = found = False
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if not found:
+            head += chunk
+            match = value_start.search(head)
+            if match is None:
+                continue
+            chunk = bytes(head[match.end():])
+            del head[match.end():]
+            in_value = found = True
+        if not in_value:
+            tail += chunk
+            continue
+
+        end = chunk.find(b'"')
+        # JSON encoders may escape the slashes of the base64 alphabet
+        encoded = (pending + (chunk if end < 0 else chunk[:end])).replace(b'\\/', b'/')
+        # only whole 4 character groups are decoded, the rest waits for the next chunk
+        usable = (len(encoded) - encoded.endswith(b'\\')) // 4 * 4 if end < 0 else len(encoded)
+        pending = encoded[usable:]
+        data = binascii.a2b_base64(encoded[:usable])
+        # overwrites the preallocated bytes, and only extends the buffer past its end
+        decoded[decoded_length:decoded_length + len(data)] = data
+        decoded_length += len(data)
+        if end >= 0:
+            in_value = False
+            tail += chunk[end:]
+
+    if in_value:
+        raise json.JSONDecodeError('Unterminated string', '', len(head))
+    parsed = json.loads(bytes(head + tail))
+    if found:
+        parsed[field][0] = memoryview(decoded)[:decoded_length]
+    return parsed
+
+
+def _closes_string(text: str, position: int) -> bool:
+    """
+    Checks whether a quote ends the string it is in, by looking at the next
+    non-whitespace character, which must be a JSON delimiter. After a comma,
+    the next value or key must follow, otherwise the quote is part of the text
+    (e.g. a quoted phrase followed by a comma).
+    """
+    position = _skip_whitespace(text, position)
+    if position == len(text):
+        return True
+    if text[position] == ',':
+        position = _skip_whitespace(text, position + 1)
+        return position == len(text) or text[position] in VALUE_STARTS
+    return text[position] in STRING_TERMINATORS
+
+
+def _skip_whitespace(text: str, position: int) -> int:
+    length = len(text)
+    while position < length and text[position] in ' \t\r\n':
+        position += 1
+    return position
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import time
+from config import (
+    GENERATED_POST,
+    ERROR_MESSAGE,
+    OUTBOX_EMPTY_MESSAGE,
+    OUTBOX_DEAD_LETTER_PREFIX,
+    STARTUP_MODE,
+    INIT_WARMUP_CLIENTS,
+    VERBOSE_LOGGING
+)
+from sns_utils import send_notification, flush_notifications
+from client_utils import warm_up_clients
+from publish_utils import publish_post, PublishError
+from outbox_utils import next_outbox_item, remove_from_outbox, record_failed_attempt
+from metrics_utils import span, start_invocation, emit_metrics
+from checkpoint_utils import PipelineCheckpoint
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG if VERBOSE_LOGGING else logging.INFO)
+
+
+def lambda_handler(event, context):
+    """
+    Publishes the oldest post from the outbox, filled ahead by the generator's fill_outbox mode.
+
+    Only the Facebook secrets, the stored post and image and the Graph API calls are
+    needed here, no Bedrock calls, so the run is short and its timing predictable.
+    A post that reaches no page is retried by the next runs, until it is moved to the
+    dead letters after `OUTBOX_MAX_ATTEMPTS` failed runs.
+    """
+    start_invocation(getattr(context, 'aws_request_id', None))
+    item = None
+    try:
+        logger.debug('Received event: %s', event)
+        item = next_outbox_item()
+        if item is None:
+            logger.warning(OUTBOX_EMPTY_MESSAGE)
+            send_notification(ERROR_MESSAGE + OUTBOX_EMPTY_MESSAGE)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': OUTBOX_EMPTY_MESSAGE})
+            }
+
+        logger.info(f"Publishing post '{item.key}' from the outbox.")
+        image = item.load_image()
+        if image is None:
+            raise ValueError(f"Image of outbox post '{item.key}' is missing.")
+
+        with span('pipeline'):
+            # the generator added the post to the near-duplicate index when it queued it
+            page_results = publish_post(
+                item.state['post'][GENERATED_POST], image, checkpoint=item, index_post=False, variants=item.load_variants()
+            )
+        # a partly published post is not published again, the notification lists the failed pages,
+        # publish_post raises when no page has it
+        remove_from_outbox(item)
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Facebook post published from the outbox.',
+                'post_content': item.state['post'],
+                'pages': [result._asdict() for result in page_results]
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        # publishing to no page was already notified by publish_post
+        if not isinstance(e, PublishError):
+            send_notification(ERROR_MESSAGE+str(e))
+        if item is not None:
+            _record_failed_attempt(item)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': f'An unexpected error occurred: {str(e)}'})
+        }
+
+    finally:
+        # the notifications buffered during the run, published once the post is out
+        flush_notifications()
+        emit_metrics()
+
+
+def _record_failed_attempt(item: PipelineCheckpoint) -> None:
+    """
+    Counts the failed run of the outbox post, with a notification when it is moved to the dead letters.
+
+    Args:
+        item (PipelineCheckpoint): The outbox item that was not published to any page.
+    """
+    if record_failed_attempt(item):
+        send_notification(
+            ERROR_MESSAGE + f"Post '{item.key}' kept failing and was moved to '{OUTBOX_DEAD_LETTER_PREFIX}' in the content store."
+        )
+
+
+def warm_up_init_phase() -> None:
+    """
+    Creates the clients the publisher needs during the Lambda init phase, before the first invocation.
+    """
+    start = time.perf_counter()
+    # no Bedrock calls here, and the S3 client is only used when the content store is in S3
+    clients = [
+        (service_name, region_name) for service_name, region_name in INIT_WARMUP_CLIENTS
+        if service_name != 'bedrock-runtime' and (service_name != 's3' or os.environ.get('CONTENT_BUCKET_NAME'))
+    ]
+    warm_up_clients(clients)
+    logger.info(f"Init phase warmup took {time.perf_counter() - start:.3f}s.")
+
+
+if STARTUP_MODE == 'init_warmup':
+    warm_up_init_phase()
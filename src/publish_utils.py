@@ -0,0 +1,96 @@
+import logging
+from typing import Any, List, Optional
+from config import (
+    SUCCESS_MESSAGE,
+    ERROR_MESSAGE
+)
+from sns_utils import notify, record_page_results, send_notification
+from facebook_utils import (
+    publish_to_pages,
+    get_facebook_pages,
+    FacebookPage,
+    PagePublishResult
+)
+from dedup_utils import add_published_post
+from image_utils import ImageVariant, ProcessedImage
+from checkpoint_utils import PipelineCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class PublishError(Exception):
+    """Raised when a post was not published to any page, after the error notification was sent."""
+
+
+def publish_post(
+        post_text: str,
+        image: ProcessedImage,
+        pages: Optional[List[FacebookPage]] = None,
+        sns_client: Optional[Any] = None,
+        checkpoint: Optional[PipelineCheckpoint] = None,
+        index_post: bool = True,
+        variants: Optional[List[ImageVariant]] = None
+) -> List[PagePublishResult]:
+    """
+    Publishes a post with its image to every Facebook Page and buffers the notification.
+
+    When the post reached no page, the error notification is sent right away instead.
+
+    With a checkpoint, pages the post was already published to are skipped and every
+    page is recorded as soon as it has the post. The checkpoint is completed once every
+    page has it.
+
+    Args:
+        post_text (str): The text content of the post.
+        image (ProcessedImage): The image ready for upload.
+        pages (Optional[List[FacebookPage]]): Prefetched Facebook Pages, fetched when publishing if None.
+        sns_client (Optional[Any]): Prebuilt SNS client.
+        checkpoint (Optional[PipelineCheckpoint]): The checkpoint to resume from and save the published pages to.
+        index_post (bool): Whether to add the post to the near-duplicate index once published.
+        variants (Optional[List[ImageVariant]]): The image in other aspect ratios, for the feed post and stories.
+
+    Returns:
+        List[PagePublishResult]: The publishing result of each page.
+
+    Raises:
+        PublishError: If the post was not published to any page.
+    """
+    if pages is None:
+        pages = get_facebook_pages()
+    published_results = checkpoint.published_results() if checkpoint is not None else []
+    published_names = {result.page_name for result in published_results}
+    remaining_pages = [page for page in pages if page.name not in published_names]
+    if published_results:
+        logger.info(f"Skipping {len(published_results)} pages the post was already published to.")
+    new_results = []
+    if remaining_pages:
+        new_results = publish_to_pages(
+            post_text,
+            image.data,
+            remaining_pages,
+            image.file_name,
+            image.file_type,
+            on_result=checkpoint.record_page if checkpoint is not None else None,
+            variants=variants
+        )
+    page_results = published_results + new_results
+    # the index already has the post if an earlier run published it
+    if index_post and not published_results and any(result.published for result in new_results):
+        add_published_post(post_text)
+
+    # buffer the notification to SNS, listing the pages the post could not be published to
+    record_page_results(page_results)
+    failed_pages = [result.page_name for result in page_results if not result.published]
+    if not any(result.published for result in page_results):
+        # a critical error, sent right away instead of with the digest at the end of the run
+        message = f"The post was not published to any page, failed pages: {', '.join(failed_pages) or 'none configured'}."
+        send_notification(ERROR_MESSAGE + message, sns_client)
+        raise PublishError(message)
+    if failed_pages:
+        notify(f"{SUCCESS_MESSAGE} Publishing failed for pages: {', '.join(failed_pages)}.", sns_client)
+    else:
+        notify(SUCCESS_MESSAGE, sns_client)
+        if checkpoint is not None:
+            checkpoint.complete()
+
+    return page_results
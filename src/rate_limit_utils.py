@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from config import (
+    GRAPH_PAGE_RATE_LIMIT,
+    GRAPH_PAGE_BURST,
+    GRAPH_APP_RATE_LIMIT,
+    GRAPH_APP_BURST,
+    GRAPH_RATE_LIMIT_MAX_WAIT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeoutError(Exception):
+    """Raised when a call could not get past the rate limit within the allowed wait."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` calls per second on average,
+    with bursts of up to `capacity` calls.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Takes a token, waiting until one is available.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait at most. Waits as long as needed when None.
+
+        Returns:
+            bool: True if a token was taken, False if none was available within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class GraphRateLimiter:
+    """
+    Rate limiter of Graph API calls, with a token bucket for each page and one for the whole app.
+
+    A call has to get a token from the bucket of its page first and then from the app bucket,
+    so one busy page cannot use up the limit of the others beyond its own bucket.
+    """
+
+    def __init__(
+            self,
+            page_rate: float = GRAPH_PAGE_RATE_LIMIT,
+            page_burst: float = GRAPH_PAGE_BURST,
+            app_rate: float = GRAPH_APP_RATE_LIMIT,
+            app_burst: float = GRAPH_APP_BURST
+    ):
+        self.page_rate = page_rate
+        self.page_burst = page_burst
+        self.app_bucket = TokenBucket(app_rate, app_burst)
+        self._page_buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, page_id: str, timeout: float = GRAPH_RATE_LIMIT_MAX_WAIT) -> None:
+        """
+        Waits until a Graph API call for the page is allowed.
+
+        Args:
+            page_id (str): The Facebook Page ID the call is made for.
+            timeout (float): Seconds to wait at most.
+
+        Raises:
+            RateLimitTimeoutError: If the call was not allowed within the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            page_bucket = self._page_buckets.get(page_id)
+            if page_bucket is None:
+                page_bucket = self._page_buckets[page_id] = TokenBucket(self.page_rate, self.page_burst)
+
+        if not page_bucket.acquire(timeout):
+            raise RateLimitTimeoutError(f"Rate limit of page {page_id} not cleared within {timeout}s.")
+        if not self.app_bucket.acquire(max(deadline - time.monotonic(), 0)):
+            raise RateLimitTimeoutError(f"App rate limit not cleared within {timeout}s.")
+
+
+# Shared between threads and warm invocations, as the Graph API limits are not reset by a new invocation
+_graph_rate_limiter: Optional[GraphRateLimiter] = None
+_lock = threading.Lock()
+
+
+def get_graph_rate_limiter() -> GraphRateLimiter:
+    """
+    Returns the rate limiter shared by all Graph API calls of the execution environment.
+
+    Returns:
+        GraphRateLimiter: The shared rate limiter.
+    """
+    global _graph_rate_limiter
+    with _lock:
+        if _graph_rate_limiter is None:
+            _graph_rate_limiter = GraphRateLimiter()
+        return _graph_rate_limiter
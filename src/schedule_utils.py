@@ -0,0 +1,139 @@
+import json
+import logging
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from storage_utils import get_store
+from config import (
+    HISTORICAL_PERIODS,
+    PERIOD_WEIGHTS,
+    PERIOD_COOLDOWN_ASSIGNMENTS,
+    PERIOD_SCHEDULE_KEY
+)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+class PeriodScheduler:
+    """
+    Assigns historical periods to posts by weighted sampling without replacement.
+
+    Every period is assigned once per round. The order of a round is drawn with
+    Efraimidis-Spirakis keys (a random number raised to 1/weight), so periods with
+    a higher weight tend to come earlier in the round. A period assigned within the
+    last `cooldown` assignments is skipped, so it does not come up again right after
+    a new round starts.
+    """
+
+    def __init__(
+            self,
+            periods: List[str],
+            weights: Optional[Dict[str, float]] = None,
+            cooldown: int = PERIOD_COOLDOWN_ASSIGNMENTS,
+            state: Optional[Dict[str, Any]] = None,
+            rng: Optional[random.Random] = None
+    ):
+        self.weights = {period: (weights or {}).get(period, 1.0) for period in periods}
+        self.periods = [period for period in periods if self.weights[period] > 0]
+        # with a cooldown as long as the period list, no period could ever be assigned
+        self.cooldown = max(min(cooldown, len(self.periods) - 1), 0)
+        self.rng = rng or random.Random()
+        state = state or {}
+        # periods removed from the configuration since the state was saved are dropped
+        active = set(self.periods)
+        self.queue = [period for period in state.get('queue', []) if period in active]
+        self.recent = [period for period in state.get('recent', []) if period in active]
+        self.assigned: Dict[str, int] = dict(state.get('assigned', {}))
+
+    def plan(self, count: int) -> List[str]:
+        """
+        Assigns the periods of the next posts.
+
+        Args:
+            count (int): The number of posts to assign a period to.
+
+        Returns:
+            List[str]: The periods in the order the posts should use them.
+        """
+        planned = []
+        for _ in range(count):
+            if not self.queue:
+                self.queue = self._draw_round()
+            cooling = set(self.recent[-self.cooldown:]) if self.cooldown else set()
+            position = next((index for index, period in enumerate(self.queue) if period not in cooling), None)
+            if position is None:
+                # the rest of the round is still cooling down, the periods of the next round come first
+                queued = set(self.queue)
+                self.queue += [period for period in self._draw_round() if period not in queued]
+                position = next(index for index, period in enumerate(self.queue) if period not in cooling)
+            period = self.queue.pop(position)
+            self.recent = (self.recent + [period])[-self.cooldown:] if self.cooldown else []
+            self.assigned[period] = self.assigned.get(period, 0) + 1
+            planned.append(period)
+        return planned
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """The state to save between runs."""
+        return {
+            'queue': self.queue,
+            'recent': self.recent,
+            'assigned': self.assigned,
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }
+
+    def _draw_round(self) -> List[str]:
+        keys = {period: self.rng.random() ** (1.0 / self.weights[period]) for period in self.periods}
+        return sorted(self.periods, key=keys.__getitem__, reverse=True)
+
+
+def plan_next(count: int = 1, reserve: bool = True) -> List[str]:
+    """
+    Plans the historical periods of the next posts.
+
+    The scheduler state is read from the store on every call, so the periods continue
+    where the previous run, in this or another execution environment, left off. Bulk
+    generators should plan all their posts in one call, so concurrent workers they
+    hand the periods to get non-overlapping assignments.
+
+    Args:
+        count (int): The number of posts to plan.
+        reserve (bool): Whether to save the planned periods as assigned. Without it,
+                        the plan is only a preview of the coming periods.
+
+    Returns:
+        List[str]: The period of each post, in order.
+    """
+    with _lock:
+        scheduler = PeriodScheduler(HISTORICAL_PERIODS, PERIOD_WEIGHTS, PERIOD_COOLDOWN_ASSIGNMENTS, _load_state())
+        periods = scheduler.plan(count)
+        if reserve:
+            # a lost write only makes the periods come up again, it must not fail the run
+            try:
+                get_store().write(PERIOD_SCHEDULE_KEY, json.dumps(scheduler.state).encode('utf-8'))
+            except Exception as e:
+                logger.error(f"Failed to save period schedule: {e}")
+    logger.info(f"Planned historical periods: {periods}")
+    return periods
+
+
+def next_period() -> str:
+    """
+    Assigns the historical period of the next post.
+
+    Returns:
+        str: The period, as in `HISTORICAL_PERIODS`.
+    """
+    return plan_next(1)[0]
+
+
+def _load_state() -> Optional[Dict[str, Any]]:
+    try:
+        data = get_store().read(PERIOD_SCHEDULE_KEY)
+        return json.loads(data) if data else None
+    except Exception as e:
+        logger.error(f"Failed to load period schedule, starting a new one: {e}")
+        return None
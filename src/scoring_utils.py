@@ -0,0 +1,72 @@
+import logging
+import re
+from typing import Dict, List, NamedTuple, Optional
+from config import (
+    GENERATED_POST,
+    IMAGE_GENERATION_PROMPT,
+    MAX_POST_WORDS,
+    REQUIRED_HASHTAG_COUNT,
+    CANDIDATE_SCORE_WEIGHTS,
+    DUPLICATE_SIMILARITY_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\S+')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+# Pictographs, symbols and dingbats, the ranges nearly all emojis fall in
+EMOJI_PATTERN = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF]')
+
+
+class PostScore(NamedTuple):
+    """The score of a post candidate, with the prompt rules it breaks."""
+    score: float
+    similarity: float
+    violations: List[str]
+
+
+def score_post(clean_data: Optional[Dict[str, str]], similarity: float) -> PostScore:
+    """
+    Scores a generated post against the rules of the prompt and its novelty.
+
+    The score is the sum of the weights of the rules the post follows (word count,
+    hashtag count, emojis) plus the novelty weight times how different the post is
+    from the most similar published post. Posts without both output fields get
+    a score of minus infinity, as no image can be generated for them.
+
+    Args:
+        clean_data (Optional[Dict[str, str]]): The extracted post data.
+        similarity (float): The similarity to the closest published post (0.0-1.0).
+
+    Returns:
+        PostScore: The score of the post and the names of the rules it breaks.
+    """
+    if not clean_data or not clean_data.get(GENERATED_POST) or not clean_data.get(IMAGE_GENERATION_PROMPT):
+        return PostScore(float('-inf'), similarity, ['invalid_json'])
+
+    text = clean_data[GENERATED_POST]
+    # hashtags are words too, but they do not count towards the post length
+    word_count = len(WORD_PATTERN.findall(text)) - len(HASHTAG_PATTERN.findall(text))
+    rules = {
+        'word_count': word_count <= MAX_POST_WORDS,
+        'hashtags': len(set(HASHTAG_PATTERN.findall(text))) == REQUIRED_HASHTAG_COUNT,
+        'emoji': EMOJI_PATTERN.search(text) is not None,
+    }
+    violations = [rule for rule, followed in rules.items() if not followed]
+    score = sum(CANDIDATE_SCORE_WEIGHTS[rule] for rule, followed in rules.items() if followed)
+    score += CANDIDATE_SCORE_WEIGHTS['novelty'] * (1.0 - similarity)
+    return PostScore(score, similarity, violations)
+
+
+def is_acceptable(score: PostScore) -> bool:
+    """
+    Returns whether a scored post can be published: it follows every rule of the
+    prompt and is not a near-duplicate of a published post.
+
+    Args:
+        score (PostScore): The score of the post.
+
+    Returns:
+        bool: True if the post is acceptable.
+    """
+    return not score.violations and score.similarity < DUPLICATE_SIMILARITY_THRESHOLD
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from client_utils import get_client
+from config import SECRET_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Cached secret values with the monotonic time they expire at, kept between warm invocations
+_cache: Dict[str, Tuple[str, float]] = {}
+_lock = threading.Lock()
+
+
+def get_secrets(secret_names: List[str], ttl: float = SECRET_CACHE_TTL_SECONDS) -> Dict[str, str]:
+    """
+    Retrieves secret strings from AWS Secrets Manager through an in-memory TTL cache.
+
+    Secrets that are missing or expired in the cache are fetched together
+    with a single BatchGetSecretValue call instead of one round trip per secret.
+
+    Args:
+        secret_names (List[str]): The names or ARNs of the secrets to retrieve.
+        ttl (float): How long in seconds the fetched values stay valid in the cache.
+
+    Returns:
+        Dict[str, str]: The secret strings keyed by the requested secret names.
+
+    Raises:
+        Exception: If any of the secrets could not be retrieved from Secrets Manager.
+    """
+    now = time.monotonic()
+    secrets = {}
+    with _lock:
+        for secret_name in secret_names:
+            cached = _cache.get(secret_name)
+            if cached is not None and cached[1] > now:
+                secrets[secret_name] = cached[0]
+
+    missing = [secret_name for secret_name in dict.fromkeys(secret_names) if secret_name not in secrets]
+    if not missing:
+        return secrets
+
+    fetched = _batch_get_secret_values(missing)
+    expires_at = time.monotonic() + ttl
+    with _lock:
+        for secret_name, secret_value in fetched.items():
+            _cache[secret_name] = (secret_value, expires_at)
+    secrets.update(fetched)
+    return secrets
+
+
+def invalidate_secrets(secret_names: Optional[Iterable[str]] = None) -> None:
+    """
+    Removes secrets from the cache, so the next lookup fetches them again.
+
+    Args:
+        secret_names (Optional[Iterable[str]]): The secrets to invalidate.
+                                                Every cached secret is invalidated when None.
+    """
+    with _lock:
+        if secret_names is None:
+            _cache.clear()
+        else:
+            for secret_name in secret_names:
+                _cache.pop(secret_name, None)
+    logger.info('Secret cache invalidated.')
+
+
+def _batch_get_secret_values(secret_names: List[str]) -> Dict[str, str]:
+    """
+    Fetches several secret strings with one BatchGetSecretValue call.
+
+    Args:
+        secret_names (List[str]): The names or ARNs of the secrets to fetch.
+
+    Returns:
+        Dict[str, str]: The secret strings keyed by the requested secret names.
+
+    Raises:
+        Exception: If the call fails or any of the secrets is missing in the response.
+    """
+    try:
+        response = get_client('secretsmanager').batch_get_secret_value(SecretIdList=secret_names)
+        if response.get('Errors'):
+            raise RuntimeError(f"Secrets Manager returned errors: {response['Errors']}")
+
+        secrets = {}
+        for secret_value in response.get('SecretValues', []):
+            # Secrets can be requested either by name or by ARN
+            for secret_name in (secret_value.get('Name'), secret_value.get('ARN')):
+                if secret_name in secret_names and 'SecretString' in secret_value:
+                    secrets[secret_name] = secret_value['SecretString']
+
+        not_returned = [secret_name for secret_name in secret_names if secret_name not in secrets]
+        if not_returned:
+            raise RuntimeError(f"Secrets Manager did not return secrets: {not_returned}")
+        return secrets
+    except Exception as e:
+        logger.error(f"Error retrieving secrets {secret_names}: {e}")
+        raise
@@ -1,21 +1,106 @@
-import boto3
 import json
 import os
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional
+from client_utils import get_client
+from facebook_utils import PagePublishResult
+from metrics_utils import span, get_stage_metrics
 from config import (
     DEFAULT_REGION,
-    MESSAGE_SUBJECT
+    MESSAGE_SUBJECT,
+    NOTIFICATION_MODE,
+    SNS_PUBLISH_BATCH_SIZE,
+    SNS_MAX_MESSAGE_BYTES
 )
 
 logger = logging.getLogger(__name__)
 
-def send_notification(message: str) -> Dict[str, Any]:
+
+class NotificationBuffer:
+    """
+    The notifications of one invocation, collected while it runs and published when it ends.
+
+    Buffering a notification only appends it to a list, so publishing the post is not
+    held up by SNS calls. The page results and stage timings of the run are added to
+    the digest, which is sent as a single message.
+    """
+
+    def __init__(self):
+        self.messages: List[str] = []
+        self.page_results: List[PagePublishResult] = []
+        self._lock = threading.Lock()
+
+    def add(self, message: str) -> None:
+        """Buffers a notification message."""
+        with self._lock:
+            self.messages.append(message)
+
+    def add_page_results(self, page_results: List[PagePublishResult]) -> None:
+        """Buffers the publishing results of the pages for the digest."""
+        with self._lock:
+            self.page_results.extend(page_results)
+
+    def take(self) -> 'NotificationBuffer':
+        """Returns the buffered notifications in a new buffer and empties this one."""
+        taken = NotificationBuffer()
+        with self._lock:
+            taken.messages, self.messages = self.messages, []
+            taken.page_results, self.page_results = self.page_results, []
+        return taken
+
+    def digest(self, stage_durations: Dict[str, float]) -> str:
+        """
+        Formats the notifications, page results and stage timings as one message.
+
+        Args:
+            stage_durations (Dict[str, float]): The total duration of each stage in milliseconds.
+
+        Returns:
+            str: The digest message.
+        """
+        lines = list(self.messages)
+        if self.page_results:
+            lines += ['', 'Pages:']
+            lines += [
+                f"- {result.page_name}: {'published' if result.published else 'failed'} "
+                f"in {result.duration_seconds:.1f}s" + (f" ({result.error})" if result.error else '')
+                for result in self.page_results
+            ]
+        if stage_durations:
+            lines += ['', 'Stage timings:']
+            lines += [f"- {stage}: {duration:.0f} ms" for stage, duration in stage_durations.items()]
+        return '\n'.join(lines)
+
+
+# Notifications of the current invocation, published by `flush_notifications`
+_buffer = NotificationBuffer()
+
+
+def create_sns_client() -> Optional[Any]:
+    """
+    Gets the shared AWS SNS client, so it can be prepared ahead of publishing.
+
+    Returns:
+        Optional[Any]: The boto3 SNS client if created successfully, otherwise None.
+    """
+    try:
+        return get_client('sns', DEFAULT_REGION)
+    except Exception as e:
+        logger.warning(f"Error creating SNS client: {e}")
+        return None
+
+
+def send_notification(message: str, sns_client: Optional[Any] = None) -> Dict[str, Any]:
     """
     Publishes a message to an AWS SNS (Simple Notification Service) topic.
 
+    The message is published right away, so this is used for errors of the run. Other
+    notifications are buffered with `notify` and published by `flush_notifications`.
+
     Args:
         message (str): The content of the message to be published.
+        sns_client (Optional[Any]): A pre-created SNS client. The shared client is used when None.
 
     Returns:
         dict: A dictionary containing the status code and a body with a success
@@ -23,16 +108,19 @@ def send_notification(message: str) -> Dict[str, Any]:
               Returns None if the SNS_TOPIC_ARN environment variable is not set.
     """
     try:
-        sns_client = boto3.client('sns', region_name=DEFAULT_REGION)
+        if sns_client is None:
+            sns_client = get_client('sns', DEFAULT_REGION)
         topic_arn = os.environ.get('SNS_TOPIC_ARN')  # Replace with your topic ARN
 
         message_subject = MESSAGE_SUBJECT
         message_body = message
-        response = sns_client.publish(
-            TopicArn=topic_arn,
-            Message=message_body,
-            Subject=message_subject
-        )
+        with span('sns') as sns_span:
+            sns_span.set(RequestBytes=len(message_body.encode('utf-8')))
+            response = sns_client.publish(
+                TopicArn=topic_arn,
+                Message=message_body,
+                Subject=message_subject
+            )
         logger.info(f"SNS message published! Message ID: {response['MessageId']}")
 
     except Exception as e:
@@ -41,3 +129,105 @@ def send_notification(message: str) -> Dict[str, Any]:
             'statusCode': 500,
             'body': json.dumps(f"Error publishing SNS message: {str(e)}")
         }
+
+
+def notify(message: str, sns_client: Optional[Any] = None) -> None:
+    """
+    Buffers a notification until the end of the invocation, or publishes it right away
+    when `NOTIFICATION_MODE` is "immediate".
+
+    Args:
+        message (str): The content of the notification.
+        sns_client (Optional[Any]): A pre-created SNS client, used when publishing right away.
+    """
+    if NOTIFICATION_MODE == 'immediate':
+        send_notification(message, sns_client)
+    else:
+        _buffer.add(message)
+
+
+def record_page_results(page_results: List[PagePublishResult]) -> None:
+    """
+    Adds the publishing results of the pages to the digest of the invocation.
+
+    Args:
+        page_results (List[PagePublishResult]): The publishing result of each page.
+    """
+    _buffer.add_page_results(page_results)
+
+
+def flush_notifications(sns_client: Optional[Any] = None) -> int:
+    """
+    Publishes the notifications buffered in the invocation with SNS PublishBatch.
+
+    In "digest" mode the notifications, page results and stage timings are sent as one
+    message, in "batch" mode every notification is its own message. The messages are
+    sent `SNS_PUBLISH_BATCH_SIZE` at a time, each request within the SNS size limit.
+    Errors are logged, a lost notification must not fail the run.
+
+    Args:
+        sns_client (Optional[Any]): A pre-created SNS client. The shared client is used when None.
+
+    Returns:
+        int: The number of messages published.
+    """
+    buffer = _buffer.take()
+    if not buffer.messages:
+        return 0
+    if NOTIFICATION_MODE == 'digest':
+        stage_durations = {
+            stage: sum(metrics.get('Duration', []))
+            for stage, metrics in get_stage_metrics().items()
+        }
+        messages = [buffer.digest(stage_durations)]
+    else:
+        messages = buffer.messages
+
+    published_count = 0
+    try:
+        if sns_client is None:
+            sns_client = get_client('sns', DEFAULT_REGION)
+        topic_arn = os.environ.get('SNS_TOPIC_ARN')
+        for batch in _batch_messages(messages):
+            entries = [
+                {'Id': str(index), 'Message': message, 'Subject': MESSAGE_SUBJECT}
+                for index, message in enumerate(batch)
+            ]
+            with span('sns') as sns_span:
+                sns_span.set(RequestBytes=sum(len(message.encode('utf-8')) for message in batch))
+                response = sns_client.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+            published_count += len(response.get('Successful', []))
+            for failed in response.get('Failed', []):
+                logger.error(f"SNS message {failed.get('Id')} was not published: {failed.get('Code')} {failed.get('Message')}")
+    except Exception as e:
+        logger.error(f"Error publishing SNS messages: {e}")
+    logger.info(f"Published {published_count} of {len(messages)} SNS messages.")
+    return published_count
+
+
+def _batch_messages(messages: List[str]) -> List[List[str]]:
+    """
+    Splits messages into PublishBatch requests within the SNS entry count and size limits.
+
+    A message over the size limit on its own is truncated.
+
+    Args:
+        messages (List[str]): The messages to publish.
+
+    Returns:
+        List[List[str]]: The messages of each request.
+    """
+    batches, batch, batch_bytes = [], [], 0
+    for message in messages:
+        message_bytes = len(message.encode('utf-8'))
+        if message_bytes > SNS_MAX_MESSAGE_BYTES:
+            message = message.encode('utf-8')[:SNS_MAX_MESSAGE_BYTES].decode('utf-8', errors='ignore')
+            message_bytes = len(message.encode('utf-8'))
+        if batch and (len(batch) == SNS_PUBLISH_BATCH_SIZE or batch_bytes + message_bytes > SNS_MAX_MESSAGE_BYTES):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(message)
+        batch_bytes += message_bytes
+    if batch:
+        batches.append(batch)
+    return batches
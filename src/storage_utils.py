@@ -0,0 +1,212 @@
+import os
+import fcntl
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+from client_utils import get_client
+from config import (
+    DEFAULT_REGION,
+    LOCAL_STORE_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+_store = None
+_lock = threading.Lock()
+
+
+class LocalStore:
+    """
+    Object store backed by a local directory, used when no S3 bucket is configured.
+
+    In Lambda the directory lives in /tmp, so its content survives warm starts
+    of the same execution environment, but not cold starts.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Returns the object content, or None if the object does not exist."""
+        try:
+            with open(self._path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def read_version(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns the object content and its version, both None if the object does not exist."""
+        data = self.read(key)
+        return data, _content_version(data)
+
+    def write_if_unchanged(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """
+        Replaces the object only if it is still at the version read by `read_version`, or
+        creates it only if it does not exist when the version is None. Returns False if
+        another writer changed it in between.
+        """
+        os.makedirs(self.root_dir, exist_ok=True)
+        # a lock on the store directory, so writers in other processes and threads wait for each other
+        lock_fd = os.open(self.root_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            if _content_version(self.read(key)) != version:
+                return False
+            self.write(key, data)
+            return True
+        finally:
+            os.close(lock_fd)
+
+    def write(self, key: str, data: bytes | memoryview) -> None:
+        """Creates or replaces the object."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so readers never see a partially written object
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def delete(self, key: str) -> None:
+        """Deletes the object if it exists."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str) -> List[str]:
+        """Returns the sorted keys of all objects starting with the prefix."""
+        keys = []
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                key = os.path.relpath(os.path.join(dir_path, file_name), self.root_dir).replace(os.sep, '/')
+                if key.startswith(prefix) and not key.endswith('.tmp'):
+                    keys.append(key)
+        return sorted(keys)
+
+    def uri(self, key: str) -> str:
+        """Returns the URI of the object."""
+        return f"file://{self._path(key)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root_dir, *key.split('/'))
+
+
+class S3Store:
+    """
+    Object store backed by an S3 bucket.
+    """
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Returns the object content, or None if the object does not exist."""
+        s3_client = get_client('s3', DEFAULT_REGION)
+        try:
+            response = s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return response['Body'].read()
+        except s3_client.exceptions.NoSuchKey:
+            return None
+
+    def read_version(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns the object content and its ETag, both None if the object does not exist."""
+        s3_client = get_client('s3', DEFAULT_REGION)
+        try:
+            response = s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return response['Body'].read(), response['ETag']
+        except s3_client.exceptions.NoSuchKey:
+            return None, None
+
+    def write_if_unchanged(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """
+        Replaces the object only if it still has the ETag read by `read_version`, or creates
+        it only if it does not exist when the version is None. Returns False if another
+        writer changed it in between.
+        """
+        from botocore.exceptions import ClientError
+        condition = {'IfMatch': version} if version is not None else {'IfNoneMatch': '*'}
+        try:
+            get_client('s3', DEFAULT_REGION).put_object(Bucket=self.bucket_name, Key=key, Body=data, **condition)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict', 'NoSuchKey'):
+                return False
+            raise
+
+    def write(self, key: str, data: bytes | memoryview) -> None:
+        """Creates or replaces the object."""
+        # boto3 takes bytes or a file, not a memoryview, the stored images are small processed ones
+        body = data.tobytes() if isinstance(data, memoryview) else data
+        get_client('s3', DEFAULT_REGION).put_object(Bucket=self.bucket_name, Key=key, Body=body)
+
+    def delete(self, key: str) -> None:
+        """Deletes the object if it exists."""
+        get_client('s3', DEFAULT_REGION).delete_object(Bucket=self.bucket_name, Key=key)
+
+    def list(self, prefix: str) -> List[str]:
+        """Returns the sorted keys of all objects starting with the prefix."""
+        paginator = get_client('s3', DEFAULT_REGION).get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(item['Key'] for item in page.get('Contents', []))
+        return sorted(keys)
+
+    def uri(self, key: str) -> str:
+        """Returns the URI of the object."""
+        return f"s3://{self.bucket_name}/{key}"
+
+
+def _content_version(data: Optional[bytes]) -> Optional[str]:
+    """Returns the version of a local object, the hash of its content."""
+    return hashlib.sha256(data).hexdigest() if data is not None else None
+
+
+def claim(key: str, timeout_seconds: float) -> bool:
+    """
+    Claims a key for the current invocation, so no concurrent invocation works on the same item.
+
+    The claim is an object created with a conditional write, so only one invocation gets it.
+    A claim older than the timeout, left by an invocation that never finished, is taken over
+    with a conditional write against its version, so of several invocations seeing it
+    expired only one takes it over. The claim is released by deleting the key.
+
+    Args:
+        key (str): The store key of the claim.
+        timeout_seconds (float): The age after which an existing claim is taken over.
+
+    Returns:
+        bool: True if the claim was taken, False if another invocation holds it.
+    """
+    store = get_store()
+    existing, version = store.read_version(key)
+    if existing is not None:
+        if time.time() - json.loads(existing).get('claimed_at', 0) < timeout_seconds:
+            return False
+        logger.warning(f"Claim '{key}' expired, taking it over.")
+    return store.write_if_unchanged(key, json.dumps({'claimed_at': time.time()}).encode('utf-8'), version)
+
+
+def get_store() -> LocalStore | S3Store:
+    """
+    Returns the shared object store for generated content and pipeline state.
+
+    An S3 store is used when the CONTENT_BUCKET_NAME environment variable is set,
+    otherwise the content is kept in a local directory.
+
+    Returns:
+        LocalStore | S3Store: The object store.
+    """
+    global _store
+    with _lock:
+        if _store is None:
+            bucket_name = os.environ.get('CONTENT_BUCKET_NAME')
+            if bucket_name:
+                _store = S3Store(bucket_name)
+            else:
+                logger.info(f"CONTENT_BUCKET_NAME is not set, using local store in '{LOCAL_STORE_DIR}'.")
+                _store = LocalStore(LOCAL_STORE_DIR)
+        return _store
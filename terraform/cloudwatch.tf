@@ -1,3 +1,7 @@
 resource "aws_cloudwatch_log_group" "lambda_log_group" {
   name              = "/aws/lambda/${var.resources_prefix}${var.generate_function_name}"
-}
\ No newline at end of file
+}
+
+resource "aws_cloudwatch_log_group" "publish_lambda_log_group" {
+  name              = "/aws/lambda/${var.resources_prefix}${var.publish_function_name}"
+}
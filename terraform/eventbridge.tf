@@ -5,8 +5,24 @@ resource "aws_cloudwatch_event_rule" "weekly_8pm_cest_rule" {
 }
 
 # Define the target for the EventBridge rule (the Lambda function)
+# With outbox publishing the weekly post is published from the outbox instead of generated on the spot
 resource "aws_cloudwatch_event_target" "lambda_target" {
   rule      = aws_cloudwatch_event_rule.weekly_8pm_cest_rule.name
-  arn       = aws_lambda_function.generate_posts_lambda.arn
+  arn       = var.outbox_publishing ? aws_lambda_function.publish_posts_lambda.arn : aws_lambda_function.generate_posts_lambda.arn
   target_id = "${var.resources_prefix}weekly-lambda-function-target"
 }
+
+resource "aws_cloudwatch_event_rule" "outbox_fill_rule" {
+  count               = var.outbox_publishing ? 1 : 0
+  name                = "outbox-fill-lambda-trigger"
+  description         = "Triggers the Lambda function generating posts into the outbox ahead of publishing"
+  schedule_expression = var.outbox_fill_schedule
+}
+
+resource "aws_cloudwatch_event_target" "outbox_fill_target" {
+  count     = var.outbox_publishing ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.outbox_fill_rule[0].name
+  arn       = aws_lambda_function.generate_posts_lambda.arn
+  target_id = "${var.resources_prefix}outbox-fill-lambda-function-target"
+  input     = jsonencode({ mode = "fill_outbox" })
+}
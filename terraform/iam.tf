@@ -31,10 +31,13 @@ resource "aws_iam_policy" "lambda_basic_execution_policy" {
           "logs:PutLogEvents"
         ],
         Effect   = "Allow",
-        Resource = aws_cloudwatch_log_group.lambda_log_group.arn
+        Resource = [
+          aws_cloudwatch_log_group.lambda_log_group.arn,
+          aws_cloudwatch_log_group.publish_lambda_log_group.arn
+        ]
       },
       {
-        Action   = ["bedrock:InvokeModel"],
+        Action   = ["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
         Effect   = "Allow",
         Resource = "arn:aws:bedrock:*:*:*"
       },
@@ -43,13 +46,40 @@ resource "aws_iam_policy" "lambda_basic_execution_policy" {
         Action   = ["secretsmanager:GetSecretValue"],
         Resource = [
           aws_secretsmanager_secret.facebook_page_token.arn,
-          aws_secretsmanager_secret.facebook_page_id.arn
+          aws_secretsmanager_secret.facebook_page_id.arn,
+          aws_secretsmanager_secret.facebook_pages.arn
         ]
       },
+      {
+        # BatchGetSecretValue is authorized on all resources, access to the values is still limited by GetSecretValue above
+        Effect   = "Allow",
+        Action   = ["secretsmanager:BatchGetSecretValue"],
+        Resource = "*"
+      },
       {
         Effect = "Allow",
         Action = ["sns:Publish"],
         Resource = [aws_sns_topic.email_notifications_topic.arn]
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"],
+        Resource = ["${aws_s3_bucket.content_bucket.arn}/*"]
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["s3:ListBucket"],
+        Resource = [aws_s3_bucket.content_bucket.arn]
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["bedrock:CreateModelInvocationJob", "bedrock:GetModelInvocationJob"],
+        Resource = "arn:aws:bedrock:*:*:*"
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["iam:PassRole"],
+        Resource = [aws_iam_role.bedrock_batch_role.arn]
       }
     ]
   })
@@ -61,3 +91,42 @@ resource "aws_iam_role_policy_attachment" "lambda_basic_execution_attach" {
   policy_arn = aws_iam_policy.lambda_basic_execution_policy.arn
 }
 
+
+# IAM Role assumed by Bedrock to read batch inference input and write its output
+resource "aws_iam_role" "bedrock_batch_role" {
+  name = "${var.resources_prefix}bedrock-batch-role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Action = "sts:AssumeRole",
+        Effect = "Allow",
+        Principal = {
+          Service = "bedrock.amazonaws.com"
+        }
+      },
+    ]
+  })
+}
+
+resource "aws_iam_role_policy" "bedrock_batch_policy" {
+  name = "${var.resources_prefix}bedrock-batch-policy"
+  role = aws_iam_role.bedrock_batch_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect   = "Allow",
+        Action   = ["s3:GetObject", "s3:PutObject"],
+        Resource = ["${aws_s3_bucket.content_bucket.arn}/*"]
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["s3:ListBucket"],
+        Resource = [aws_s3_bucket.content_bucket.arn]
+      }
+    ]
+  })
+}
@@ -6,12 +6,15 @@ resource "null_resource" "install_lambda_dependencies" {
   triggers = {
     # This trigger will change on every 'terraform apply', forcing a rebuild
     force_rebuild = timestamp()
-    dependencies_hash      = filemd5("${local.lambda_source_path}/requirements.txt")
+    dependencies_hash      = filemd5("${local.lambda_source_path}/requirements-lambda.txt")
     code_trigger_file_hash = filemd5("${local.lambda_source_path}/generate_post_lambda.py")
+    publish_trigger_hash   = filemd5("${local.lambda_source_path}/publish_post_lambda.py")
   }
 
   provisioner "local-exec" {
-    command     = "pip install -r requirements.txt -t ."
+    # boto3 is provided by the Lambda runtime, so only the other dependencies are bundled,
+    # as binary wheels built for the runtime's Python version and platform
+    command     = "pip install -r requirements-lambda.txt -t . --only-binary=:all: --platform manylinux2014_x86_64 --implementation cp --python-version ${trimprefix(var.runtime, "python")}"
     working_dir = local.lambda_source_path
   }
 }
@@ -34,7 +37,8 @@ resource "aws_lambda_function" "generate_posts_lambda" {
   handler       = "generate_post_lambda.lambda_handler"
   runtime       = var.runtime
   role          = aws_iam_role.lambda_exec_role.arn
-  timeout       = var.lambda_timeout
+  # with outbox publishing the generator only runs the fill, which generates several posts per run
+  timeout       = var.outbox_publishing ? var.outbox_fill_timeout : var.lambda_timeout
   memory_size   = var.lambda_memory_size
 
   environment {
@@ -42,6 +46,10 @@ resource "aws_lambda_function" "generate_posts_lambda" {
       FACEBOOK_PAGE_TOKEN_SECRET_NAME = aws_secretsmanager_secret.facebook_page_token.name
       FACEBOOK_PAGE_ID_SECRET_NAME    = aws_secretsmanager_secret.facebook_page_id.name
       SNS_TOPIC_ARN                   = aws_sns_topic.email_notifications_topic.arn
+      CONTENT_BUCKET_NAME             = aws_s3_bucket.content_bucket.id
+      BEDROCK_BATCH_ROLE_ARN          = aws_iam_role.bedrock_batch_role.arn
+      # publishes to the pages listed in the facebook-pages secret instead of the single page
+      FACEBOOK_PAGES_SECRET_NAME      = var.multi_page_publishing ? aws_secretsmanager_secret.facebook_pages.name : ""
     }
   }
 
@@ -52,10 +60,41 @@ resource "aws_lambda_function" "generate_posts_lambda" {
 
 }
 
+# Lightweight function publishing the posts generated ahead into the outbox, from the same package
+resource "aws_lambda_function" "publish_posts_lambda" {
+  function_name = "${var.resources_prefix}${var.publish_function_name}"
+  handler       = "publish_post_lambda.lambda_handler"
+  runtime       = var.runtime
+  role          = aws_iam_role.lambda_exec_role.arn
+  timeout       = var.lambda_timeout
+  memory_size   = var.lambda_memory_size
+
+  environment {
+    variables = {
+      FACEBOOK_PAGE_TOKEN_SECRET_NAME = aws_secretsmanager_secret.facebook_page_token.name
+      FACEBOOK_PAGE_ID_SECRET_NAME    = aws_secretsmanager_secret.facebook_page_id.name
+      SNS_TOPIC_ARN                   = aws_sns_topic.email_notifications_topic.arn
+      CONTENT_BUCKET_NAME             = aws_s3_bucket.content_bucket.id
+      FACEBOOK_PAGES_SECRET_NAME      = var.multi_page_publishing ? aws_secretsmanager_secret.facebook_pages.name : ""
+    }
+  }
+
+  filename         = data.archive_file.lambda_zip_package.output_path
+  source_code_hash = data.archive_file.lambda_zip_package.output_base64sha256
+}
+
 resource "aws_lambda_permission" "allow_cloudwatch_to_invoke_lambda" {
   statement_id  = "AllowExecutionFromCloudWatch"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.generate_posts_lambda.function_name
   principal     = "events.amazonaws.com"
+  source_arn    = var.outbox_publishing ? aws_cloudwatch_event_rule.outbox_fill_rule[0].arn : aws_cloudwatch_event_rule.weekly_8pm_cest_rule.arn
+}
+
+resource "aws_lambda_permission" "allow_cloudwatch_to_invoke_publish_lambda" {
+  statement_id  = "AllowExecutionFromCloudWatch"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.publish_posts_lambda.function_name
+  principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.weekly_8pm_cest_rule.arn
 }
\ No newline at end of file
@@ -0,0 +1,30 @@
+# Bucket for generated content and pipeline state (batch inference jobs, post backlog, checkpoints, images)
+resource "aws_s3_bucket" "content_bucket" {
+  bucket_prefix = "${var.resources_prefix}content-"
+}
+
+resource "aws_s3_bucket_public_access_block" "content_bucket_public_access" {
+  bucket                  = aws_s3_bucket.content_bucket.id
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+# Checkpoints are only needed to resume retried runs, the content-addressed images are kept
+resource "aws_s3_bucket_lifecycle_configuration" "content_bucket_lifecycle" {
+  bucket = aws_s3_bucket.content_bucket.id
+
+  rule {
+    id     = "expire-checkpoints"
+    status = "Enabled"
+
+    filter {
+      prefix = "checkpoints/"
+    }
+
+    expiration {
+      days = var.checkpoint_retention_days
+    }
+  }
+}
@@ -6,4 +6,9 @@ resource "aws_secretsmanager_secret" "facebook_page_token" {
 resource "aws_secretsmanager_secret" "facebook_page_id" {
   name        = "${var.resources_prefix}facebook-page-id"
   description = "Facebook Page ID for the managed page"
-}
\ No newline at end of file
+}
+
+resource "aws_secretsmanager_secret" "facebook_pages" {
+  name        = "${var.resources_prefix}facebook-pages"
+  description = "JSON list of Facebook Pages to publish to, with their page IDs and Page Access Tokens"
+}
@@ -10,6 +10,12 @@ variable "generate_function_name" {
   default     = "generate-post"
 }
 
+variable "publish_function_name" {
+  description = "Name for lambda publishing posts from the outbox"
+  type        = string
+  default     = "publish-post"
+}
+
 # us-west-2 allows image generation in AWS Bedrock
 variable "region" {
   description = "The AWS region to deploy the resources to."
@@ -46,4 +52,34 @@ variable "primary_alert_email_endpoint" {
   description = "The email address for the primary SNS alert receiver."
   type        = string
   sensitive   = true
-}
\ No newline at end of file
+}
+
+variable "multi_page_publishing" {
+  description = "Publish to all pages from the facebook-pages secret instead of the single page. Set a value for the secret before enabling."
+  type        = bool
+  default     = false
+}
+
+variable "checkpoint_retention_days" {
+  description = "Days after which pipeline checkpoints are deleted from the content bucket. Reruns of older events start over."
+  type        = number
+  default     = 30
+}
+
+variable "outbox_publishing" {
+  description = "Generate posts ahead into the outbox on the fill schedule and publish them with the publisher function on the weekly schedule."
+  type        = bool
+  default     = false
+}
+
+variable "outbox_fill_timeout" {
+  description = "The maximum execution time in seconds of the generator function when outbox publishing is on. A fill run generates several posts, each taking up to OUTBOX_POST_TIME_BUDGET seconds."
+  type        = number
+  default     = 300
+}
+
+variable "outbox_fill_schedule" {
+  description = "Schedule of the generator filling the outbox, off-peak ahead of the weekly post."
+  type        = string
+  default     = "cron(0 3 ? * 1 *)" # Every Sunday at 03:00 UTC
+}